@@ -0,0 +1,425 @@
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+BENCHMARK_APP_CONFIG = {
+    "ml_detector_id": "benchmark",
+    "printer": {"printer_ip": "127.0.0.1", "printer_port": 9100},
+    # The mock detector never fails, and replayed frames would lose their frame index stamps
+    "ml_replay_queue": {"enabled": False},
+}
+
+BENCHMARK_DATABASE_CONFIG = {"enabled": False, "service_account": {}, "database_id": "", "database_range": ""}
+
+
+def stamp_frame_index(frame: np.ndarray, index: int) -> None:
+    """Write the frame index into the first pixels of the frame, so the mock detector can look up its ground truth."""
+
+    stamp = np.frombuffer(np.uint32(index).tobytes(), dtype=np.uint8)
+    if frame.ndim == 3:
+        frame[0, :4, 0] = stamp
+    else:
+        frame[0, :4] = stamp
+
+
+def read_frame_index(frame: np.ndarray) -> int:
+    """Read the frame index stamped into the first pixels of a frame."""
+
+    stamp = frame[0, :4, 0] if frame.ndim == 3 else frame[0, :4]
+    return int(np.frombuffer(np.ascontiguousarray(stamp, dtype=np.uint8).tobytes(), dtype=np.uint32)[0])
+
+
+class PlaybackGrabber:
+    """Stand-in camera with the FrameGrabber interface that plays back a video file or a directory of frames in real time.
+
+    Once the recording ends, the last frame is repeated and `finished` is set.
+    """
+
+    def __init__(self, source: str, fps: float | None = None) -> None:
+        self.config = {"name": source}
+        self.capture = None
+        self.paths = None
+
+        if os.path.isdir(source):
+            self.paths = sorted(os.path.join(source, name) for name in os.listdir(source) if name.lower().endswith(IMAGE_EXTENSIONS))
+            fps = fps or 10.0
+        else:
+            self.capture = cv2.VideoCapture(source)
+            if not self.capture.isOpened():
+                raise ValueError(f"Cannot open video file: {source}")
+            fps = fps or self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+        self.interval = 1 / fps
+        self.index = -1
+        self.last_frame = None
+        self.started_at = None
+
+        # Wall time at which each frame index was grabbed
+        self.grabbed_at: list[float] = []
+        self.finished = threading.Event()
+
+    def _read(self) -> np.ndarray | None:
+        """Read the next frame of the recording, None at the end."""
+
+        if self.capture is not None:
+            success, frame = self.capture.read()
+            return frame if success else None
+
+        if self.index + 1 >= len(self.paths):
+            return None
+        return cv2.imread(self.paths[self.index + 1])
+
+    def grab(self) -> np.ndarray:
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+
+        # Frames are delivered at the recorded frame rate like a live camera
+        delay = self.started_at + (self.index + 1) * self.interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        frame = None if self.finished.is_set() else self._read()
+        if frame is None:
+            self.finished.set()
+            if self.last_frame is None:
+                raise RuntimeError("Recording has no frames")
+            return self.last_frame.copy()
+
+        self.index += 1
+        stamp_frame_index(frame, self.index)
+        self.grabbed_at.append(time.time())
+        self.last_frame = frame
+        return frame
+
+    def release(self) -> None:
+        if self.capture is not None:
+            self.capture.release()
+
+
+class MockResult:
+    def __init__(self, label: str, confidence: float) -> None:
+        self.label = label
+        self.confidence = confidence
+        self.source = "ALGORITHM"
+
+
+class MockGeometry:
+    def __init__(self, x: float) -> None:
+        self.x = x
+
+
+class MockROI:
+    def __init__(self, x: float) -> None:
+        self.geometry = MockGeometry(x)
+
+
+class MockImageQuery:
+    def __init__(self, label: str, confidence: float, rois: list[MockROI], ready_at: float) -> None:
+        self.id = f"iq_mock_{id(self):x}"
+        self.answer = MockResult(label, confidence)
+        self.rois = rois
+        self.ready_at = ready_at
+
+    @property
+    def result(self) -> MockResult | None:
+        """The answer once the latency has passed, None before."""
+
+        return self.answer if time.monotonic() >= self.ready_at else None
+
+
+class MockGroundlight:
+    """Stand-in for the Groundlight client that answers from the ground truth with a configurable latency and error rate.
+
+    Images may be encoded, so the frame index and the sides asked are set by `expect_frame` in the ML worker thread
+    before its queries. Half-frame queries are answered for the left and then the right side, full-frame queries return
+    a region for each side with a weld.
+    """
+
+    def __init__(
+        self,
+        welding_frames: dict[str, set[int]],
+        full_frame: bool,
+        latency_sec: float,
+        latency_jitter_sec: float,
+        false_positive_rate: float,
+        false_negative_rate: float,
+        seed: int,
+    ) -> None:
+        self.welding_frames = welding_frames
+        self.full_frame = full_frame
+        self.latency_sec = latency_sec
+        self.latency_jitter_sec = latency_jitter_sec
+        self.false_positive_rate = false_positive_rate
+        self.false_negative_rate = false_negative_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.queries = {}
+        self.current = threading.local()
+
+    def get_detector(self, id: str) -> str:
+        return id
+
+    def expect_frame(self, frame: np.ndarray, ask_left: bool, ask_right: bool) -> None:
+        """Set the frame and the sides the next queries of the calling thread are for."""
+
+        self.current.index = read_frame_index(frame)
+        self.current.sides = [side for side, asked in [("left", ask_left), ("right", ask_right)] if asked]
+
+    def _is_welding(self, side: str, index: int) -> bool:
+        """Ground truth of one side of a frame, flipped with the configured error rates."""
+
+        welding = index in self.welding_frames[side]
+        with self.lock:
+            flip = self.random.random() < (self.false_negative_rate if welding else self.false_positive_rate)
+        return welding != flip
+
+    def ask_async(self, detector: str, image: np.ndarray | bytes) -> MockImageQuery:
+        with self.lock:
+            self.calls += 1
+            latency = max(0.0, self.random.gauss(self.latency_sec, self.latency_jitter_sec))
+
+        index = self.current.index
+        ready_at = time.monotonic() + latency
+
+        if self.full_frame:
+            rois = [MockROI(x) for side, x in [("left", 0.25), ("right", 0.75)] if self._is_welding(side, index)]
+            image_query = MockImageQuery("YES" if rois else "NO", 0.95, rois, ready_at)
+        else:
+            side = self.current.sides.pop(0)
+            image_query = MockImageQuery("YES" if self._is_welding(side, index) else "NO", 0.95, [], ready_at)
+
+        self.queries[image_query.id] = image_query
+        return image_query
+
+    def get_image_query(self, id: str) -> MockImageQuery:
+        return self.queries[id]
+
+    def wait_for_ml_result(self, image_query: MockImageQuery, timeout_sec: float) -> MockImageQuery:
+        delay = image_query.ready_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return image_query
+
+
+def load_session(path: str) -> dict:
+    """Load a recorded session from its annotation file.
+
+    The annotation file is a JSON object with the "source" video file or frame directory (relative to the annotation
+    file), an optional "fps", and the ground truth "welds" as a list of {"side", "start", "end"} with inclusive frame
+    indices.
+    """
+
+    with open(path, "r") as f:
+        session = json.load(f)
+
+    session["name"] = os.path.splitext(os.path.basename(path))[0]
+    session["source"] = os.path.join(os.path.dirname(path), session["source"])
+    return session
+
+
+def match_detections(welds: list[dict], detections: list[tuple], grabbed_at: list[float], slack_sec: float) -> dict:
+    """Match the counted welds to the ground truth welds by capture time.
+
+    Args:
+        welds (list[dict]): Ground truth welds with "side", "start" and "end" frame indices.
+        detections (list[tuple]): Counted welds as (side, captured_at, counted_at).
+        grabbed_at (list[float]): Wall time at which each frame index was grabbed.
+        slack_sec (float): Time in seconds a detection may be captured outside of its weld.
+
+    Returns:
+        dict: Number of matched, missed and extra welds, and the latency from the start of each matched weld until it
+            was counted.
+    """
+
+    matched = 0
+    latencies = []
+    unmatched = list(detections)
+
+    for weld in welds:
+        if weld["start"] >= len(grabbed_at):
+            continue
+
+        start_at = grabbed_at[weld["start"]]
+        end_at = grabbed_at[min(weld["end"], len(grabbed_at) - 1)]
+        candidates = [d for d in unmatched if d[0] == weld["side"] and start_at - slack_sec <= d[1] <= end_at + slack_sec]
+        if candidates:
+            first = min(candidates, key=lambda detection: detection[2])
+            unmatched.remove(first)
+            matched += 1
+            latencies.append(first[2] - start_at)
+
+    expected = sum(1 for weld in welds if weld["start"] < len(grabbed_at))
+    return {"matched": matched, "missed": expected - matched, "extra": len(unmatched), "latencies": latencies}
+
+
+def run_session(backend, session: dict, args: argparse.Namespace) -> dict:
+    """Replay one recorded session through the weld count pipeline and measure it."""
+
+    grabber = PlaybackGrabber(session["source"], fps=args.fps or session.get("fps"))
+
+    welding_frames = {"left": set(), "right": set()}
+    for weld in session["welds"]:
+        welding_frames[weld["side"]].update(range(weld["start"], weld["end"] + 1))
+
+    mock_gl = MockGroundlight(
+        welding_frames,
+        full_frame=backend.app_config.ml_inference_mode == "full_frame",
+        latency_sec=args.latency,
+        latency_jitter_sec=args.latency_jitter,
+        false_positive_rate=args.false_positive_rate,
+        false_negative_rate=args.false_negative_rate,
+        seed=args.seed,
+    )
+
+    with patch("groundlight.Groundlight", return_value=mock_gl), patch.object(backend.FrameGrabber, "create_grabber", return_value=grabber):
+        service = backend.WeldCountService()
+        service.start()
+
+        detections = []
+        frames_counted = [0]
+        ask_ml = service._ask_ml
+        count_result = service._count_result
+        log_weld_event = service._log_weld_event
+
+        def stamped_ask_ml(frame, ask_left=True, ask_right=True, cancel_event=None):
+            mock_gl.expect_frame(frame, ask_left, ask_right)
+            return ask_ml(frame, ask_left, ask_right, cancel_event=cancel_event)
+
+        def counted_result(*counted_args, **kwargs):
+            frames_counted[0] += 1
+            return count_result(*counted_args, **kwargs)
+
+        def logged_weld_event(weld_session, side, ml_result, captured_at):
+            detections.append((side, captured_at, time.time()))
+            return log_weld_event(weld_session, side, ml_result, captured_at)
+
+        service._ask_ml = stamped_ask_ml
+        service._count_result = counted_result
+        service._log_weld_event = logged_weld_event
+
+        started_at = time.time()
+        service.start_weld_count(part_number=session["name"], jig_number=1)
+        grabber.finished.wait()
+        playback_sec = time.time() - started_at
+
+        # Let the requests in flight finish
+        time.sleep(args.latency + 3 * args.latency_jitter + 0.5)
+        weld_data = dict(service.get_weld_data(jig_number=1))
+        service.stop_weld_count(wait=True)
+        service.camera_pool.stop()
+
+    expected = {side: sum(1 for weld in session["welds"] if weld["side"] == side) for side in ["left", "right"]}
+    counted = {"left": weld_data["leftWeldCount"], "right": weld_data["rightWeldCount"]}
+    matches = match_detections(session["welds"], detections, grabber.grabbed_at, slack_sec=grabber.interval)
+
+    return {
+        "name": session["name"],
+        "frames": len(grabber.grabbed_at),
+        "playback_sec": playback_sec,
+        "frames_counted": frames_counted[0],
+        "ml_calls": mock_gl.calls,
+        "expected": expected,
+        "counted": counted,
+        **matches,
+    }
+
+
+def summarize(results: list[dict]) -> dict:
+    """Aggregate the measurements of all sessions."""
+
+    playback_sec = sum(result["playback_sec"] for result in results)
+    expected_welds = sum(sum(result["expected"].values()) for result in results)
+    latencies = [latency for result in results for latency in result["latencies"]]
+    sides = [(result["expected"][side], result["counted"][side]) for result in results for side in ["left", "right"]]
+
+    return {
+        "sessions": len(results),
+        "camera_fps": sum(result["frames"] for result in results) / playback_sec if playback_sec else 0.0,
+        "counted_fps": sum(result["frames_counted"] for result in results) / playback_sec if playback_sec else 0.0,
+        "ml_calls": sum(result["ml_calls"] for result in results),
+        "ml_calls_per_weld": sum(result["ml_calls"] for result in results) / expected_welds if expected_welds else None,
+        "latency_mean_sec": float(np.mean(latencies)) if latencies else None,
+        "latency_p50_sec": float(np.percentile(latencies, 50)) if latencies else None,
+        "latency_p95_sec": float(np.percentile(latencies, 95)) if latencies else None,
+        "expected_welds": expected_welds,
+        "counted_welds": sum(sum(result["counted"].values()) for result in results),
+        "matched_welds": sum(result["matched"] for result in results),
+        "missed_welds": sum(result["missed"] for result in results),
+        "extra_welds": sum(result["extra"] for result in results),
+        "exact_count_ratio": sum(1 for expected, counted in sides if expected == counted) / len(sides) if sides else None,
+    }
+
+
+def print_report(results: list[dict], summary: dict) -> None:
+    print(f"{'session':<24} {'frames':>7} {'counted':>8} {'ML calls':>9} {'left':>9} {'right':>9} {'missed':>7} {'extra':>6}")
+    for result in results:
+        left = f"{result['counted']['left']}/{result['expected']['left']}"
+        right = f"{result['counted']['right']}/{result['expected']['right']}"
+        print(
+            f"{result['name'][:24]:<24} {result['frames']:>7} {result['frames_counted']:>8} {result['ml_calls']:>9} "
+            f"{left:>9} {right:>9} {result['missed']:>7} {result['extra']:>6}"
+        )
+
+    print()
+    for name, value in summary.items():
+        print(f"{name:<20} {value:.3f}" if isinstance(value, float) else f"{name:<20} {value}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded weld sessions through the weld count pipeline with a mock detector")
+    parser.add_argument("sessions", nargs="+", help="Annotation JSON files of the recorded sessions")
+    parser.add_argument("--app-config", help="JSON file with app config overrides, e.g. pipeline_depth, prefilter or debouncer")
+    parser.add_argument("--jig-config", help="JSON file with jig station config overrides, e.g. the sample rates")
+    parser.add_argument("--fps", type=float, help="Playback frame rate, defaults to the recording or 10 for frame directories")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mean ML latency in seconds, default 0.2")
+    parser.add_argument("--latency-jitter", type=float, default=0.05, help="Standard deviation of the ML latency, default 0.05")
+    parser.add_argument("--false-positive-rate", type=float, default=0.0, help="Ratio of idle frames labeled YES, default 0")
+    parser.add_argument("--false-negative-rate", type=float, default=0.0, help="Ratio of welding frames labeled NO, default 0")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the mock detector errors and latency")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the app logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    app_config = dict(BENCHMARK_APP_CONFIG)
+    if args.app_config:
+        with open(args.app_config, "r") as f:
+            app_config.update(json.load(f))
+
+    jig_config = {"camera_config": {"name": "playback"}}
+    if args.jig_config:
+        with open(args.jig_config, "r") as f:
+            jig_config.update(json.load(f))
+
+    # The app reads its configuration when it is imported
+    os.environ["WELD_APP_CONFIG"] = json.dumps(app_config)
+    os.environ["WELD_APP_CAMERA_CONFIG"] = json.dumps({"jig_stations": {"1": jig_config}})
+    os.environ["WELD_APP_DATABASE_CONFIG"] = json.dumps(BENCHMARK_DATABASE_CONFIG)
+    os.environ["WELD_APP_DATA_DIR"] = tempfile.mkdtemp(prefix="weld-benchmark-")
+
+    from weld import backend
+
+    results = [run_session(backend, load_session(path), args) for path in args.sessions]
+    summary = summarize(results)
+    print_report(results, summary)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "sessions": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
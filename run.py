@@ -3,16 +3,105 @@ import logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 
 import os
+import sys
+import time
+import signal
+import shutil
+import secrets
+import tempfile
+import threading
+import subprocess
 
-from weld import create_app
+from weld import create_app, services
 
 logger = logging.getLogger(__name__)
 
 GLHUB_APP_PORT = int(os.getenv("GLHUB_APP_PORT", "8000"))
 
+# Web server worker processes, 0 runs the Flask development server with the services in the same process
+WELD_APP_WORKERS = int(os.getenv("WELD_APP_WORKERS", "2"))
+
+# Threads of each worker, every open weld count screen keeps one busy with its event stream
+WELD_APP_THREADS = int(os.getenv("WELD_APP_THREADS", "8"))
+
+
+def start_services_process() -> tuple[subprocess.Popen, str]:
+    """Start the process owning the cameras, GPIO and printer, and wait until it serves the app services.
+
+    The address and secret of the services are set in the environment, so the web server workers connect to them.
+
+    Returns:
+        tuple[subprocess.Popen, str]: Owner process and the directory of its socket.
+    """
+
+    socket_dir = tempfile.mkdtemp(prefix="weld-app-")
+    address = os.path.join(socket_dir, "services.sock")
+    authkey = secrets.token_bytes(32)
+
+    env = {**os.environ, services.SERVICES_ADDRESS_ENV: address, services.SERVICES_AUTHKEY_ENV: authkey.hex()}
+    process = subprocess.Popen([sys.executable, "-m", "weld.services"], env=env)
+
+    # Creating the services can take a while, e.g. to reach the detector
+    while True:
+        if process.poll() is not None:
+            shutil.rmtree(socket_dir, ignore_errors=True)
+            raise RuntimeError(f"App services process exited with code {process.returncode}")
+
+        try:
+            services.connect_services(address, authkey)
+            break
+        except (FileNotFoundError, ConnectionRefusedError):
+            time.sleep(0.2)
+
+    os.environ.update({services.SERVICES_ADDRESS_ENV: address, services.SERVICES_AUTHKEY_ENV: authkey.hex()})
+    return process, socket_dir
+
+
+def run_production_server() -> None:
+    """Serve the app with gunicorn worker processes, connected to a single owner process of the services."""
+
+    from gunicorn.app.base import BaseApplication
+
+    class WeldApplication(BaseApplication):
+        def load_config(self) -> None:
+            self.cfg.set("bind", f"0.0.0.0:{GLHUB_APP_PORT}")
+            self.cfg.set("workers", WELD_APP_WORKERS)
+            self.cfg.set("threads", WELD_APP_THREADS)
+            self.cfg.set("worker_class", "gthread")
+
+        def load(self):
+            return create_app()
+
+    process, socket_dir = start_services_process()
+    master_pid = os.getpid()
+    stopping = threading.Event()
+
+    def watch_services_process() -> None:
+        # The workers cannot serve requests without the services, stop so the app gets restarted
+        process.wait()
+        if not stopping.is_set():
+            logger.error("App services process exited, stopping the weld app")
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    threading.Thread(target=watch_services_process, daemon=True).start()
+
+    try:
+        logger.info(f"Running weld app on port {GLHUB_APP_PORT} with {WELD_APP_WORKERS} workers")
+        WeldApplication().run()
+    finally:
+        # The workers are forked from this process and exit through here as well
+        if os.getpid() == master_pid:
+            stopping.set()
+            process.terminate()
+            process.wait()
+            shutil.rmtree(socket_dir, ignore_errors=True)
+
 
 if __name__ == "__main__":
-    app = create_app()
+    if WELD_APP_WORKERS > 0:
+        run_production_server()
+    else:
+        app = create_app()
 
-    logger.info(f"Running weld app on port {GLHUB_APP_PORT}")
-    app.run(host="0.0.0.0", port=GLHUB_APP_PORT)
+        logger.info(f"Running weld app on port {GLHUB_APP_PORT}")
+        app.run(host="0.0.0.0", port=GLHUB_APP_PORT)
@@ -1,13 +1,867 @@
+import os
+import json
+import time
+import queue
+import socket
+import sqlite3
+import tempfile
+import threading
 import unittest
+from unittest.mock import Mock, patch
 
-from weld import backend
+import cv2
+import numpy as np
 
+from weld import backend, config
+from weld.debouncer import FlashDebouncer
 
-class TestSaturatingCounter(unittest.TestCase):
-    def test_update(self):
-        """Test the update method of the SaturatingCounter class."""
 
-        counter = backend.SaturatingCounter()
+class TestFrameActivityGate(unittest.TestCase):
+    def test_check(self):
+        """Test that idle frames are skipped and changed or bright frames are sent to ML."""
 
-        assert counter.update(False) == "NO"
-        assert counter.update(True) == "YES"
+        gate = backend.FrameActivityGate(motion_threshold=8.0, brightness_threshold=200, bright_pixel_ratio=0.01)
+        idle = np.full((32, 32, 3), 50, dtype=np.uint8)
+        arc = idle.copy()
+        arc[:8, :8] = 255
+
+        assert gate.check(idle)  # No previous frame to compare against
+        assert not gate.check(idle)
+        assert gate.check(arc)  # Changed since the previous frame
+        assert gate.check(arc)  # Unchanged but bright
+        assert gate.check(idle)  # Arc went out
+        assert not gate.check(idle + 1)  # Small lighting change
+        assert gate.skip_ratio == 2 / 6
+
+
+class TestAdaptiveSampler(unittest.TestCase):
+    def test_samples_slowly_while_idle(self):
+        """Test that frames are sampled at the maximum rate while active and at the minimum rate once idle."""
+
+        now = [100.0]
+        with patch.object(backend.time, "monotonic", side_effect=lambda: now[0]):
+            sampler = backend.AdaptiveSampler(min_rate_hz=1.0, max_rate_hz=10.0, idle_after_sec=5.0)
+            assert sampler.should_sample(active=False)
+            assert 0.09 < sampler.read_wait_sec() <= 0.1
+
+            # Still active right after the start
+            now[0] += 0.2
+            assert sampler.should_sample(active=False)
+
+            # Idle frames are read at the maximum rate but only sampled once per second
+            now[0] += 5.0
+            assert sampler.is_idle
+            assert sampler.should_sample(active=False)
+            now[0] += 0.5
+            assert not sampler.should_sample(active=False)
+
+            # Activity ramps up to the maximum rate right away
+            now[0] += 0.2
+            assert sampler.should_sample(active=True)
+            now[0] += 0.2
+            assert sampler.should_sample(active=False)
+
+
+class TestFrameEncoder(unittest.TestCase):
+    def test_encode(self):
+        """Test that each half-frame is downscaled to fit the maximum size and encoded as JPEG."""
+
+        encoder = backend.FrameEncoder(max_width=100, max_height=None, jpeg_quality=80, workers=2)
+        frame = np.random.randint(0, 255, (300, 800, 3), dtype=np.uint8)
+
+        left = encoder.submit(frame[:, :400])
+        right = encoder.submit(frame[:, 400:])
+        for encoded in [left.result(), right.result()]:
+            assert cv2.imdecode(np.frombuffer(encoded, dtype=np.uint8), cv2.IMREAD_COLOR).shape == (75, 100, 3)
+
+        # Small images are encoded as they are
+        assert cv2.imdecode(np.frombuffer(encoder.encode(frame[:20, :40]), dtype=np.uint8), cv2.IMREAD_COLOR).shape == (20, 40, 3)
+
+
+class TestFrameRingBuffer(unittest.TestCase):
+    def test_read_and_overwrite(self):
+        """Test that frames are copied into preallocated slots and overwritten frames are not returned."""
+
+        buffer = backend.FrameRingBuffer(size=3)
+        buffer.write(np.full((2, 2), 1, dtype=np.uint8), timestamp=10.0)
+        slots = buffer.frames
+
+        frame, timestamp = buffer.read(1)
+        assert frame[0, 0] == 1 and timestamp == 10.0
+
+        buffer.write(np.full((2, 2), 2, dtype=np.uint8), timestamp=11.0)
+        assert buffer.read(1) is not None
+        buffer.write(np.full((2, 2), 3, dtype=np.uint8), timestamp=12.0)
+        assert buffer.read(1) is None  # The next write goes into the slot of frame 1
+
+        frame, timestamp = buffer.read(buffer.seq)
+        assert frame[0, 0] == 3 and timestamp == 12.0
+        assert buffer.frames is slots
+
+
+class TestWeldEventLog(unittest.TestCase):
+    def test_writer_retries_failed_writes(self):
+        """Test that the writer keeps running and retries when the database cannot be opened, and flush can time out."""
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            event_log = backend.WeldEventLog(os.path.join(temp_dir, "weld_events.db"))
+            connect = event_log._connect
+            connect_calls = []
+
+            def failing_connect():
+                connect_calls.append(time.time())
+                if len(connect_calls) == 1:
+                    raise sqlite3.OperationalError("disk I/O error")
+                return connect()
+
+            with patch.object(backend.WeldEventLog, "RETRY_BACKOFF_MIN_SEC", 0.2), patch.object(event_log, "_connect", side_effect=failing_connect):
+                event_log.append(1.0, 1, "left", None, "Part1", "session", "iq_1", 0.9)
+                assert not event_log.flush(timeout=0.05)
+                assert event_log.flush(timeout=2)
+
+            assert len(connect_calls) == 2
+            assert [event["image_query_id"] for event in event_log.query()] == ["iq_1"]
+
+
+class TestCameraPool(unittest.TestCase):
+    def test_reconfigure_only_touches_changed_jigs(self):
+        """Test that a changed camera configuration reconnects changed cameras and leaves the others running."""
+
+        jig_stations = config.AppCameraConfig.model_validate(
+            {"jig_stations": {"1": {"camera_config": {"name": "one"}}, "2": {"camera_config": {"name": "two"}}}}
+        ).jig_stations
+        pool = backend.CameraPool()
+        pool.streams = {1: Mock(jig_number=1, camera_config={"name": "one"}), 2: Mock(jig_number=2, camera_config={"name": "two"})}
+        unchanged_stream, changed_stream = pool.streams[1], pool.streams[2]
+
+        new_jig_stations = {
+            1: jig_stations[1],
+            2: jig_stations[2].model_copy(update={"camera_config": {"name": "two", "input_type": "rtsp"}}),
+            3: jig_stations[1].model_copy(update={"camera_config": {"name": "three"}}),
+        }
+        with patch.object(backend, "CameraStream") as camera_stream, patch.object(backend.camera_config, "jig_stations", new_jig_stations):
+            pool.reconfigure()
+
+        unchanged_stream.reconfigure.assert_not_called()
+        unchanged_stream.stop.assert_not_called()
+        changed_stream.reconfigure.assert_called_once_with({"name": "two", "input_type": "rtsp"})
+        camera_stream.assert_called_once_with(jig_number=3, camera_config={"name": "three"})
+        assert pool.streams[3] is camera_stream.return_value
+
+        with patch.object(backend.camera_config, "jig_stations", {1: jig_stations[1]}):
+            pool.reconfigure()
+        changed_stream.stop.assert_called_once()
+        assert list(pool.streams) == [1]
+
+    def test_stop_does_not_wait_for_a_stuck_grab(self):
+        """Test that stopping a stream gives up on a reader stuck in a grab, which releases the camera once it returns."""
+
+        grab_returns = threading.Event()
+        grabber = Mock()
+        grabber.grab.side_effect = lambda: grab_returns.wait() and np.zeros((8, 16), dtype=np.uint8)
+        stream = backend.CameraStream(jig_number=1, camera_config={"name": "one"})
+
+        with patch.object(backend.FrameGrabber, "create_grabber", return_value=grabber), patch.object(
+            backend.CameraStream, "STOP_TIMEOUT_SEC", 0.1
+        ):
+            stream.start()
+            while not grabber.grab.called:
+                time.sleep(0.01)
+            reader = stream.thread
+            stream.stop()
+
+        assert stream.thread is None and reader.is_alive()
+        grab_returns.set()
+        reader.join(timeout=1)
+        assert not reader.is_alive()
+        grabber.release.assert_called_once()
+
+
+class TestServiceReadiness(unittest.TestCase):
+    def test_start_is_retried_until_ready(self):
+        """Test that a failed start is reported and retried in the background until the service is ready."""
+
+        readiness = backend.ServiceReadiness()
+        attempts = []
+
+        def start():
+            attempts.append(time.time())
+            if len(attempts) == 1:
+                raise ConnectionError("unreachable")
+            time.sleep(0.1)
+
+        with patch.object(backend.ServiceReadiness, "RETRY_MIN_SEC", 0.1):
+            thread = readiness.start("weld_count_service", start)
+            time.sleep(0.15)
+            status = readiness.get_status()
+            assert not status["ready"]
+            assert status["services"]["weld_count_service"]["error"] == "unreachable"
+
+            thread.join(timeout=1)
+
+        status = readiness.get_status()
+        assert status["ready"] and len(attempts) == 2
+        assert status["services"]["weld_count_service"]["state"] == "ready"
+
+
+class TestWeldCountService(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        with patch("groundlight.Groundlight"), patch.object(backend, "data_dir", self.temp_dir.name):
+            self.service = backend.WeldCountService()
+            self.service.start()
+
+    def tearDown(self):
+        self.service.stop_weld_count(wait=True)
+        self.service.camera_pool.stop()
+        self.service.event_log.flush()
+        self.temp_dir.cleanup()
+
+    def test_pipelined_results_are_counted_in_frame_order(self):
+        """Test that out-of-order ML results are reordered by frame before counting."""
+
+        # Left side flashes on frames 0 and 2, right side on frame 1, frame 3 is idle
+        labels = [("YES", "NO"), ("NO", "YES"), ("YES", "NO"), ("NO", "NO")]
+        frames = queue.Queue()
+        asked = [threading.Event() for _ in labels]
+        answered = [threading.Event() for _ in labels]
+        done = [threading.Event() for _ in labels]
+
+        def grab():
+            # Frames are only delivered when the test provides them, until the camera is stopped
+            stream = self.service.camera_pool.streams[1]
+            while stream.is_running:
+                try:
+                    return frames.get(timeout=0.01)
+                except queue.Empty:
+                    pass
+            return np.zeros((2, 4), dtype=np.uint16)
+
+        # Frames grabbed before the weld count reads the camera are not counted, so the test waits for it
+        reading = threading.Event()
+        get_frame = backend.CameraStream.get_frame
+
+        def spy_get_frame(stream, after_seq, timeout):
+            reading.set()
+            return get_frame(stream, after_seq, timeout)
+
+        def ask_ml(frame, ask_left, ask_right, cancel_event=None):
+            frame_seq = int(frame[0, 0])
+            asked[frame_seq].set()
+            assert answered[frame_seq].wait(timeout=5)
+            left_label, right_label = labels[frame_seq]
+            done[frame_seq].set()
+            return backend.MLResult(left_label, f"iq_{frame_seq}", 0.9), backend.MLResult(right_label, f"iq_{frame_seq}", 0.9)
+
+        grabber = Mock()
+        grabber.grab.side_effect = grab
+
+        with patch.object(backend.FrameGrabber, "create_grabber", return_value=grabber), patch.object(
+            backend.app_config, "pipeline_depth", 4
+        ), patch.object(self.service, "_ask_ml", side_effect=ask_ml), patch.object(backend.CameraStream, "get_frame", spy_get_frame):
+            self.service.start_weld_count(part_number="Part1", jig_number=1, shift_number=2)
+            session = self.service.sessions[1]
+            assert reading.wait(timeout=5)
+
+            # All frames are in flight at once
+            for frame_seq in range(len(labels)):
+                frames.put(np.full((2, 4), frame_seq, dtype=np.uint16))
+                assert asked[frame_seq].wait(timeout=5)
+
+            # Later frames complete first, none can be counted before frame 0
+            for frame_seq in [3, 2, 1]:
+                answered[frame_seq].set()
+                assert done[frame_seq].wait(timeout=5)
+            assert session.results == []
+
+            answered[0].set()
+            deadline = time.monotonic() + 5
+            while len(session.results) < len(labels) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.service.stop_weld_count(wait=True)
+
+            # The camera stays open after the weld count stops
+            grabber.release.assert_not_called()
+            self.service.camera_pool.stop()
+
+        assert [result[1].image_query_id for result in session.results] == ["iq_0", "iq_1", "iq_2", "iq_3"]
+        weld_data = self.service.get_weld_data()
+        assert weld_data["leftWeldCount"] == 2
+        assert weld_data["rightWeldCount"] == 1
+        assert weld_data["frameAgeSec"] > 0
+        grabber.release.assert_called_once()
+
+        # Each counted flash is logged with the image query that detected it
+        self.service.event_log.flush()
+        events = self.service.event_log.query(shift_number=2, jig_number=1, part_number="Part1")
+        assert [(event["side"], event["image_query_id"]) for event in events] == [("left", "iq_0"), ("right", "iq_1"), ("left", "iq_2")]
+        assert self.service.event_log.query(start=events[1]["timestamp"], end=events[2]["timestamp"])[0]["side"] == "right"
+
+    def test_split_rois_by_side(self):
+        """Test that full frame regions are split into left and right labels by their center."""
+
+        def roi(x):
+            return Mock(geometry=Mock(x=x))
+
+        assert backend.WeldCountService.split_rois_by_side(None) == ("NO", "NO")
+        assert backend.WeldCountService.split_rois_by_side([roi(0.2)]) == ("YES", "NO")
+        assert backend.WeldCountService.split_rois_by_side([roi(0.7)]) == ("NO", "YES")
+        assert backend.WeldCountService.split_rois_by_side([roi(0.2), roi(0.9)]) == ("YES", "YES")
+
+    def test_jigs_are_counted_independently(self):
+        """Test that each jig has its own weld count and can be stopped without stopping the others."""
+
+        grabbers = {}
+
+        def create_grabber(config):
+            # Jig 1 camera always shows a left flash, jig 2 camera always shows a right flash
+            grabber = Mock()
+            grabber.grab.side_effect = lambda: time.sleep(0.001) or np.full((2, 4), 1 if config["name"] == "c1" else 2)
+            grabbers[config["name"]] = grabber
+            return grabber
+
+        def ask_ml(frame, ask_left, ask_right, cancel_event=None):
+            left_label, right_label = ("YES", "NO") if frame[0, 0] == 1 else ("NO", "YES")
+            return backend.MLResult(left_label), backend.MLResult(right_label)
+
+        jig_stations = {
+            1: config.JigStationConfig(camera_config={"name": "c1"}),
+            2: config.JigStationConfig(camera_config={"name": "c2"}),
+        }
+
+        with patch.object(backend.FrameGrabber, "create_grabber", side_effect=create_grabber), patch.object(
+            backend.camera_config, "jig_stations", jig_stations
+        ), patch.object(self.service, "_ask_ml", side_effect=ask_ml):
+            self.service.start_weld_count(part_number="Part1", jig_number=1)
+            self.service.start_weld_count(part_number="Part2", jig_number=2)
+            time.sleep(0.2)
+
+            self.service.stop_weld_count(jig_number=1, wait=True)
+            assert not self.service.sessions[1].is_running
+            assert self.service.sessions[2].is_running
+
+            self.service.stop_weld_count(wait=True)
+            self.service.camera_pool.stop()
+
+        jig_1_data = self.service.get_weld_data(jig_number=1)
+        jig_2_data = self.service.get_weld_data(jig_number=2)
+        assert (jig_1_data["partNumber"], jig_1_data["leftWeldCount"], jig_1_data["rightWeldCount"]) == ("Part1", 1, 0)
+        assert (jig_2_data["partNumber"], jig_2_data["leftWeldCount"], jig_2_data["rightWeldCount"]) == ("Part2", 0, 1)
+        assert self.service.get_weld_data()["jigNumber"] == 2
+
+    def test_stop_cancels_pending_image_queries(self):
+        """Test that stopping returns right away and cancels the wait for an unanswered image query."""
+
+        grabber = Mock()
+        grabber.grab.side_effect = lambda: time.sleep(0.01) or np.zeros((2, 4), dtype=np.uint8)
+
+        # The image queries are never answered
+        unanswered = Mock(id="iq_1", result=None)
+        self.service.gl.ask_async.return_value = unanswered
+        self.service.gl.get_image_query.return_value = unanswered
+        self.service.encoder = None
+
+        with patch.object(backend.FrameGrabber, "create_grabber", return_value=grabber):
+            self.service.start_weld_count(part_number="Part1", jig_number=1)
+            time.sleep(0.3)
+            session = self.service.sessions[1]
+
+            started_at = time.monotonic()
+            self.service.stop_weld_count()
+            assert time.monotonic() - started_at < 0.05
+
+            session.thread.join(timeout=0.5)
+            assert not session.thread.is_alive()
+            self.service.gl.wait_for_ml_result.assert_not_called()
+
+        # The ML slots of the cancelled queries are freed
+        for _ in range(backend.app_config.max_concurrent_ml_requests):
+            assert self.service.ml_semaphore.acquire(timeout=0.5)
+
+    def test_wait_for_weld_data(self):
+        """Test that weld data is returned on count changes and None is returned when nothing changed in time."""
+
+        session = backend.WeldCountSession(jig_number=1, part_number="Part1")
+        self.service.sessions[1] = session
+
+        weld_data = self.service.wait_for_weld_data(jig_number=1, timeout_sec=0.05)
+        assert weld_data["leftWeldCount"] == 0
+        assert self.service.wait_for_weld_data(jig_number=1, since_version=weld_data["version"], timeout_sec=0.05) is None
+
+        with session.lock:
+            self.service._publish_weld_data(session, left_weld_count=1)
+        weld_data = self.service.wait_for_weld_data(jig_number=1, since_version=weld_data["version"], timeout_sec=0.05)
+        assert weld_data["leftWeldCount"] == 1
+
+        # Changes of another jig do not return the same weld data again
+        other_session = backend.WeldCountSession(jig_number=2, part_number="Part2")
+        self.service._notify_weld_data_changed(other_session, other_session.weld_data)
+        assert self.service.wait_for_weld_data(jig_number=1, since_version=weld_data["version"], timeout_sec=0.05) is None
+
+    def test_weld_data_snapshots(self):
+        """Test that weld data is published as immutable snapshots, versioned by count and part number changes."""
+
+        session = backend.WeldCountSession(jig_number=1, part_number="Part1")
+        self.service.sessions[1] = session
+        snapshot = session.weld_data
+
+        with self.assertRaises(AttributeError):
+            snapshot.left_weld_count = 1
+
+        with session.lock:
+            self.service._publish_weld_data(session, left_weld_count=1)
+        version = session.weld_data.version
+        assert version > snapshot.version and snapshot.left_weld_count == 0
+
+        # Frame statistics replace the snapshot without a new version
+        with session.lock:
+            self.service._publish_weld_data(session, frame_age_sec=0.2)
+        assert session.weld_data.version == version
+        assert self.service.get_weld_data(jig_number=1, since_version=version) is None
+
+        with session.lock:
+            self.service._publish_weld_data(session, right_weld_count=1)
+        weld_data = self.service.get_weld_data(jig_number=1, since_version=version)
+        assert (weld_data["leftWeldCount"], weld_data["rightWeldCount"], weld_data["frameAgeSec"]) == (1, 1, 0.2)
+        assert weld_data["version"] > version
+
+    def test_failed_frames_are_queued_and_reconciled(self):
+        """Test that frames are queued during an outage and their replayed results are merged into the counts."""
+
+        session = backend.WeldCountSession(jig_number=1, part_number="Part1")
+        self.service.sessions[1] = session
+        frame = np.zeros((8, 16), dtype=np.uint8)
+
+        # Queue not watched by the replay thread, results are counted by hand below
+        self.service.ml_replay_queue = backend.MLReplayQueue(os.path.join(self.temp_dir.name, "queue"), max_frames=10, max_bytes=10_000_000)
+
+        with patch.object(self.service, "_ask_ml", side_effect=ConnectionError("unreachable")) as ask_ml:
+            assert self.service._ask_ml_or_queue(session, frame, 2.0, True, True) is None
+            assert self.service._ask_ml_or_queue(session, frame, 2.5, True, True) is None
+            # Once the outage is detected frames are queued without asking ML
+            ask_ml.assert_called_once()
+
+        metrics = self.service.ml_replay_queue.get_metrics()
+        assert (metrics["queuedFrames"], metrics["outage"]) == (2, True)
+        assert self.service.ml_replay_queue.load(self.service.ml_replay_queue.entries[0]).shape[:2] == (4, 8)
+
+        no, yes = backend.MLResult("NO"), backend.MLResult("YES", "iq_2", 0.8)
+        session.is_running = True
+        self.service._count_result(session, 1.0, no, no)
+        self.service._count_result(session, 3.0, no, no)
+        self.service._count_result(session, 4.0, yes, no)
+        assert session.weld_data.left_weld_count == 1
+
+        # The replayed frame shows a separate flash before the one already counted
+        self.service._count_result(session, 2.0, yes, no)
+        assert session.weld_data.left_weld_count == 2
+        self.service._count_result(session, 5.0, yes, no)
+        assert session.weld_data.left_weld_count == 2
+
+        self.service.event_log.flush()
+        assert [event["timestamp"] for event in self.service.event_log.query(jig_number=1)] == [2.0, 4.0]
+
+        # Flashes replayed into a stopped weld count are only logged
+        session.is_running = False
+        self.service._merge_results(session, [(2.2, no, no), (2.3, yes, no)])
+        assert session.weld_data.left_weld_count == 2
+        self.service.event_log.flush()
+        assert [event["timestamp"] for event in self.service.event_log.query(jig_number=1)] == [2.0, 2.3, 4.0]
+
+    def test_only_unreachable_detector_starts_an_outage(self):
+        """Test that unanswered queries only queue their frame and other errors start an outage after several in a row."""
+
+        session = backend.WeldCountSession(jig_number=1, part_number="Part1")
+        frame = np.zeros((8, 16), dtype=np.uint8)
+        replay_queue = backend.MLReplayQueue(os.path.join(self.temp_dir.name, "queue"), max_frames=10, max_bytes=10_000_000)
+        self.service.ml_replay_queue = replay_queue
+        self.service.gl = Mock()
+        self.service.ml_ready.set()
+
+        with patch.object(self.service, "_wait_for_ml_result", return_value=Mock(id="iq_1", result=None)):
+            for captured_at in range(5):
+                assert self.service._ask_ml_or_queue(session, frame, float(captured_at), True, True) is None
+        assert (len(replay_queue.entries), replay_queue.is_outage) == (5, False)
+
+        with patch.object(self.service, "_ask_ml", side_effect=ValueError("bad answer")):
+            for captured_at in range(backend.MLReplayQueue.OUTAGE_CONSECUTIVE_FAILURES - 1):
+                self.service._ask_ml_or_queue(session, frame, float(captured_at), True, True)
+            assert not replay_queue.is_outage
+            self.service._ask_ml_or_queue(session, frame, 10.0, True, True)
+        assert replay_queue.is_outage
+
+    def test_weld_count_waits_for_the_groundlight_client(self):
+        """Test that without the replay queue frames are only sent to ML once the Groundlight client is ready."""
+
+        grabber = Mock()
+        grabber.grab.side_effect = lambda: time.sleep(0.01) or np.zeros((8, 16), dtype=np.uint8)
+        self.service.ml_replay_queue = None
+        self.service.ml_ready.clear()
+        asked = threading.Event()
+
+        with patch.object(backend.FrameGrabber, "create_grabber", return_value=grabber), patch.object(
+            self.service, "_ask_ml", side_effect=lambda *args, **kwargs: asked.set() or (backend.MLResult("NO"), backend.MLResult("NO"))
+        ):
+            self.service.start_weld_count(part_number="Part1", jig_number=1)
+            assert not asked.wait(0.3)
+            self.service.ml_ready.set()
+            assert asked.wait(2)
+            self.service.stop_weld_count(wait=True)
+
+    def test_weld_counts_of_removed_jigs_are_stopped(self):
+        """Test that a camera configuration without a jig stops its weld count before its camera stream."""
+
+        grabber = Mock()
+        grabber.grab.side_effect = lambda: time.sleep(0.01) or np.zeros((8, 16), dtype=np.uint8)
+        with patch.object(backend.FrameGrabber, "create_grabber", return_value=grabber), patch.object(self.service, "_ask_ml"):
+            self.service.start_weld_count(part_number="Part1", jig_number=1)
+            session = self.service.sessions[1]
+
+            jig_stations = {jig_number: station for jig_number, station in backend.camera_config.jig_stations.items() if jig_number != 1}
+            with patch.object(backend.camera_config, "jig_stations", jig_stations):
+                self.service.reconfigure_cameras()
+
+        assert not session.is_running and not session.thread.is_alive()
+        assert 1 not in self.service.camera_pool.streams
+
+    def test_frames_are_queued_at_the_outage_rate(self):
+        """Test that frames are queued at the outage sample rate instead of the camera rate during an outage."""
+
+        grabber = Mock()
+        grabber.grab.side_effect = lambda: time.sleep(0.01) or np.zeros((8, 16), dtype=np.uint8)
+        self.service.ml_replay_queue = backend.MLReplayQueue(os.path.join(self.temp_dir.name, "queue"), max_frames=100, max_bytes=10_000_000)
+        self.service.ml_replay_queue.mark_outage()
+
+        with patch.object(backend.FrameGrabber, "create_grabber", return_value=grabber), patch.object(
+            backend.app_config.ml_replay_queue, "outage_sample_rate_hz", 4.0
+        ), patch.object(self.service, "_ask_ml") as ask_ml:
+            self.service.start_weld_count(part_number="Part1", jig_number=1)
+            time.sleep(0.6)
+            self.service.stop_weld_count(wait=True)
+
+        ask_ml.assert_not_called()
+        assert 2 <= self.service.ml_replay_queue.get_metrics()["queuedFrames"] <= 3
+
+    def test_merged_results_are_recounted_from_checkpoints(self):
+        """Test that merging replayed frames recounts like a full recount and never lowers a shown count."""
+
+        with patch.object(backend.app_config.debouncer, "max_state", 2), patch.object(backend.app_config.debouncer, "on_threshold", 2):
+            session = backend.WeldCountSession(jig_number=1, part_number="Part1")
+        session.is_running = True
+        no, yes = backend.MLResult("NO"), backend.MLResult("YES")
+
+        # Flashes of two "YES" frames every 10 frames
+        for captured_at in range(300):
+            self.service._count_result(session, float(captured_at), yes if captured_at % 10 in (0, 1) else no, no)
+        assert session.weld_data.left_weld_count == 30
+        assert len(session.checkpoints) == 3
+
+        def assert_recounted(results):
+            full_recount = FlashDebouncer(channels=2, max_state=2, on_threshold=2)
+            for _, left_ml, right_ml in results:
+                full_recount.update(*self.service._debouncer_inputs(left_ml, right_ml))
+            assert session.debouncer.counts.tolist() == full_recount.counts.tolist()
+
+        # A "NO" frame splits the flash at 150 and a separate flash is found at 255, the shown count is not lowered
+        self.service._merge_results(session, [(150.5, no, no), (255.3, yes, no), (255.6, yes, no)])
+        assert_recounted(session.results)
+        assert len(session.results) == 303 and len(session.checkpoints) == 3
+        assert session.debouncer.counts.tolist() == [30, 0]
+        assert session.weld_data.left_weld_count == 30
+
+        self.service._merge_results(session, [(265.3, yes, no), (265.6, yes, no)])
+        assert_recounted(session.results)
+        assert session.weld_data.left_weld_count == 31
+
+    def test_ml_replay_queue_drops_oldest_frames(self):
+        """Test that the replay queue keeps only the newest frames within its limits."""
+
+        replay_queue = backend.MLReplayQueue(os.path.join(self.temp_dir.name, "queue"), max_frames=2, max_bytes=10_000_000)
+        session = backend.WeldCountSession(jig_number=1, part_number="Part1")
+        for captured_at in [1.0, 2.0, 3.0]:
+            replay_queue.put(session, np.zeros((8, 16, 3), dtype=np.uint8), captured_at, True, False)
+
+        assert [entry.captured_at for entry in replay_queue.entries] == [2.0, 3.0]
+        assert len(os.listdir(replay_queue.directory)) == 2
+        assert replay_queue.get_metrics()["droppedTotal"] == 1
+
+        replay_queue.remove(replay_queue.wait_for_entry(timeout=0), replayed=True)
+        assert replay_queue.get_metrics()["queuedBytes"] == replay_queue.entries[0].size
+
+
+class TestPrinterService(unittest.TestCase):
+    # Answer of a Zebra printer to ~HS, three status strings between STX and ETX
+    HOST_STATUS = b"\x02030,0,0,0245,000,0,0,0,000,0,0,0\x03\r\n\x02000,0,0,0,0,2,4,0,00000000,1,000\x03\r\n\x021234,0\x03\r\n"
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+        # Local stand-in for the printer on port 9100
+        self.printer = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.printer.bind(("127.0.0.1", 0))
+        self.printer.listen()
+
+    def tearDown(self):
+        self.printer.close()
+        self.temp_dir.cleanup()
+
+    def create_service(self, port):
+        with patch.object(backend, "data_dir", self.temp_dir.name), patch.object(backend.app_config.printer, "printer_ip", "127.0.0.1"), patch.object(
+            backend.app_config.printer, "printer_port", port
+        ):
+            return backend.PrinterService()
+
+    def accept(self):
+        """Accept the connection of the service and answer its host status requests in the background like a printer.
+
+        The printer stops answering, as after a power cycle, when the returned event is cleared.
+        """
+
+        connection, _ = self.printer.accept()
+        received = []
+        answering = threading.Event()
+        answering.set()
+
+        def serve():
+            while chunk := connection.recv(4096):
+                received.append(chunk)
+                for _ in range(chunk.count(b"~HS") if answering.is_set() else 0):
+                    connection.sendall(self.HOST_STATUS)
+
+        threading.Thread(target=serve, daemon=True).start()
+        return connection, received, answering
+
+    def printed(self, received):
+        return b"".join(received).replace(b"~HS", b"")
+
+    def wait_for_status(self, service, job_id, status):
+        for _ in range(100):
+            if service.get_job_status(job_id)["status"] == status:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_jobs_share_one_connection(self):
+        """Test that queued tags are printed in order over a single persistent connection."""
+
+        service = self.create_service(self.printer.getsockname()[1])
+        first_job_id = service.submit_job("^XA^FDOne^FS^XZ")
+        second_job_id = service.submit_job("^XA^FDTwo^FS^XZ")
+
+        connection, received, _ = self.accept()
+        assert self.wait_for_status(service, second_job_id, "printed")
+        assert service.get_job_status(first_job_id)["status"] == "printed"
+        assert self.printed(received) == f"{service.tag_format}^XA^FDOne^FS^XZ^XA^FDTwo^FS^XZ".encode()
+        assert os.listdir(service.spool_dir) == []
+        connection.close()
+
+    def test_spooled_jobs_survive_restart(self):
+        """Test that jobs that could not be printed are loaded from disk and printed after a restart."""
+
+        # Nothing listens on this port, so the job keeps retrying
+        unused = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        unused.bind(("127.0.0.1", 0))
+        service = self.create_service(unused.getsockname()[1])
+        job_id = service.submit_job("^XA^FDOne^FS^XZ")
+        assert self.wait_for_status(service, job_id, "retrying")
+        unused.close()
+
+        restarted_service = self.create_service(self.printer.getsockname()[1])
+        connection, received, _ = self.accept()
+        assert self.wait_for_status(restarted_service, job_id, "printed")
+        assert self.printed(received) == f"{restarted_service.tag_format}^XA^FDOne^FS^XZ".encode()
+        connection.close()
+
+    def test_unanswered_connection_is_replaced(self):
+        """Test that a connection the printer stopped answering on is replaced, as after a power cycle."""
+
+        service = self.create_service(self.printer.getsockname()[1])
+        service.printer_timeout = 0.2
+        first_job_id = service.submit_job("^XA^FDOne^FS^XZ")
+        stale_connection, _, answering = self.accept()
+        assert self.wait_for_status(service, first_job_id, "printed")
+
+        # The old connection stays open but the printer does not answer on it anymore
+        answering.clear()
+        second_job_id = service.submit_job("^XA^FDTwo^FS^XZ")
+        connection, received, _ = self.accept()
+        assert self.wait_for_status(service, second_job_id, "printed")
+        assert self.printed(received) == f"{service.tag_format}^XA^FDTwo^FS^XZ".encode()
+        assert service.get_job_status(second_job_id)["attempts"] == 1
+
+        stale_connection.close()
+        connection.close()
+
+    def test_unanswered_job_is_not_resent(self):
+        """Test that a tag sent to a printer that does not answer status requests is marked unconfirmed, not sent again."""
+
+        service = self.create_service(self.printer.getsockname()[1])
+        service.printer_timeout = 0.2
+        job_id = service.submit_job("^XA^FDOne^FS^XZ")
+        connection, received, answering = self.accept()
+        answering.clear()
+
+        assert self.wait_for_status(service, job_id, "unconfirmed")
+        assert service.get_job_status(job_id)["attempts"] == 1
+        assert self.printed(received) == f"{service.tag_format}^XA^FDOne^FS^XZ".encode()
+        assert os.listdir(service.spool_dir) == []
+        connection.close()
+
+    def test_job_fails_after_max_attempts(self):
+        """Test that a job that cannot be sent gives up after the last attempt and keeps its spool file aside."""
+
+        unused = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        unused.bind(("127.0.0.1", 0))
+        with patch.object(backend.PrinterService, "MAX_ATTEMPTS", 2), patch.object(backend.PrinterService, "RETRY_BACKOFF_MIN_SEC", 0.01):
+            service = self.create_service(unused.getsockname()[1])
+            job_id = service.submit_job("^XA^FDOne^FS^XZ")
+            assert self.wait_for_status(service, job_id, "failed")
+        unused.close()
+
+        assert service.get_job_status(job_id)["attempts"] == 2
+        assert os.listdir(service.spool_dir) == [f"{job_id}.json.failed"]
+
+    def test_print_tags(self):
+        """Test that a batch of tags recalls the stored format with only the variable fields, in one job."""
+
+        service = self.create_service(self.printer.getsockname()[1])
+        tag = dict(shift=1, jig=2, part_number="Part1", left_count=3, right_count=4, left_welder="Al", right_welder="Bo")
+        job_id = service.print_tags([tag, {**tag, "part_number": "Part2"}])
+
+        connection, received, _ = self.accept()
+        assert self.wait_for_status(service, job_id, "printed")
+        connection.close()
+        data = self.printed(received).decode()
+
+        assert data.startswith("^XA^DFR:WELDTAG.ZPL^FS")
+        tags = data[len(service.tag_format) :].split("^XZ")[:-1]
+        assert len(tags) == 2
+        assert tags[0].startswith("^XA^XFR:WELDTAG.ZPL^FS^FN1^FDDate: ")
+        assert "^FN4^FDPart1^FS" in tags[0] and "^FN4^FDPart2^FS" in tags[1]
+        assert "^FN7^FD7^FS" in tags[0]
+
+
+class TestShiftService(unittest.TestCase):
+    def test_rollups(self):
+        """Test that completed parts are rolled up by shift and jig with their rates."""
+
+        service = backend.ShiftService()
+        service.start_part(jig_number=1, started_at=1000.0)
+        service.update_stats("Part1", 1, 1, 2, 2, actual_left_welds=2, actual_right_welds=2, completed_at=1060.0)
+        service.start_part(jig_number=1, started_at=1100.0)
+        service.update_stats("Part1", 1, 1, 2, 2, actual_left_welds=2, actual_right_welds=1, completed_at=1180.0)
+        # Reprinted tag without a new start
+        service.update_stats("Part2", jig_number=2, shift_number=1, actual_left_welds=1, actual_right_welds=1, completed_at=1240.0)
+
+        stats = service.get_rollups()
+        assert stats["total"]["parts"] == 3
+        assert stats["shifts"]["1"]["partsPerHour"] == 2 * 3600 / 180
+        assert stats["jigs"]["1"]["mismatchRate"] == 0.5
+        assert stats["jigs"]["1"]["meanCycleTimeSec"] == 70.0
+        assert stats["jigs"]["2"]["mismatchRate"] is None
+        assert stats["parts"]["Part1"]["leftWelds"] == 4
+        assert service.get_stats() == {"Part1": 2, "Part2": 1}
+
+
+class TestPartNumberIndex(unittest.TestCase):
+    def test_search(self):
+        """Test prefix and substring search with pagination."""
+
+        index = backend.PartNumberIndex(["B-100", "a-100", "A-200", "X-A10", "C-3"])
+
+        assert index.search("") == (["a-100", "A-200", "B-100", "C-3", "X-A10"], 5)
+        assert index.search("a") == (["a-100", "A-200", "X-A10"], 3)  # Prefix matches first
+        assert index.search("100") == (["a-100", "B-100"], 2)
+        assert index.search("-10", offset=1, limit=1) == (["B-100"], 2)
+        assert index.search("zzz") == ([], 0)
+
+
+class TestGoogleAPIService(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def create_service(self):
+        service = backend.GoogleAPIService()
+        service.enabled = True
+        service.snapshot_path = os.path.join(self.temp_dir.name, "part_number_database.json")
+        return service
+
+    def test_start_fails_with_invalid_credentials(self):
+        """Test that a start with invalid credentials raises so it is retried, and no refresh thread is started."""
+
+        service = self.create_service()
+        service.service_account = {}
+
+        with self.assertRaises(RuntimeError):
+            service.start()
+        assert service.thread is None
+        assert not service.refresh_part_number_database()
+
+    def test_refresh_part_number_database(self):
+        """Test that the cache is only rebuilt when the sheet contents change and kept when the fetch fails."""
+
+        service = self.create_service()
+        service.sheet = Mock()
+        execute = service.sheet.values.return_value.get.return_value.execute
+        execute.return_value = {"values": [["Part1", "5", "2"], ["Part2", "x"]]}
+
+        assert service.get_cache_age() is None
+        assert service.refresh_part_number_database()
+        database = service.get_part_number_database()
+        assert database == {"Part1": {"Left Weld Count": 5, "Right Weld Count": 2}, "Part2": {"Left Weld Count": 0, "Right Weld Count": 0}}
+        assert service.get_cache_age() < 1
+
+        assert service.refresh_part_number_database()
+        assert service.get_part_number_database() is database
+
+        execute.side_effect = Exception("Network error")
+        assert not service.refresh_part_number_database()
+        assert service.get_part_number_database() is database
+
+    def test_snapshot(self):
+        """Test that a refreshed database is loaded from the snapshot without fetching the sheet."""
+
+        service = self.create_service()
+        service.sheet = Mock()
+        service.sheet.values.return_value.get.return_value.execute.return_value = {"values": [["Part1", "5", "2"]]}
+        assert service.refresh_part_number_database()
+
+        restarted_service = self.create_service()
+        assert restarted_service.load_snapshot()
+        assert restarted_service.get_part_number_database() == service.get_part_number_database()
+        assert restarted_service.database_hash == service.database_hash
+        assert restarted_service.get_cache_age() < 1
+
+
+class TestConfigWatcher(unittest.TestCase):
+    def test_applies_valid_changes(self):
+        """Test that valid changes of the configuration file are applied in place and invalid ones are ignored."""
+
+        with tempfile.TemporaryDirectory() as temp_dir, patch.object(config, "app_config", config.app_config.model_copy()):
+            path = os.path.join(temp_dir, "config.json")
+            watcher = config.ConfigWatcher(path)
+            listener = Mock()
+            watcher.add_listener(listener)
+            app_config = config.app_config
+
+            new_app_config = {**app_config.model_dump(), "pipeline_depth": 3}
+            with open(path, "w") as f:
+                json.dump({"app": new_app_config}, f)
+
+            assert watcher.check()
+            assert config.app_config is app_config and app_config.pipeline_depth == 3
+            listener.assert_called_once_with("app", {"pipeline_depth": (1, 3)})
+
+            # Unchanged file is not reloaded
+            assert not watcher.check()
+
+            with open(path, "w") as f:
+                json.dump({"app": {**new_app_config, "pipeline_depth": 0}}, f)
+            os.utime(path, ns=(0, 0))
+
+            assert not watcher.check()
+            assert app_config.pipeline_depth == 3
+            listener.assert_called_once()
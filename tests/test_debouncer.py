@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+from weld import debouncer
+
+
+class TestFlashDebouncer(unittest.TestCase):
+    def test_default_counts_every_yes_after_no(self):
+        """Test that the default settings count each run of "YES" frames as one flash."""
+
+        flash_debouncer = debouncer.FlashDebouncer(channels=2)
+
+        assert flash_debouncer.update([True, False]).tolist() == [True, False]
+        assert flash_debouncer.update([True, True]).tolist() == [False, True]
+        assert flash_debouncer.update([False, False]).tolist() == [False, False]
+        assert flash_debouncer.update([True, False]).tolist() == [True, False]
+        assert flash_debouncer.counts.tolist() == [2, 1]
+
+    def test_hysteresis_filters_single_frames(self):
+        """Test that a single false "YES" and a single dropped "YES" frame do not change the count."""
+
+        labels = [1, 0, 0, 1, 1, 0, 1, 1, 0, 0, 0]
+        counts = debouncer.replay(np.array(labels, dtype=bool)[:, None], max_state=3, on_threshold=2, off_threshold=0)
+        assert counts.tolist() == [1]
+
+    def test_confidence_weighted(self):
+        """Test that low confidence labels move the counter less than confident ones."""
+
+        flash_debouncer = debouncer.FlashDebouncer(channels=2, max_state=2, on_threshold=1, confidence_weighted=True)
+        flash_debouncer.update([True, True], [0.6, 1.0])
+        assert flash_debouncer.active.tolist() == [False, True]
+        assert np.allclose(flash_debouncer.state, [0.2, 1.0])
+
+        # Unknown confidence counts as a full step
+        flash_debouncer.update([True, False], [np.nan, np.nan])
+        assert flash_debouncer.active.tolist() == [True, False]
+
+    def test_evaluate(self):
+        """Test that settings are ranked against the expected counts of recorded sequences."""
+
+        sequences = [
+            {"labels": [True, False, True, True, False], "confidences": [0.9] * 5, "expected": 1},
+            {"labels": [True, True, False, False, True, True], "confidences": [0.9] * 6, "expected": 2},
+        ]
+        settings = [
+            {"max_state": 1, "on_threshold": 1, "off_threshold": 0, "confidence_weighted": False},
+            {"max_state": 2, "on_threshold": 2, "off_threshold": 0, "confidence_weighted": False},
+        ]
+
+        results = debouncer.evaluate(sequences, settings)
+        assert [result["accuracy"] for result in results] == [0.5, 1.0]
+        assert results[0]["mean_abs_error"] == 0.5
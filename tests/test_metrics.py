@@ -0,0 +1,32 @@
+import unittest
+
+from weld import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_render(self):
+        """Test that counters and histograms are rendered in the Prometheus text format."""
+
+        registry = metrics.MetricsRegistry()
+        counter = metrics.Counter("test_flashes_total", "Detected flashes", ("side",), registry=registry)
+        histogram = metrics.Histogram("test_grab_seconds", "Grab time", buckets=(0.01, 0.1), registry=registry)
+
+        counter.inc(side="left")
+        counter.inc(2, side="left")
+        histogram.observe(0.005)
+        histogram.observe(0.05)
+        histogram.observe(1.0)
+
+        assert counter.get(side="left") == 3
+        assert registry.render().splitlines() == [
+            "# HELP test_flashes_total Detected flashes",
+            "# TYPE test_flashes_total counter",
+            'test_flashes_total{side="left"} 3',
+            "# HELP test_grab_seconds Grab time",
+            "# TYPE test_grab_seconds histogram",
+            'test_grab_seconds_bucket{le="0.01"} 1',
+            'test_grab_seconds_bucket{le="0.1"} 2',
+            'test_grab_seconds_bucket{le="+Inf"} 3',
+            "test_grab_seconds_sum 1.055",
+            "test_grab_seconds_count 3",
+        ]
@@ -0,0 +1,33 @@
+import argparse
+import itertools
+
+from weld.debouncer import evaluate, load_label_sequences
+
+parser = argparse.ArgumentParser(description="Replay recorded weld label sequences to tune the flash debouncer settings")
+parser.add_argument("path", help="Path to the recorded label sequences (label_sequences.jsonl in the app data directory)")
+parser.add_argument("--max-state", type=float, nargs="+", default=[1, 2, 3, 4], help="Maximum states to try")
+parser.add_argument("--on-threshold", type=float, nargs="+", default=[1, 2, 3], help="On thresholds to try")
+parser.add_argument("--off-threshold", type=float, nargs="+", default=[0, 1], help="Off thresholds to try")
+parser.add_argument("--top", type=int, default=10, help="Number of best settings to show")
+args = parser.parse_args()
+
+sequences = load_label_sequences(args.path)
+
+# Only consistent settings can be evaluated
+settings = [
+    {"max_state": max_state, "on_threshold": on_threshold, "off_threshold": off_threshold, "confidence_weighted": confidence_weighted}
+    for max_state, on_threshold, off_threshold, confidence_weighted in itertools.product(
+        args.max_state, args.on_threshold, args.off_threshold, [False, True]
+    )
+    if off_threshold < on_threshold <= max_state
+]
+
+results = sorted(evaluate(sequences, settings), key=lambda result: (-result["accuracy"], result["mean_abs_error"]))
+
+print(f"Replayed {len(sequences)} sequences with {len(settings)} settings")
+print(f"{'max_state':>10} {'on':>6} {'off':>6} {'weighted':>9} {'accuracy':>9} {'mean_abs_error':>15}")
+for result in results[: args.top]:
+    print(
+        f"{result['max_state']:>10g} {result['on_threshold']:>6g} {result['off_threshold']:>6g} "
+        f"{str(result['confidence_weighted']):>9} {result['accuracy']:>9.1%} {result['mean_abs_error']:>15.2f}"
+    )
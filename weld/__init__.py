@@ -1,8 +1,9 @@
 import os
 
-from weld.app import app
-
 
 def create_app():
+    # Imported here so tools can use the weld modules without configuring and starting the app services
+    from weld.app import app
+
     weld_app = app
     return weld_app
@@ -1,16 +1,21 @@
+import json
+
 import bcrypt
-from flask import Flask, render_template, request, jsonify, redirect, url_for, current_app
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, current_app
 
-from weld import backend, config
+from weld import config, services
 
 app = Flask(__name__)
 
-"""Initialize all backend services"""
-jig_lock_service = backend.JigLockService()
-printer_service = backend.PrinterService()
-weld_count_service = backend.WeldCountService()
-shift_service = backend.ShiftService()
-google_api_service = backend.GoogleAPIService()
+"""Initialize all backend services, or connect to them in the owner process in production"""
+_services = services.get_services()
+jig_lock_service = _services["jig_lock_service"]
+printer_service = _services["printer_service"]
+weld_count_service = _services["weld_count_service"]
+shift_service = _services["shift_service"]
+google_api_service = _services["google_api_service"]
+metrics_registry = _services["metrics_registry"]
+service_readiness = _services["service_readiness"]
 
 
 def create_default_context() -> dict:
@@ -33,23 +38,73 @@ def create_default_context() -> dict:
         "ActualLeftWelds": None,
         "ActualRightWelds": None,
         "WeldStats": None,
+        "PrintJobId": None,
         "Error": None,
     }
     return context
 
 
+def stop_weld_count_for_form() -> None:
+    """Stop the weld count of the jig submitted with the form, weld counts of other jigs keep running."""
+
+    jig_number = request.form.get("jig_number")
+    if jig_number:
+        weld_count_service.stop_weld_count(jig_number=int(jig_number))
+
+
 @app.route("/api/parts", methods=["GET"])
 def get_parts():
-    """Endpoint to fetch part numbers from the database."""
-    database = google_api_service.get_updated_part_number_database()
-    return jsonify(database)
+    """Endpoint to fetch part numbers from the cached database, or to search them with `?q=`.
+
+    `?refresh=true` asks for a background refresh of the database. The `Age` header reports the cache age in seconds and
+    the `ETag` header changes only when the database contents change.
+    """
+
+    if request.args.get("refresh", default="false").lower() == "true":
+        google_api_service.request_refresh()
+
+    if "q" in request.args:
+        return search_parts()
+
+    response = jsonify(google_api_service.get_part_number_database())
+
+    cache_age = google_api_service.get_cache_age()
+    if cache_age is not None:
+        response.headers["Age"] = str(int(cache_age))
+    database_hash = google_api_service.get_database_hash()
+    if database_hash is not None:
+        response.set_etag(database_hash)
+
+    return response.make_conditional(request)
+
+
+def search_parts():
+    """Search part numbers for `/api/parts`, with the `q`, `offset` and `limit` query parameters."""
+
+    query = request.args.get("q", default="")
+    offset = max(request.args.get("offset", default=0, type=int), 0)
+    limit = min(max(request.args.get("limit", default=50, type=int), 1), 500)
+
+    parts, total = google_api_service.search_parts(query, offset=offset, limit=limit)
+    return jsonify({"parts": parts, "total": total, "offset": offset, "limit": limit})
+
+
+@app.route("/api/parts/<path:part_number>", methods=["GET"])
+def get_part(part_number: str):
+    """Endpoint to look up the weld counts of a single part number."""
+
+    part = google_api_service.get_part(part_number)
+    if part is None:
+        return jsonify({"error": "Part number not found"}), 404
+
+    return jsonify({"partNumber": part_number, **part})
 
 
 @app.route("/api/lock-status", methods=["GET"])
 def get_lock_status():
     """Endpoint to check the lock status."""
 
-    return jsonify(jig_lock_service.lock_status_json)
+    return jsonify(jig_lock_service.get_lock_status())
 
 
 @app.route("/api/password-required", methods=["GET"])
@@ -62,6 +117,17 @@ def is_password_required():
     return jsonify({"password_required": True})
 
 
+@app.route("/api/print-jobs/<job_id>", methods=["GET"])
+def get_print_job(job_id: str):
+    """Endpoint to get the status of a print job."""
+
+    job_status = printer_service.get_job_status(job_id)
+    if job_status is None:
+        return jsonify({"error": "Print job not found"}), 404
+
+    return jsonify(job_status)
+
+
 @app.route("/api/lock-status", methods=["POST"])
 def set_lock_status():
     """Endpoint to update the lock status."""
@@ -90,9 +156,86 @@ def set_lock_status():
 
 @app.route("/api/weld-data", methods=["GET"])
 def get_weld_data():
-    """Endpoint to get the weld data."""
+    """Endpoint to get the weld data, the jig is selected with the `jig` query parameter.
+
+    With the `since` query parameter, 204 No Content is returned unless the weld data version is newer.
+    """
+
+    jig_number = request.args.get("jig", type=int)
+    since_version = request.args.get("since", type=int)
 
-    return jsonify(weld_count_service.get_weld_data())
+    weld_data = weld_count_service.get_weld_data(jig_number=jig_number, since_version=since_version)
+    if weld_data is None:
+        return "", 204
+
+    return jsonify(weld_data)
+
+
+@app.route("/api/weld-data/stream", methods=["GET"])
+def stream_weld_data():
+    """Server-Sent Events endpoint that pushes the weld data of the `jig` query parameter whenever it changes."""
+
+    jig_number = request.args.get("jig", type=int)
+
+    def events():
+        version = -1
+        while True:
+            weld_data = weld_count_service.wait_for_weld_data(jig_number=jig_number, since_version=version)
+            if weld_data is None:
+                # SSE comment line to keep the connection open
+                yield ": keepalive\n\n"
+            else:
+                version = weld_data["version"]
+                yield f"data: {json.dumps(weld_data)}\n\n"
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/api/service-status", methods=["GET"])
+def get_service_status():
+    """Endpoint to get which services are still starting in the background."""
+
+    return jsonify(service_readiness.get_status())
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Endpoint to get the app metrics in the Prometheus text format."""
+
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/stats", methods=["GET"])
+def get_stats():
+    """Endpoint to get the running rollups of the completed parts by shift, jig, day and part number."""
+
+    return jsonify(shift_service.get_rollups())
+
+
+@app.route("/api/ml-replay-queue", methods=["GET"])
+def get_ml_replay_queue():
+    """Endpoint to get the backpressure metrics of the queue of frames waiting for ML replay."""
+
+    queue_metrics = weld_count_service.get_ml_replay_queue_metrics()
+    if queue_metrics is None:
+        return jsonify({"error": "ML replay queue is disabled"}), 404
+
+    return jsonify(queue_metrics)
+
+
+@app.route("/api/weld-events", methods=["GET"])
+def get_weld_events():
+    """Endpoint to query the weld event log, filtered by the `jig`, `shift`, `part`, `start` and `end` query parameters."""
+
+    events = weld_count_service.query_weld_events(
+        start=request.args.get("start", type=float),
+        end=request.args.get("end", type=float),
+        jig_number=request.args.get("jig", type=int),
+        shift_number=request.args.get("shift", type=int),
+        part_number=request.args.get("part"),
+        limit=min(request.args.get("limit", default=1000, type=int), 10000),
+    )
+    return jsonify(events)
 
 
 @app.route("/", methods=["GET", "POST"])
@@ -100,7 +243,7 @@ def index():
     """Load the index page of the website with camera preview."""
 
     context = create_default_context()
-    weld_count_service.stop_weld_count()
+    stop_weld_count_for_form()
 
     # Get total number of Jig Stations
     total_jig_stations = len(config.camera_config.jig_stations)
@@ -114,7 +257,7 @@ def part():
     """Load the part page of the website with camera preview."""
 
     context = create_default_context()
-    weld_count_service.stop_weld_count()
+    stop_weld_count_for_form()
 
     if request.method == "POST":
         left_welder = request.form.get("left_welder")
@@ -147,7 +290,7 @@ def process():
     """Load the process page of the website with ML result."""
 
     context = create_default_context()
-    weld_count_service.stop_weld_count()
+    stop_weld_count_for_form()
 
     if request.method == "POST":
         left_welder = request.form.get("left_welder")
@@ -175,7 +318,8 @@ def process():
         jig_lock_service.lock()
 
         # Start weld count ML
-        weld_count_service.start_weld_count(part_number=part_number, jig_number=int(jig_number))
+        shift_service.start_part(jig_number=int(jig_number))
+        weld_count_service.start_weld_count(part_number=part_number, jig_number=int(jig_number), shift_number=int(shift_number))
 
         return render_template("process.html", **context)
 
@@ -189,7 +333,7 @@ def review():
     """Load the process page of the website with ML result."""
 
     context = create_default_context()
-    weld_count_service.stop_weld_count()
+    stop_weld_count_for_form()
 
     if request.method == "POST":
         left_welder = request.form.get("left_welder")
@@ -229,7 +373,7 @@ def print_tag():
     """Print the receipt of the welds."""
 
     context = create_default_context()
-    weld_count_service.stop_weld_count()
+    stop_weld_count_for_form()
 
     if request.method == "POST":
         left_welder = request.form.get("left_welder")
@@ -244,7 +388,18 @@ def print_tag():
         actual_right_welds = request.form.get("actual_right_welds")
 
         # Add the welds to the database
-        shift_service.update_stats(part_number=actual_part_number)
+        shift_service.update_stats(
+            part_number=actual_part_number,
+            jig_number=int(jig_number),
+            shift_number=int(shift_number),
+            expected_left_welds=int(expected_left_welds) if expected_left_welds else None,
+            expected_right_welds=int(expected_right_welds) if expected_right_welds else None,
+            actual_left_welds=int(actual_left_welds),
+            actual_right_welds=int(actual_right_welds),
+        )
+        weld_count_service.record_label_sequence(
+            jig_number=int(jig_number), left_welds=int(actual_left_welds), right_welds=int(actual_right_welds)
+        )
 
         # Update the context with submitted data
         context.update(
@@ -266,7 +421,8 @@ def print_tag():
         # Unlock the jig
         jig_lock_service.unlock()
 
-        if not printer_service.print_tag(
+        # The tag is printed in the background, the page follows the job status
+        context["PrintJobId"] = printer_service.print_tag(
             shift=int(shift_number),
             jig=int(jig_number),
             part_number=part_number,
@@ -274,8 +430,7 @@ def print_tag():
             right_count=int(actual_right_welds),
             left_welder=left_welder,
             right_welder=right_welder,
-        ):
-            context["Error"] = "Failed to print the tag. Please try again."
+        )
 
         return render_template("print.html", **context)
 
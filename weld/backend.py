@@ -1,14 +1,26 @@
+import os
 import json
+import time
+import uuid
+import queue
+import sqlite3
+import bisect
+import select
+import hashlib
 import socket
 import logging
 import datetime
 import threading
-from groundlight import Groundlight
+from collections import deque
+from typing import Callable
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import cv2
+import numpy as np
 from framegrab import FrameGrabber
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
 
-from weld.config import app_config, camera_config, database_config
+from weld.config import app_config, camera_config, database_config, data_dir
+from weld import metrics
+from weld.debouncer import FlashDebouncer
 
 logger = logging.getLogger(__name__)
 
@@ -20,34 +32,481 @@ except Exception:
     GPIO_AVAILABLE = False
     logger.warning("RPi.GPIO not available on this platform. GPIO functions will not work.")
 
+# Metrics served from /metrics
+GRAB_SECONDS = metrics.Histogram("weld_camera_grab_seconds", "Time to grab a frame from the jig camera", ("jig",))
+GRAB_FAILURES = metrics.Counter("weld_camera_grab_failures_total", "Failed frame grabs from the jig camera", ("jig",))
+ENCODE_SECONDS = metrics.Histogram("weld_frame_encode_seconds", "Time to downscale and encode an image as JPEG", ("stage",))
+ML_PAYLOAD_BYTES = metrics.Histogram(
+    "weld_ml_payload_bytes", "Size of the JPEG images sent to ML", buckets=(10_000, 25_000, 50_000, 100_000, 250_000, 500_000, 1_000_000)
+)
+ML_REQUEST_SECONDS = metrics.Histogram("weld_ml_request_seconds", "ML round trip from image query to result", ("side",))
+ML_FAILURES = metrics.Counter("weld_ml_failures_total", "Failed ML requests", ("jig",))
+LOOP_PERIOD_SECONDS = metrics.Histogram("weld_count_loop_period_seconds", "Time between consecutive counted frames of a jig", ("jig",))
+FLASHES = metrics.Counter("weld_flashes_total", "Detected weld flashes", ("jig", "side"))
+PRINTER_FAILURES = metrics.Counter("weld_printer_failures_total", "Failed attempts to send a print job to the printer")
 
-class SaturatingCounter:
-    """2-state 1-bit Saturating Counter."""
 
-    def __init__(self):
-        # Initialize the counter, increase states when needed
-        self.state = 0  # Counter starts at 0
-        self.max_state = 1  # Saturates at 1
-        self.min_state = 0  # Lower bound at 0
+class FrameActivityGate:
+    """Cheap on-device check for activity on one side of the jig, used to skip ML requests on idle frames.
+
+    A side is considered active when its downsampled luminance changed since the previous frame (frame differencing)
+    or when enough of its pixels are bright enough to be a weld arc.
+    """
+
+    def __init__(self, motion_threshold: float, brightness_threshold: int, bright_pixel_ratio: float, stride: int = 4):
+        self.motion_threshold = motion_threshold
+        self.brightness_threshold = brightness_threshold
+        self.bright_pixel_ratio = bright_pixel_ratio
+        self.stride = stride
+        self.previous_luma = None
+
+        # Stats
+        self.frames_seen = 0
+        self.frames_skipped = 0
+
+    def _luma(self, frame: np.ndarray) -> np.ndarray:
+        """Get the downsampled luminance of a BGR or grayscale frame."""
+
+        sampled = frame[:: self.stride, :: self.stride]
+        if sampled.ndim == 2:
+            return sampled.astype(np.float32)
+
+        # ITU-R BT.601 luma weights in BGR order
+        return sampled[..., :3].astype(np.float32) @ np.array([0.114, 0.587, 0.299], dtype=np.float32)
+
+    def check(self, frame: np.ndarray) -> bool:
+        """Check if the frame should be sent to ML.
+
+        Args:
+            frame (np.ndarray): Half-frame for one side of the jig.
+
+        Returns:
+            bool: True if the side is active and should be sent to ML, False if it can be skipped as "NO".
+        """
+
+        luma = self._luma(frame)
+        previous_luma = self.previous_luma
+        self.previous_luma = luma
+        self.frames_seen += 1
+
+        if previous_luma is None or previous_luma.shape != luma.shape:
+            return True
+
+        if np.mean(np.abs(luma - previous_luma)) >= self.motion_threshold:
+            return True
+
+        if np.mean(luma >= self.brightness_threshold) >= self.bright_pixel_ratio:
+            return True
+
+        self.frames_skipped += 1
+        return False
+
+    @property
+    def skip_ratio(self) -> float:
+        """Ratio of frames that were skipped by the gate."""
+
+        return self.frames_skipped / self.frames_seen if self.frames_seen else 0.0
+
+
+class AdaptiveSampler:
+    """Paces the frames sent to ML, slowly while the jig is idle and at the maximum rate as soon as it is active.
+
+    Frames are read at most at the maximum rate so activity is noticed quickly even while idle, but only every
+    `1 / min_rate_hz` seconds a frame is sent to ML until activity is seen again.
+    """
+
+    def __init__(self, min_rate_hz: float | None, max_rate_hz: float | None, idle_after_sec: float) -> None:
+        self.active_interval = 1 / max_rate_hz if max_rate_hz else 0.0
+        self.idle_interval = 1 / min_rate_hz if min_rate_hz else self.active_interval
+        self.idle_after_sec = idle_after_sec
+
+        # A new weld count starts active since welding usually starts right away
+        self.last_active_at = time.monotonic()
+        self.last_read_at = None
+        self.last_sample_at = None
+
+    def read_wait_sec(self) -> float:
+        """Time in seconds until the next frame may be read."""
+
+        if self.last_read_at is None:
+            return 0.0
+
+        return max(0.0, self.last_read_at + self.active_interval - time.monotonic())
+
+    @property
+    def is_idle(self) -> bool:
+        """Whether no activity was seen for `idle_after_sec`."""
+
+        return time.monotonic() - self.last_active_at >= self.idle_after_sec
+
+    def should_sample(self, active: bool) -> bool:
+        """Record a read frame and decide if it is sent to ML.
+
+        Args:
+            active (bool): Whether the frame or the counters show weld activity.
+
+        Returns:
+            bool: True if the frame should be sent to ML.
+        """
+
+        now = time.monotonic()
+        self.last_read_at = now
+        if active:
+            self.last_active_at = now
+
+        interval = self.idle_interval if self.is_idle else self.active_interval
+        if self.last_sample_at is not None and now - self.last_sample_at < interval:
+            return False
+
+        self.last_sample_at = now
+        return True
+
+
+class FrameRingBuffer:
+    """Fixed-size ring buffer of preallocated frames with their capture timestamps.
+
+    The writer copies each frame into the next slot so no array is allocated per frame. Readers copy a slot out without
+    blocking the writer and check afterwards that the writer did not wrap around onto that slot while copying.
+    """
+
+    def __init__(self, size: int = 3) -> None:
+        self.size = size
+        self.frames = None
+        self.timestamps = np.zeros(size)
+
+        # Number of frames written, the latest frame is in slot (seq - 1) % size
+        self.seq = 0
+
+    def write(self, frame: np.ndarray, timestamp: float) -> None:
+        """Copy the frame into the next slot.
+
+        Args:
+            frame (np.ndarray): Frame to store.
+            timestamp (float): Capture timestamp of the frame (seconds since the epoch).
+        """
+
+        # Slots are allocated on the first frame, and again only if the camera resolution changes
+        if self.frames is None or self.frames.shape[1:] != frame.shape or self.frames.dtype != frame.dtype:
+            self.frames = np.empty((self.size, *frame.shape), dtype=frame.dtype)
+
+        slot = self.seq % self.size
+        np.copyto(self.frames[slot], frame)
+        self.timestamps[slot] = timestamp
+        self.seq += 1
+
+    def read(self, seq: int) -> tuple[np.ndarray, float] | None:
+        """Copy out the frame with the given sequence number.
+
+        Args:
+            seq (int): Sequence number of the frame, between 1 and the number of frames written.
+
+        Returns:
+            tuple[np.ndarray, float] | None: Copy of the frame and its capture timestamp, None if it was overwritten.
+        """
+
+        slot = (seq - 1) % self.size
+        frame = self.frames[slot].copy()
+        timestamp = float(self.timestamps[slot])
+
+        # The writer fills a slot before advancing seq, so it may be on our slot once it is size - 1 frames ahead
+        if self.seq - seq >= self.size - 1:
+            return None
+
+        return frame, timestamp
+
+
+class CameraStream:
+    """Long-lived connection to a jig camera.
+
+    A background reader keeps grabbing frames into a ring buffer so the stream stays open between weld counts and the
+    decoder never builds up a backlog. If grabbing fails the grabber is recreated with exponential backoff.
+    """
+
+    RECONNECT_BACKOFF_MIN_SEC = 0.5
+    RECONNECT_BACKOFF_MAX_SEC = 10.0
+    STOP_TIMEOUT_SEC = 5.0
+
+    def __init__(self, jig_number: int, camera_config: dict) -> None:
+        self.jig_number = jig_number
+        self.camera_config = camera_config
+
+        # Latest frames, readers wait on the condition for new frames
+        self.frame_buffer = FrameRingBuffer()
+        self.frame_condition = threading.Condition()
+
+        # Thread control, each reader thread has its own stop event so a reader stuck in a grab never outlives a restart
+        self.is_running = False
+        self.stop_event = None
+        self.thread = None
+        self.reconnect_requested = False
+
+    def start(self) -> None:
+        """Start the background reader if it is not running yet."""
+
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self._reader_thread, args=(self.stop_event,), name=f"camera-{self.jig_number}", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop the background reader and release the camera, waiting up to `STOP_TIMEOUT_SEC` for the reader to exit.
+
+        A reader stuck in a grab is left behind, it releases the camera once the grab returns.
+        """
+
+        self.is_running = False
+
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join(timeout=self.STOP_TIMEOUT_SEC)
+            if self.thread.is_alive():
+                logger.warning(f"Jig {self.jig_number} camera reader did not stop within {self.STOP_TIMEOUT_SEC}s")
+            self.thread = None
+
+    def reconfigure(self, camera_config: dict) -> None:
+        """Switch the stream to a new camera configuration, the reader recreates its grabber before the next frame.
+
+        Readers of the stream keep waiting for frames across the switch, so running weld counts continue on the new camera.
+
+        Args:
+            camera_config (dict): Camera configuration for FrameGrab.
+        """
+
+        self.camera_config = camera_config
+        self.reconnect_requested = True
+
+    @property
+    def frame_seq(self) -> int:
+        """Sequence number of the latest frame, 0 if no frame was grabbed yet."""
+
+        return self.frame_buffer.seq
+
+    def get_frame(self, after_seq: int, timeout: float) -> tuple[int, np.ndarray, float] | None:
+        """Get a copy of the latest frame if it is newer than the given sequence number.
+
+        Args:
+            after_seq (int): Sequence number of the last frame the caller has seen.
+            timeout (float): Time in seconds to wait for a newer frame.
+
+        Returns:
+            tuple[int, np.ndarray, float] | None: Sequence number, frame and capture timestamp, None if no newer frame
+                arrived in time.
+        """
+
+        with self.frame_condition:
+            if not self.frame_condition.wait_for(lambda: self.frame_buffer.seq > after_seq, timeout=timeout):
+                return None
+
+        # Retry with the newest frame if the writer overwrote the one being copied
+        while True:
+            seq = self.frame_buffer.seq
+            latest = self.frame_buffer.read(seq)
+            if latest is not None:
+                return seq, *latest
+
+    def _reader_thread(self, stop_event: threading.Event) -> None:
+        """Thread to keep grabbing the latest frame from the camera until stopped, reconnecting with backoff on failure."""
+
+        grabber = None
+        backoff = self.RECONNECT_BACKOFF_MIN_SEC
+
+        while not stop_event.is_set():
+            if self.reconnect_requested:
+                self.reconnect_requested = False
+                if grabber is not None:
+                    logger.info(f"Reconnecting jig {self.jig_number} camera with the new configuration")
+                    grabber.release()
+                    grabber = None
+                backoff = self.RECONNECT_BACKOFF_MIN_SEC
+
+            try:
+                if grabber is None:
+                    grabber = FrameGrabber.create_grabber(self.camera_config)
+                    logger.debug(f"Initialized FrameGrab with camera config: {grabber.config}")
+
+                with GRAB_SECONDS.time(jig=self.jig_number):
+                    frame = grabber.grab()
+                captured_at = time.time()
+            except Exception as e:
+                GRAB_FAILURES.inc(jig=self.jig_number)
+                logger.error(f"Failed to grab frame from jig {self.jig_number} camera, retrying in {backoff}s: {e}", exc_info=True)
+
+                if grabber is not None:
+                    grabber.release()
+                    grabber = None
+
+                stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.RECONNECT_BACKOFF_MAX_SEC)
+                continue
+
+            backoff = self.RECONNECT_BACKOFF_MIN_SEC
+
+            self.frame_buffer.write(frame, captured_at)
+
+            with self.frame_condition:
+                self.frame_condition.notify_all()
+
+        # Release the grabber before thread exit
+        if grabber is not None:
+            grabber.release()
+
+
+class CameraPool:
+    """Pool of long-lived camera streams by jig number.
+
+    The jig stations are read from the camera configuration on every lookup, so the pool follows configuration changes.
+    """
+
+    def __init__(self) -> None:
+        self.streams: dict[int, CameraStream] = {}
+        self.streams_lock = threading.Lock()
+
+    def get(self, jig_number: int) -> CameraStream:
+        """Get the running camera stream for the given jig, starting it if needed.
+
+        Args:
+            jig_number (int): Jig number of the camera.
+
+        Returns:
+            CameraStream: Camera stream of the jig.
+        """
+
+        with self.streams_lock:
+            stream = self.streams.get(jig_number)
+            if stream is None:
+                stream = CameraStream(jig_number=jig_number, camera_config=camera_config.jig_stations[jig_number].camera_config)
+                self.streams[jig_number] = stream
+
+        stream.start()
+        return stream
+
+    def warm_up(self) -> None:
+        """Open the streams of all jig cameras so the first weld count does not wait for a connection."""
+
+        for jig_number in camera_config.jig_stations:
+            self.get(jig_number)
 
-    def update(self, condition: bool) -> str:
+    def reconfigure(self) -> None:
+        """Apply a changed camera configuration, only the streams of jigs whose camera changed are touched.
+
+        Streams of changed cameras reconnect in place, streams of removed jigs are stopped and added jigs are opened. Weld
+        counts of removed jigs must be stopped first, see `WeldCountService.reconfigure_cameras`.
         """
-        Update the counter based on condition.
+
+        jig_stations = camera_config.jig_stations
+
+        with self.streams_lock:
+            removed = [self.streams.pop(jig_number) for jig_number in list(self.streams) if jig_number not in jig_stations]
+            changed = [
+                (stream, jig_stations[jig_number].camera_config)
+                for jig_number, stream in self.streams.items()
+                if jig_stations[jig_number].camera_config != stream.camera_config
+            ]
+            added = [jig_number for jig_number in jig_stations if jig_number not in self.streams]
+
+        for stream in removed:
+            logger.info(f"Stopping jig {stream.jig_number} camera, the jig was removed from the configuration")
+            stream.stop()
+
+        for stream, stream_camera_config in changed:
+            logger.info(f"Jig {stream.jig_number} camera configuration changed")
+            stream.reconfigure(stream_camera_config)
+
+        for jig_number in added:
+            logger.info(f"Opening jig {jig_number} camera")
+            self.get(jig_number)
+
+    def stop(self) -> None:
+        """Stop all camera streams."""
+
+        with self.streams_lock:
+            streams = list(self.streams.values())
+
+        for stream in streams:
+            stream.stop()
+
+
+class ServiceReadiness:
+    """Readiness of the app services that finish starting in the background.
+
+    Services are created without network calls, their slow start (e.g. connecting to Groundlight) runs concurrently in
+    background threads so the UI renders right away and shows which services are still starting. A failed start is
+    retried with exponential backoff.
+    """
+
+    STARTING = "starting"
+    READY = "ready"
+    FAILED = "failed"
+
+    RETRY_MIN_SEC = 1.0
+    RETRY_MAX_SEC = 30.0
+
+    def __init__(self) -> None:
+        self.states: dict[str, dict] = {}
+        self.threads: dict[str, threading.Thread] = {}
+        self.lock = threading.Lock()
+        self.created_at = time.perf_counter()
+
+    def start(self, name: str, start: Callable[[], None]) -> threading.Thread:
+        """Start a service in a background thread, or restart it after a configuration change.
 
         Args:
-            condition (bool): True if input == "YES", False otherwise.
+            name (str): Name of the service.
+            start (Callable[[], None]): Function that finishes starting the service, raises if it failed.
+
+        Returns:
+            threading.Thread: Thread running the start.
+        """
+
+        with self.lock:
+            # A start that is still retrying reads the configuration again on its next attempt
+            thread = self.threads.get(name)
+            if thread is not None and thread.is_alive():
+                return thread
+
+            self.states[name] = {"state": self.STARTING, "error": None, "readyAfterSec": None}
+            thread = threading.Thread(target=self._start_thread, args=(name, start), name=f"start-{name}", daemon=True)
+            self.threads[name] = thread
+            thread.start()
+
+        return thread
+
+    def _start_thread(self, name: str, start: Callable[[], None]) -> None:
+        backoff = self.RETRY_MIN_SEC
+
+        while True:
+            try:
+                start()
+                break
+            except Exception as e:
+                logger.error(f"Failed to start {name}, retrying in {backoff:.0f}s: {e}", exc_info=True)
+                with self.lock:
+                    self.states[name].update(state=self.FAILED, error=str(e))
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.RETRY_MAX_SEC)
+
+        ready_after_sec = time.perf_counter() - self.created_at
+        logger.info(f"Service {name} ready {ready_after_sec:.2f}s after startup")
+        with self.lock:
+            self.states[name].update(state=self.READY, error=None, readyAfterSec=ready_after_sec)
+
+    def get_status(self) -> dict:
+        """Get the readiness of the services started in the background.
 
         Returns:
-            str: "YES" if state >= 2, "NO" otherwise.
+            dict: State ("starting", "ready" or "failed"), last error and seconds from startup until ready by service
+                name, and whether all services are ready.
         """
 
-        if condition:  # Increment on "YES"
-            self.state = min(self.max_state, self.state + 1)
-        else:  # Decrement on "NO"
-            self.state = max(self.min_state, self.state - 1)
+        with self.lock:
+            services = {name: dict(state) for name, state in self.states.items()}
 
-        # Return the state result based on ranges
-        return "YES" if self.state >= 1 else "NO"
+        return {"ready": all(state["state"] == self.READY for state in services.values()), "services": services}
 
 
 class JigLockService:
@@ -124,150 +583,1571 @@ class JigLockService:
             logger.error(f"Failed to unlock the jig station: {e}", exc_info=True)
             return False
 
+    def get_lock_status(self) -> dict:
+        """Get the lock status.
 
-class WeldCountService:
-    """Service to send ML request to Groundlight and count the number of welds."""
+        Returns:
+            dict: Lock status dictionary with `is_locked`.
+        """
 
-    def __init__(self) -> None:
-        if app_config.edge_endpoint is not None and app_config.edge_endpoint != "" and app_config.edge_endpoint != "None":
-            logger.info(f"Using edge-endpoint: {app_config.edge_endpoint}")
-            self.gl = Groundlight(endpoint=app_config.edge_endpoint)
-        else:
-            logger.info("Using default Groundlight endpoint")
-            self.gl = Groundlight()
-        self.detector = self.gl.get_detector(id=app_config.ml_detector_id)
-        self.weld_data = {
-            "partNumber": None,
-            "leftWeldCount": 0,
-            "rightWeldCount": 0,
-        }
+        return dict(self.lock_status_json)
 
-        # Thread control
-        self.is_running = False
+
+class FrameEncoder:
+    """Downscales images to a maximum size and encodes them as JPEG for ML, in a thread pool shared by all jigs.
+
+    The SDK would encode every image itself at full resolution. Here the image is shrunk first with area interpolation
+    into a buffer that each encoder thread reuses for the same output size, and encoded from BGR directly.
+    """
+
+    def __init__(self, max_width: int | None, max_height: int | None, jpeg_quality: int, workers: int) -> None:
+        self.max_width = max_width
+        self.max_height = max_height
+        self.jpeg_quality = jpeg_quality
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="weld-encode")
+
+        # Resize buffers of each encoder thread by output shape
+        self.buffers = threading.local()
+
+    def _output_size(self, height: int, width: int) -> tuple[int, int]:
+        """Get the (height, width) of an image after downscaling it to fit the maximum size."""
+
+        scale = min(1.0, self.max_width / width if self.max_width else 1.0, self.max_height / height if self.max_height else 1.0)
+        return max(1, round(height * scale)), max(1, round(width * scale))
+
+    def encode(self, image: np.ndarray) -> bytes:
+        """Downscale and encode an image.
+
+        Args:
+            image (np.ndarray): BGR or grayscale image, may be a view into a larger frame.
+
+        Returns:
+            bytes: JPEG image.
+        """
+
+        with ENCODE_SECONDS.time(stage="ml"):
+            height, width = self._output_size(*image.shape[:2])
+            if (height, width) != image.shape[:2]:
+                buffers = getattr(self.buffers, "by_shape", None)
+                if buffers is None:
+                    buffers = self.buffers.by_shape = {}
+
+                shape = (height, width, *image.shape[2:])
+                if shape not in buffers:
+                    buffers[shape] = np.empty(shape, dtype=image.dtype)
+                image = cv2.resize(image, (width, height), dst=buffers[shape], interpolation=cv2.INTER_AREA)
+
+            success, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not success:
+                raise ValueError("Failed to encode the image as JPEG")
+
+        ML_PAYLOAD_BYTES.observe(jpeg.size)
+        return jpeg.tobytes()
+
+    def submit(self, image: np.ndarray) -> Future:
+        """Encode an image in the thread pool.
+
+        Args:
+            image (np.ndarray): BGR or grayscale image, must not be modified until it is encoded.
+
+        Returns:
+            Future: Future of the JPEG image bytes.
+        """
+
+        return self.executor.submit(self.encode, image)
+
+
+class MLResult:
+    """ML result for one side of a frame."""
+
+    def __init__(self, label: str, image_query_id: str | None = None, confidence: float | None = None) -> None:
+        self.label = label
+        self.image_query_id = image_query_id
+        self.confidence = confidence
+
+
+class UnansweredQueryError(Exception):
+    """The detector did not answer an image query in time, the detector itself is reachable."""
+
+
+class WeldEventLog:
+    """Append-only log of detected weld flashes in a local SQLite database in WAL mode.
+
+    The counting loop only puts events on a queue, a background writer thread writes them in batches so the loop never
+    waits on disk. The database and the writer are only created with the first event.
+    """
+
+    FLUSH_INTERVAL_SEC = 0.5
+    MAX_BATCH_SIZE = 500
+
+    # Events waiting to be written, newer events are dropped while the database cannot be written for a long time
+    MAX_QUEUED_EVENTS = 100_000
+
+    RETRY_BACKOFF_MIN_SEC = 1.0
+    RETRY_BACKOFF_MAX_SEC = 30.0
+
+    COLUMNS = ["timestamp", "jig_number", "side", "shift_number", "part_number", "session_id", "image_query_id", "confidence"]
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.event_queue = queue.Queue(maxsize=self.MAX_QUEUED_EVENTS)
         self.thread = None
+        self.thread_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the database, creating it if needed."""
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS weld_events (
+                id INTEGER PRIMARY KEY,
+                timestamp REAL NOT NULL,
+                jig_number INTEGER NOT NULL,
+                side TEXT NOT NULL,
+                shift_number INTEGER,
+                part_number TEXT,
+                session_id TEXT,
+                image_query_id TEXT,
+                confidence REAL
+            )
+            """
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS weld_events_jig ON weld_events (jig_number, timestamp)")
+        connection.execute("CREATE INDEX IF NOT EXISTS weld_events_shift ON weld_events (shift_number, timestamp)")
+        connection.execute("CREATE INDEX IF NOT EXISTS weld_events_part ON weld_events (part_number, timestamp)")
+        connection.execute("CREATE INDEX IF NOT EXISTS weld_events_session ON weld_events (session_id)")
+        connection.commit()
 
-    def get_weld_data(self) -> dict:
-        """Get the weld data.
+        return connection
+
+    def append(
+        self,
+        timestamp: float,
+        jig_number: int,
+        side: str,
+        shift_number: int | None,
+        part_number: str | None,
+        session_id: str | None,
+        image_query_id: str | None,
+        confidence: float | None,
+    ) -> None:
+        """Queue a weld flash event to be written, without blocking.
+
+        Args:
+            timestamp (float): Capture timestamp of the frame with the flash (seconds since the epoch).
+            jig_number (int): Jig number.
+            side (str): Side of the jig, "left" or "right".
+            shift_number (int | None): Shift number.
+            part_number (str | None): Part number.
+            session_id (str | None): ID of the weld count session.
+            image_query_id (str | None): ID of the image query that detected the flash.
+            confidence (float | None): Confidence of the ML result.
+        """
+
+        if self.thread is None:
+            with self.thread_lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.writer_thread, daemon=True)
+                    self.thread.start()
+
+        try:
+            self.event_queue.put_nowait((timestamp, jig_number, side, shift_number, part_number, session_id, image_query_id, confidence))
+        except queue.Full:
+            logger.error(f"Weld event log queue is full, dropping {side} weld event of jig {jig_number} at {timestamp}")
+
+    def writer_thread(self) -> None:
+        """Thread to write the queued events in batches, reconnecting and retrying with backoff if writing fails."""
+
+        connection = None
+
+        while True:
+            batch = [self.event_queue.get()]
+
+            # Collect whatever else arrives shortly after, so bursts are written in one transaction
+            deadline = time.monotonic() + self.FLUSH_INTERVAL_SEC
+            while len(batch) < self.MAX_BATCH_SIZE:
+                try:
+                    batch.append(self.event_queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            backoff = self.RETRY_BACKOFF_MIN_SEC
+            while True:
+                try:
+                    if connection is None:
+                        connection = self._connect()
+
+                    with connection:
+                        connection.executemany(
+                            f"INSERT INTO weld_events ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})", batch
+                        )
+                    break
+                except Exception as e:
+                    logger.error(f"Failed to write {len(batch)} weld events, retrying in {backoff:.0f}s: {e}", exc_info=True)
+                    if connection is not None:
+                        connection.close()
+                        connection = None
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, self.RETRY_BACKOFF_MAX_SEC)
+
+            for _ in batch:
+                self.event_queue.task_done()
+
+    def flush(self, timeout: float | None = 10.0) -> bool:
+        """Wait until all queued events are written.
+
+        Args:
+            timeout (float | None, optional): Time in seconds to wait, None to wait forever. Defaults to 10.0.
 
         Returns:
-            dict: Weld data dictionary with part number, left weld count, and right weld count.
+            bool: True if all queued events were written, False if the timeout expired first.
         """
 
-        return self.weld_data
+        with self.event_queue.all_tasks_done:
+            flushed = self.event_queue.all_tasks_done.wait_for(lambda: not self.event_queue.unfinished_tasks, timeout=timeout)
 
-    def start_weld_count(self, part_number: str, jig_number: int) -> None:
-        """Start the weld count for the given part number.
+        if not flushed:
+            logger.warning(f"Weld events still unwritten after waiting {timeout}s")
+
+        return flushed
+
+    def query(
+        self,
+        start: float | None = None,
+        end: float | None = None,
+        jig_number: int | None = None,
+        shift_number: int | None = None,
+        part_number: str | None = None,
+        session_id: str | None = None,
+        limit: int = 1000,
+    ) -> list[dict]:
+        """Get the weld events matching all the given filters, oldest first.
 
         Args:
-            part_number (str): Part number to start the weld count.
-            jig_number (int): Jig number for the weld (to determine the RTSP camera for ML).
+            start (float | None, optional): Earliest timestamp (inclusive). Defaults to None.
+            end (float | None, optional): Latest timestamp (exclusive). Defaults to None.
+            jig_number (int | None, optional): Jig number. Defaults to None.
+            shift_number (int | None, optional): Shift number. Defaults to None.
+            part_number (str | None, optional): Part number. Defaults to None.
+            session_id (str | None, optional): ID of the weld count session. Defaults to None.
+            limit (int, optional): Maximum number of events. Defaults to 1000.
+
+        Returns:
+            list[dict]: Weld events with their columns as keys.
         """
 
-        # Call weld_count_thread with jig_number as a thread
-        if self.thread is not None or self.is_running:
-            logger.info("Stopping previous weld count thread")
-            self.is_running = False
-            self.thread.join()
-            self.thread = None
+        if not os.path.exists(self.path):
+            return []
+
+        conditions = []
+        parameters = []
+        for column, value in [
+            ("jig_number", jig_number),
+            ("shift_number", shift_number),
+            ("part_number", part_number),
+            ("session_id", session_id),
+        ]:
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("timestamp < ?")
+            parameters.append(end)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        connection = sqlite3.connect(self.path)
+        try:
+            rows = connection.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM weld_events {where} ORDER BY timestamp LIMIT ?", [*parameters, limit]
+            ).fetchall()
+        finally:
+            connection.close()
 
-        self.weld_data["partNumber"] = part_number
-        self.weld_data["leftWeldCount"] = 0
-        self.weld_data["rightWeldCount"] = 0
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
 
-        self.is_running = True
 
-        logger.info(f"Starting weld count for part number: {part_number}")
-        self.thread = threading.Thread(target=self.weld_count_thread, args=(jig_number,), daemon=True)
-        self.thread.start()
+class MLReplayEntry:
+    """Frame waiting in the ML replay queue."""
 
-    def stop_weld_count(self) -> None:
-        """Stop the weld count thread."""
+    def __init__(self, path: str, size: int, session: "WeldCountSession", captured_at: float, ask_left: bool, ask_right: bool) -> None:
+        self.path = path
+        self.size = size
+        self.session = session
+        self.captured_at = captured_at
+        self.ask_left = ask_left
+        self.ask_right = ask_right
 
-        self.is_running = False
 
-        if self.thread is not None:
-            self.thread.join()
-            self.thread = None
+class MLReplayQueue:
+    """Bounded queue of frames whose ML request failed, stored as downsampled JPEGs on disk until they can be replayed.
 
-    def weld_count_thread(self, jig_number: int) -> None:
-        """Thread to count the number of welds for the given jig number."""
+    Only the frame metadata is kept in memory. When the queue is over `max_frames` or `max_bytes`, the oldest frames are
+    dropped. While the detector is unreachable (outage), new frames are queued directly instead of waiting on requests
+    that will fail. An outage starts with a connection or HTTP error, or after `OUTAGE_CONSECUTIVE_FAILURES` failed
+    requests in a row.
+    """
 
-        # Camera setup
-        jig_camera_config = camera_config.jig_stations[jig_number].camera_config
-        grabber = FrameGrabber.create_grabber(jig_camera_config)
-        logger.debug(f"Initialized FrameGrab with camera config: {grabber.config}")
+    OUTAGE_CONSECUTIVE_FAILURES = 3
 
-        # Flash states and counters
-        left_weld_counter = SaturatingCounter()
-        right_weld_counter = SaturatingCounter()
-        left_weld_has_flash = False
-        right_weld_has_flash = False
+    def __init__(self, directory: str, max_frames: int, max_bytes: int, downscale: float = 0.5, jpeg_quality: int = 80) -> None:
+        self.directory = directory
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.downscale = downscale
+        self.jpeg_quality = jpeg_quality
 
-        while self.is_running:
-            logging.info("Grabbing frame")
+        self.entries: deque[MLReplayEntry] = deque()
+        self.size_bytes = 0
+        self.condition = threading.Condition()
+        self.outage_since = None
+        self.consecutive_failures = 0
 
-            try:
-                frame = grabber.grab()
-            except Exception as e:
-                logger.error(f"Failed to grab frame: {e}", exc_info=True)
-                grabber.release()
-                grabber = FrameGrabber.create_grabber(jig_camera_config)
-                continue
+        # Totals since the app started
+        self.queued_count = 0
+        self.replayed_count = 0
+        self.dropped_count = 0
+        self.replay_failure_count = 0
 
-            logger.info("Frame grabbed")
+        # Frames left by a previous run belong to weld counts that no longer exist
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith(".jpg"):
+                    os.remove(os.path.join(directory, name))
 
-            # Split frame into left and right
-            half_width = frame.shape[1] // 2
-            left_frame = frame[:, :half_width]
-            right_frame = frame[:, half_width:]
+    @property
+    def is_outage(self) -> bool:
+        """Whether the detector is currently considered unreachable."""
 
-            logger.info("Asking ML for weld detection")
+        return self.outage_since is not None
 
-            try:
-                iq_left = self.gl.ask_async(detector=self.detector, image=left_frame)
-                iq_right = self.gl.ask_async(detector=self.detector, image=right_frame)
+    def mark_outage(self) -> None:
+        """Mark the detector as unreachable, until a replayed frame succeeds."""
 
-                iq_left = self.gl.wait_for_ml_result(image_query=iq_left, timeout_sec=5)
-                iq_right = self.gl.wait_for_ml_result(image_query=iq_right, timeout_sec=5)
-            except Exception as e:
-                logger.error(f"Failed to get ML result: {e}", exc_info=True)
-                continue
+        with self.condition:
+            if self.outage_since is None:
+                self.outage_since = time.time()
+                logger.warning("Detector unreachable, queueing frames for ML replay")
 
-            logger.info("ML result received")
+    def record_failure(self, error: Exception) -> None:
+        """Record a failed ML request, marking an outage if the detector looks unreachable.
 
-            # Left weld logic with 2-bit counter
-            left_result = left_weld_counter.update(iq_left.result.label == "YES")
-            if left_result == "YES" and not left_weld_has_flash:
-                self.weld_data["leftWeldCount"] += 1
-                left_weld_has_flash = True
-                logger.info("Left weld flash detected, count incremented.")
-            elif left_result == "NO":
-                left_weld_has_flash = False
+        Args:
+            error (Exception): Error of the ML request.
+        """
 
-            # Right weld logic with 2-bit counter
-            right_result = right_weld_counter.update(iq_right.result.label == "YES")
-            if right_result == "YES" and not right_weld_has_flash:
-                self.weld_data["rightWeldCount"] += 1
-                right_weld_has_flash = True
-                logger.info("Right weld flash detected, count incremented.")
-            elif right_result == "NO":
-                right_weld_has_flash = False
+        with self.condition:
+            self.consecutive_failures += 1
+            consecutive_failures = self.consecutive_failures
 
-            logger.info("Single frame processed")
+        if self._is_unreachable_error(error) or consecutive_failures >= self.OUTAGE_CONSECUTIVE_FAILURES:
+            self.mark_outage()
 
-        # Release the grabber before thread exit
-        grabber.release()
+    def record_success(self) -> None:
+        """Record a successful ML request."""
 
+        with self.condition:
+            self.consecutive_failures = 0
+
+    @staticmethod
+    def _is_unreachable_error(error: Exception) -> bool:
+        """Check if an ML request error means the detector cannot be reached, a connection or HTTP error."""
+
+        from groundlight_openapi_client.exceptions import ApiException
+        from urllib3.exceptions import HTTPError
+
+        return isinstance(error, (OSError, HTTPError, ApiException))
+
+    def clear_outage(self) -> None:
+        """Mark the detector as reachable again."""
+
+        with self.condition:
+            self.consecutive_failures = 0
+            if self.outage_since is not None:
+                logger.info(f"Detector reachable again after {time.time() - self.outage_since:.1f}s")
+                self.outage_since = None
+
+    def put(self, session: "WeldCountSession", frame: np.ndarray, captured_at: float, ask_left: bool, ask_right: bool) -> None:
+        """Queue a frame for ML replay, dropping the oldest frames if the queue is full.
+
+        Args:
+            session (WeldCountSession): Weld count session of the frame.
+            frame (np.ndarray): Frame from the jig camera.
+            captured_at (float): Capture timestamp of the frame (seconds since the epoch).
+            ask_left (bool): Send the left side to ML.
+            ask_right (bool): Send the right side to ML.
+        """
+
+        if self.downscale < 1:
+            frame = cv2.resize(frame, None, fx=self.downscale, fy=self.downscale, interpolation=cv2.INTER_AREA)
+
+        with ENCODE_SECONDS.time(stage="replay"):
+            success, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not success:
+            logger.error(f"Failed to encode frame of jig {session.jig_number} for ML replay")
+            with self.condition:
+                self.dropped_count += 1
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{session.jig_number}_{captured_at:.6f}_{uuid.uuid4().hex[:8]}.jpg")
+        with open(path, "wb") as f:
+            f.write(jpeg.tobytes())
+
+        dropped = 0
+        with self.condition:
+            self.entries.append(MLReplayEntry(path, jpeg.size, session, captured_at, ask_left, ask_right))
+            self.size_bytes += jpeg.size
+            self.queued_count += 1
+
+            while len(self.entries) > self.max_frames or self.size_bytes > self.max_bytes:
+                self._discard(self.entries.popleft())
+                self.dropped_count += 1
+                dropped += 1
+
+            self.condition.notify_all()
+
+        if dropped:
+            logger.warning(f"ML replay queue full, dropped {dropped} oldest frame(s)")
+
+    def _discard(self, entry: MLReplayEntry) -> None:
+        """Delete the file of an entry already removed from the queue, must be called with the condition held."""
+
+        self.size_bytes -= entry.size
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+    def wait_for_entry(self, timeout: float | None = None) -> MLReplayEntry | None:
+        """Wait for the oldest queued frame, without removing it from the queue.
+
+        Args:
+            timeout (float | None, optional): Time in seconds to wait. Defaults to None to wait forever.
+
+        Returns:
+            MLReplayEntry | None: Oldest queued frame, or None if the queue stayed empty.
+        """
+
+        with self.condition:
+            self.condition.wait_for(lambda: self.entries, timeout=timeout)
+            return self.entries[0] if self.entries else None
+
+    def load(self, entry: MLReplayEntry) -> np.ndarray | None:
+        """Load the frame of an entry, None if it was dropped in the meantime."""
+
+        return cv2.imread(entry.path)
+
+    def remove(self, entry: MLReplayEntry, replayed: bool) -> None:
+        """Remove an entry from the queue after it was replayed or could not be loaded.
+
+        Args:
+            entry (MLReplayEntry): Entry to remove.
+            replayed (bool): Whether the entry was replayed successfully.
+        """
+
+        with self.condition:
+            if entry in self.entries:
+                self.entries.remove(entry)
+                self._discard(entry)
+            if replayed:
+                self.replayed_count += 1
+
+    def record_replay_failure(self) -> None:
+        """Count a failed replay attempt."""
+
+        with self.condition:
+            self.replay_failure_count += 1
+
+    def get_metrics(self) -> dict:
+        """Get the backpressure metrics of the queue.
+
+        Returns:
+            dict: Queued frames and bytes, age of the oldest frame, outage state and totals since the app started.
+        """
+
+        with self.condition:
+            return {
+                "queuedFrames": len(self.entries),
+                "queuedBytes": self.size_bytes,
+                "maxFrames": self.max_frames,
+                "maxBytes": self.max_bytes,
+                "oldestFrameAgeSec": time.time() - self.entries[0].captured_at if self.entries else None,
+                "outage": self.is_outage,
+                "outageSec": time.time() - self.outage_since if self.is_outage else None,
+                "queuedTotal": self.queued_count,
+                "replayedTotal": self.replayed_count,
+                "droppedTotal": self.dropped_count,
+                "replayFailuresTotal": self.replay_failure_count,
+            }
+
+
+class WeldDataSnapshot:
+    """Immutable weld data of a jig, replaced as a whole on every change so readers never see a mix of two states.
+
+    `version` is the sequence number of the last change of the part number or the weld counts, it increases across
+    all jigs. Changes of the skip ratios and the frame age keep the version.
+    """
+
+    __slots__ = (
+        "version",
+        "jig_number",
+        "part_number",
+        "left_weld_count",
+        "right_weld_count",
+        "left_skip_ratio",
+        "right_skip_ratio",
+        "frame_age_sec",
+    )
+
+    # Fields whose changes get a new version
+    VERSIONED_FIELDS = {"part_number", "left_weld_count", "right_weld_count"}
+
+    def __init__(
+        self,
+        version: int,
+        jig_number: int | None,
+        part_number: str | None,
+        left_weld_count: int = 0,
+        right_weld_count: int = 0,
+        left_skip_ratio: float = 0.0,
+        right_skip_ratio: float = 0.0,
+        frame_age_sec: float | None = None,
+    ) -> None:
+        # Attributes can only be set here, through object.__setattr__
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "jig_number", jig_number)
+        object.__setattr__(self, "part_number", part_number)
+        object.__setattr__(self, "left_weld_count", left_weld_count)
+        object.__setattr__(self, "right_weld_count", right_weld_count)
+        object.__setattr__(self, "left_skip_ratio", left_skip_ratio)
+        object.__setattr__(self, "right_skip_ratio", right_skip_ratio)
+        object.__setattr__(self, "frame_age_sec", frame_age_sec)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable, use replace()")
+
+    def replace(self, **changes) -> "WeldDataSnapshot":
+        """Get a copy of the snapshot with the given fields changed."""
+
+        return WeldDataSnapshot(**{name: changes.get(name, getattr(self, name)) for name in self.__slots__})
+
+    def to_dict(self) -> dict:
+        """Get the weld data dictionary served by the API."""
+
+        return {
+            "version": self.version,
+            "jigNumber": self.jig_number,
+            "partNumber": self.part_number,
+            "leftWeldCount": self.left_weld_count,
+            "rightWeldCount": self.right_weld_count,
+            "leftSkipRatio": self.left_skip_ratio,
+            "rightSkipRatio": self.right_skip_ratio,
+            "frameAgeSec": self.frame_age_sec,
+        }
+
+
+class WeldCountSession:
+    """State of the weld count for a single jig station."""
+
+    # Results between two saved debouncer states, a recount for replayed frames starts from the last state before them
+    CHECKPOINT_INTERVAL = 100
+
+    def __init__(self, jig_number: int, part_number: str, shift_number: int | None = None) -> None:
+        self.id = uuid.uuid4().hex
+        self.jig_number = jig_number
+        self.shift_number = shift_number
+
+        # Replaced by a new snapshot on every change, only while holding the lock
+        self.weld_data = WeldDataSnapshot(version=0, jig_number=jig_number, part_number=part_number)
+
+        # Counting state of the left and right side, results are kept by capture time so the session can be recounted
+        # when replayed frames arrive
+        self.debouncer = self.create_debouncer()
+        self.results: list[tuple[float, MLResult, MLResult]] = []
+        self.checkpoints: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self.logged_flashes: set[tuple[str, float]] = set()
+        self.label_sequence_recorded = False
+        self.lock = threading.Lock()
+
+        # Thread control, the cancel event aborts the ML requests of the session when it is stopped
+        self.is_running = False
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+    @staticmethod
+    def create_debouncer() -> FlashDebouncer:
+        """Create the flash debouncer for the left and right side with the configured settings."""
+
+        debouncer_config = app_config.debouncer
+        return FlashDebouncer(
+            channels=2,
+            max_state=debouncer_config.max_state,
+            on_threshold=debouncer_config.on_threshold,
+            off_threshold=debouncer_config.off_threshold,
+            confidence_weighted=debouncer_config.confidence_weighted,
+        )
+
+
+class WeldCountService:
+    """Service to send ML request to Groundlight and count the number of welds.
+
+    Each jig station with an active weld count runs its own capture/inference worker, all workers share the Groundlight
+    client and a global limit on ML requests in flight.
+    """
+
+    ML_REPLAY_BACKOFF_MIN_SEC = 1.0
+    ML_REPLAY_BACKOFF_MAX_SEC = 30.0
+
+    # Replayed results merged into their sessions at once, each merge recounts the sessions under their lock
+    ML_REPLAY_MERGE_BATCH = 200
+
+    # Only every n-th frame of a jig is logged (at debug level), the metrics cover every frame
+    FRAME_LOG_SAMPLE_INTERVAL = 100
+
+    # Time a stopped weld count thread is waited for before a warning is logged
+    STOP_TIMEOUT_SEC = 10.0
+
+    # Polling of unanswered image queries, same as the Groundlight SDK
+    ML_POLL_INITIAL_DELAY_SEC = 0.25
+    ML_POLL_BACKOFF = 1.3
+
+    # App configuration fields read when a weld count starts, and fields only read when the app starts
+    NEXT_WELD_COUNT_CONFIG_FIELDS = {"pipeline_depth", "prefilter", "debouncer"}
+    RESTART_CONFIG_FIELDS = {"ml_replay_queue"}
+
+    def __init__(self) -> None:
+        # The Groundlight client is created by start(), frames are queued for ML replay until it is ready
+        self.gl = None
+        self.detector = None
+        self.ml_ready = threading.Event()
+
+        # Camera streams stay open across weld counts
+        self.camera_pool = CameraPool()
+
+        # Every counted weld flash is logged to disk
+        self.event_log = WeldEventLog(os.path.join(data_dir, "weld_events.db"))
+
+        # Frames whose ML request failed are queued on disk and replayed in the background
+        self.ml_replay_queue = None
+        replay_config = app_config.ml_replay_queue
+        if replay_config.enabled:
+            self.ml_replay_queue = MLReplayQueue(
+                directory=os.path.join(data_dir, "ml_replay_queue"),
+                max_frames=replay_config.max_frames,
+                max_bytes=replay_config.max_bytes,
+                downscale=replay_config.downscale,
+                jpeg_quality=replay_config.jpeg_quality,
+            )
+            self.ml_replay_thread_handle = threading.Thread(target=self.ml_replay_thread, daemon=True)
+            self.ml_replay_thread_handle.start()
+
+        # Images are encoded by the app instead of the SDK, optionally downscaled
+        self.encoder = None
+        encoding = app_config.encoding
+        if encoding.enabled:
+            self.encoder = FrameEncoder(encoding.max_width, encoding.max_height, encoding.jpeg_quality, encoding.workers)
+
+        # Global limit on ML requests in flight across all jigs
+        self.ml_semaphore = threading.BoundedSemaphore(app_config.max_concurrent_ml_requests)
+
+        # Weld count sessions by jig number
+        self.sessions: dict[int, WeldCountSession] = {}
+        self.last_jig_number = None
+        self.sessions_lock = threading.Lock()
+
+        # Bumped whenever a weld count or part number changes, listeners wait on the condition
+        self.weld_data_version = 0
+        self.weld_data_condition = threading.Condition()
+
+    def start(self) -> None:
+        """Create the Groundlight client and get the detector, which needs the network."""
+
+        # Imported here since the SDK takes a while to import on the device
+        from groundlight import Groundlight
+
+        if app_config.edge_endpoint is not None and app_config.edge_endpoint != "" and app_config.edge_endpoint != "None":
+            logger.info(f"Using edge-endpoint: {app_config.edge_endpoint}")
+            gl = Groundlight(endpoint=app_config.edge_endpoint)
+        else:
+            logger.info("Using default Groundlight endpoint")
+            gl = Groundlight()
+
+        self.detector = gl.get_detector(id=app_config.ml_detector_id)
+        self.gl = gl
+        self.ml_ready.set()
+
+    def reconfigure(self, changed_fields: set[str]) -> None:
+        """Apply changed fields of the app configuration that take effect without restarting the service.
+
+        A changed endpoint or detector is applied by calling `start` again, the current client keeps serving until the
+        new one is ready.
+
+        Args:
+            changed_fields (set[str]): Names of the changed fields of the app configuration.
+        """
+
+        if "encoding" in changed_fields:
+            # Requests in flight finish on the previous encoder, its threads exit once it is no longer referenced
+            encoding = app_config.encoding
+            self.encoder = None
+            if encoding.enabled:
+                self.encoder = FrameEncoder(encoding.max_width, encoding.max_height, encoding.jpeg_quality, encoding.workers)
+
+        if "max_concurrent_ml_requests" in changed_fields:
+            # Requests in flight release the slot of the previous limit
+            self.ml_semaphore = threading.BoundedSemaphore(app_config.max_concurrent_ml_requests)
+
+        next_weld_count_fields = sorted(changed_fields & self.NEXT_WELD_COUNT_CONFIG_FIELDS)
+        if next_weld_count_fields:
+            logger.info(f"Changed {', '.join(next_weld_count_fields)} apply from the next weld count of each jig")
+
+        restart_fields = sorted(changed_fields & self.RESTART_CONFIG_FIELDS)
+        if restart_fields:
+            logger.warning(f"Changed {', '.join(restart_fields)} only apply after restarting the app")
+
+    def reconfigure_cameras(self) -> None:
+        """Apply a changed camera configuration, stopping the weld counts of removed jigs before their camera streams."""
+
+        with self.sessions_lock:
+            removed_jigs = [jig_number for jig_number in self.sessions if jig_number not in camera_config.jig_stations]
+
+        for jig_number in removed_jigs:
+            logger.info(f"Stopping the weld count of jig {jig_number}, the jig was removed from the configuration")
+            self.stop_weld_count(jig_number=jig_number, wait=True)
+
+        self.camera_pool.reconfigure()
+
+    def get_weld_data(self, jig_number: int | None = None, since_version: int | None = None) -> dict | None:
+        """Get the weld data.
+
+        Args:
+            jig_number (int | None, optional): Jig number to get the weld data for. Defaults to the last started jig.
+            since_version (int | None, optional): Only return the weld data if its version is newer. Defaults to None.
+
+        Returns:
+            dict | None: Weld data dictionary with its version, jig number, part number, left and right weld counts, the
+                ratio of left and right half-frames skipped by the pre-filter, and the age of the last counted frame when
+                it was counted. None if the version is not newer than `since_version`.
+        """
+
+        snapshot = self.get_weld_data_snapshot(jig_number=jig_number)
+        if since_version is not None and snapshot.version <= since_version:
+            return None
+
+        return snapshot.to_dict()
+
+    def get_weld_data_snapshot(self, jig_number: int | None = None) -> WeldDataSnapshot:
+        """Get the current weld data snapshot of a jig, without locking.
+
+        Args:
+            jig_number (int | None, optional): Jig number to get the weld data for. Defaults to the last started jig.
+
+        Returns:
+            WeldDataSnapshot: Weld data of the jig, an empty snapshot with version 0 if it has no weld count.
+        """
+
+        if jig_number is None:
+            jig_number = self.last_jig_number
+
+        session = self.sessions.get(jig_number)
+        if session is None:
+            return WeldDataSnapshot(version=0, jig_number=jig_number, part_number=None)
+
+        return session.weld_data
+
+    def _publish_weld_data(self, session: WeldCountSession, **changes) -> None:
+        """Replace the weld data snapshot of a session, must be called with its lock held.
+
+        Changes of the part number or the weld counts get a new version and wake up the listeners.
+
+        Args:
+            session (WeldCountSession): Weld count session.
+            **changes: Changed fields of the `WeldDataSnapshot`.
+        """
+
+        snapshot = session.weld_data.replace(**changes)
+        if any(getattr(session.weld_data, name) != value for name, value in changes.items() if name in snapshot.VERSIONED_FIELDS):
+            self._notify_weld_data_changed(session, snapshot)
+        else:
+            session.weld_data = snapshot
+
+    def _notify_weld_data_changed(self, session: WeldCountSession, snapshot: WeldDataSnapshot) -> None:
+        """Publish the weld data snapshot of a session with a new version and wake up listeners waiting for changes."""
+
+        with self.weld_data_condition:
+            self.weld_data_version += 1
+            session.weld_data = snapshot.replace(version=self.weld_data_version)
+            self.weld_data_condition.notify_all()
+
+    def wait_for_weld_data(self, jig_number: int | None = None, since_version: int = -1, timeout_sec: float = 15.0) -> dict | None:
+        """Wait until the part number or weld counts of a jig change.
+
+        Args:
+            jig_number (int | None, optional): Jig number to follow. Defaults to the last started jig.
+            since_version (int, optional): Version of the weld data the caller has. Defaults to -1 to return the current
+                weld data right away.
+            timeout_sec (float, optional): Time to wait for a change. Defaults to 15.0.
+
+        Returns:
+            dict | None: Weld data dictionary with a version newer than `since_version`, or None if nothing changed within
+                `timeout_sec` so the caller can keep its connection alive.
+        """
+
+        # Changes of other jigs also wake up the waiters, they wait again until this jig has a newer version
+        with self.weld_data_condition:
+            if not self.weld_data_condition.wait_for(
+                lambda: self.get_weld_data_snapshot(jig_number=jig_number).version > since_version, timeout=timeout_sec
+            ):
+                return None
+
+        return self.get_weld_data(jig_number=jig_number)
+
+    def query_weld_events(self, **filters) -> list[dict]:
+        """Get the weld events matching all the given filters, oldest first.
+
+        Args:
+            **filters: Filters of `WeldEventLog.query`.
+
+        Returns:
+            list[dict]: Weld events as dictionaries with the log columns.
+        """
+
+        return self.event_log.query(**filters)
+
+    def get_ml_replay_queue_metrics(self) -> dict | None:
+        """Get the backpressure metrics of the ML replay queue.
+
+        Returns:
+            dict | None: Metrics of `MLReplayQueue.get_metrics`, None if the queue is disabled.
+        """
+
+        if self.ml_replay_queue is None:
+            return None
+
+        return self.ml_replay_queue.get_metrics()
+
+    def start_weld_count(self, part_number: str, jig_number: int, shift_number: int | None = None) -> None:
+        """Start the weld count for the given part number.
+
+        Args:
+            part_number (str): Part number to start the weld count.
+            jig_number (int): Jig number for the weld (to determine the RTSP camera for ML).
+            shift_number (int | None, optional): Shift number, logged with the weld events. Defaults to None.
+        """
+
+        # Only the previous weld count of the same jig is stopped, other jigs keep counting
+        self.stop_weld_count(jig_number=jig_number)
+
+        session = WeldCountSession(jig_number=jig_number, part_number=part_number, shift_number=shift_number)
+        session.is_running = True
+
+        logger.info(f"Starting weld count for part number: {part_number} on jig: {jig_number}")
+        session.thread = threading.Thread(target=self.weld_count_thread, args=(session,), daemon=True)
+
+        # The session gets its version before waiters can see it, the condition lock is reentrant
+        with self.weld_data_condition:
+            with session.lock:
+                self._notify_weld_data_changed(session, session.weld_data)
+
+            with self.sessions_lock:
+                self.sessions[jig_number] = session
+                self.last_jig_number = jig_number
+
+        session.thread.start()
+
+    def stop_weld_count(self, jig_number: int | None = None, wait: bool = False) -> None:
+        """Stop the weld count thread.
+
+        Stopping returns right away: the session stops counting, its waits for ML results are cancelled and its thread
+        exits in the background within about 0.1s. A query upload already in progress still completes in the background.
+
+        Args:
+            jig_number (int | None, optional): Jig number to stop the weld count for. Defaults to None for all jigs.
+            wait (bool, optional): Wait up to `STOP_TIMEOUT_SEC` for the threads to exit. Defaults to False.
+        """
+
+        with self.sessions_lock:
+            if jig_number is None:
+                sessions = list(self.sessions.values())
+            else:
+                sessions = [self.sessions[jig_number]] if jig_number in self.sessions else []
+
+        sessions = [session for session in sessions if session.thread is not None and session.thread.is_alive()]
+        if not sessions:
+            return
+
+        for session in sessions:
+            logger.info(f"Stopping weld count thread for jig: {session.jig_number}")
+            session.is_running = False
+            session.cancel_event.set()
+
+        if wait:
+            self._join_sessions(sessions)
+        else:
+            threading.Thread(target=self._join_sessions, args=(sessions,), daemon=True).start()
+
+    def _join_sessions(self, sessions: list[WeldCountSession]) -> None:
+        """Wait up to `STOP_TIMEOUT_SEC` for the threads of stopped sessions to exit."""
+
+        deadline = time.monotonic() + self.STOP_TIMEOUT_SEC
+        for session in sessions:
+            session.thread.join(timeout=max(0.0, deadline - time.monotonic()))
+            if session.thread.is_alive():
+                logger.warning(f"Weld count thread for jig {session.jig_number} did not stop within {self.STOP_TIMEOUT_SEC}s")
+
+    def weld_count_thread(self, session: WeldCountSession) -> None:
+        """Thread to count the number of welds for the jig of the given session.
+
+        The newest frame of the jig camera stream is taken whenever fewer than `pipeline_depth` image queries are in
+        flight. Results are consumed in frame order so the counting logic sees the same sequence of labels it would in a
+        serial loop. If the pre-filter is enabled, idle halves are not sent to ML and count as "NO". If the jig has
+        sample rates configured, frames are sent at the minimum rate while neither the activity gates nor the counters
+        show activity, and at the maximum rate otherwise. If the Groundlight client is not ready yet, frames are queued for
+        ML replay, or not read at all until it is ready when the replay queue is disabled.
+        """
+
+        pipeline_depth = app_config.pipeline_depth
+        jig_station = camera_config.jig_stations[session.jig_number]
+        sampler = AdaptiveSampler(jig_station.min_sample_rate_hz, jig_station.max_sample_rate_hz, jig_station.idle_after_sec)
+
+        # During an ML outage frames are only queued for replay at the idle rate, so the queue covers a longer outage
+        outage_rate_hz = min(filter(None, [jig_station.min_sample_rate_hz, app_config.ml_replay_queue.outage_sample_rate_hz]))
+        last_outage_sample_at = None
+
+        stream = self.camera_pool.get(session.jig_number)
+        camera_seq = stream.frame_seq
+        frame_seq = 0
+
+        # Activity gates for each half of the frame, used by the pre-filter and the adaptive sampling
+        prefilter = app_config.prefilter
+        use_gates = prefilter.enabled or jig_station.min_sample_rate_hz is not None
+        if use_gates:
+            left_gate = FrameActivityGate(prefilter.motion_threshold, prefilter.brightness_threshold, prefilter.bright_pixel_ratio)
+            right_gate = FrameActivityGate(prefilter.motion_threshold, prefilter.brightness_threshold, prefilter.bright_pixel_ratio)
+
+        # In-flight ML requests in frame order, acts as the reorder buffer
+        pending = deque()
+        last_counted_at = None
+
+        # Not used as a context manager, which would wait for the ML requests in flight when the session stops
+        executor = ThreadPoolExecutor(max_workers=pipeline_depth, thread_name_prefix="weld-ml")
+        try:
+            while session.is_running:
+                # Without the replay queue frames can only be counted once the Groundlight client is ready
+                if self.ml_replay_queue is None and not self.ml_ready.is_set():
+                    logger.warning(f"Weld count on jig {session.jig_number} waiting for the Groundlight client to be ready")
+                    while not self.ml_ready.wait(timeout=0.1):
+                        if session.cancel_event.is_set():
+                            break
+                    continue
+
+                # Keep the pipeline full with the newest frames, waiting shortly if results are pending
+                read_wait_sec = sampler.read_wait_sec() if len(pending) < pipeline_depth else 0.0
+                if len(pending) < pipeline_depth and read_wait_sec > 0 and not pending:
+                    session.cancel_event.wait(min(read_wait_sec, 0.1))
+                    continue
+
+                if len(pending) < pipeline_depth and read_wait_sec == 0:
+                    latest = stream.get_frame(after_seq=camera_seq, timeout=0.01 if pending else 0.1)
+                    if latest is not None:
+                        camera_seq, frame, captured_at = latest
+
+                        # Gates run here and not in the ML workers since they compare against the previous frame
+                        left_active = right_active = True
+                        if use_gates:
+                            half_width = frame.shape[1] // 2
+                            left_active = left_gate.check(frame[:, :half_width])
+                            right_active = right_gate.check(frame[:, half_width:])
+
+                        active = left_active or right_active or session.debouncer.active.any()
+                        if not sampler.should_sample(active):
+                            continue
+
+                        if self.ml_replay_queue is not None and self.ml_replay_queue.is_outage:
+                            now = time.monotonic()
+                            if last_outage_sample_at is not None and now - last_outage_sample_at < 1 / outage_rate_hz:
+                                continue
+                            last_outage_sample_at = now
+
+                        if frame_seq % self.FRAME_LOG_SAMPLE_INTERVAL == 0:
+                            logger.debug(f"Frame {frame_seq} of jig {session.jig_number} sent to ML")
+
+                        ask_left = ask_right = True
+                        if prefilter.enabled:
+                            ask_left, ask_right = left_active, right_active
+
+                        future = executor.submit(self._ask_ml_or_queue, session, frame, captured_at, ask_left, ask_right)
+                        pending.append((frame_seq, captured_at, future))
+                        frame_seq += 1
+                        continue
+
+                if not pending:
+                    continue
+
+                # Only the oldest frame may be counted next, later frames wait behind it
+                result_seq, result_captured_at, future = pending[0]
+                try:
+                    ml_results = future.result(timeout=0.01 if len(pending) < pipeline_depth else 0.1)
+                except FutureTimeoutError:
+                    continue
+                except CancelledError:
+                    break
+                except UnansweredQueryError as e:
+                    pending.popleft()
+                    ML_FAILURES.inc(jig=session.jig_number)
+                    logger.warning(f"Skipping frame {result_seq} on jig {session.jig_number}: {e}")
+                    continue
+                except Exception as e:
+                    pending.popleft()
+                    ML_FAILURES.inc(jig=session.jig_number)
+                    logger.error(f"Failed to get ML result for frame {result_seq} on jig {session.jig_number}: {e}", exc_info=True)
+                    continue
+
+                pending.popleft()
+
+                # Results arriving after the session was stopped are not counted anymore
+                if not session.is_running:
+                    break
+
+                # The frame was queued for ML replay, it is counted when its result arrives
+                if ml_results is None:
+                    continue
+
+                frame_age_sec = time.time() - result_captured_at
+                with session.lock:
+                    if prefilter.enabled:
+                        self._publish_weld_data(
+                            session,
+                            frame_age_sec=frame_age_sec,
+                            left_skip_ratio=left_gate.skip_ratio,
+                            right_skip_ratio=right_gate.skip_ratio,
+                        )
+                    else:
+                        self._publish_weld_data(session, frame_age_sec=frame_age_sec)
+                self._count_result(session, result_captured_at, *ml_results)
+
+                counted_at = time.perf_counter()
+                if last_counted_at is not None:
+                    LOOP_PERIOD_SECONDS.observe(counted_at - last_counted_at, jig=session.jig_number)
+                last_counted_at = counted_at
+
+                if result_seq % self.FRAME_LOG_SAMPLE_INTERVAL == 0:
+                    logger.debug(f"Frame {result_seq} of jig {session.jig_number} counted {frame_age_sec:.3f}s after capture")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _count_result(self, session: WeldCountSession, captured_at: float, left_ml: MLResult, right_ml: MLResult) -> None:
+        """Count the ML result of a frame, merging it in by capture time if it is older than already counted ones.
+
+        Args:
+            session (WeldCountSession): Weld count session of the frame.
+            captured_at (float): Capture timestamp of the frame (seconds since the epoch).
+            left_ml (MLResult): ML result of the left side.
+            right_ml (MLResult): ML result of the right side.
+        """
+
+        with session.lock:
+            # A replayed frame can be counted while an older live result is still in flight
+            if session.results and captured_at < session.results[-1][0]:
+                self._merge_results(session, [(captured_at, left_ml, right_ml)])
+                return
+
+            session.results.append((captured_at, left_ml, right_ml))
+
+            flashes = session.debouncer.update(*self._debouncer_inputs(left_ml, right_ml))
+            if len(session.results) % session.CHECKPOINT_INTERVAL == 0:
+                session.checkpoints.append(session.debouncer.get_state())
+
+            for side, flash, ml_result in [("left", flashes[0], left_ml), ("right", flashes[1], right_ml)]:
+                if flash:
+                    # Counts only go up, even after a recount merged two flashes that were already shown
+                    count = getattr(session.weld_data, f"{side}_weld_count") + 1
+                    self._publish_weld_data(session, **{f"{side}_weld_count": count})
+                    session.logged_flashes.add((side, captured_at))
+                    FLASHES.inc(jig=session.jig_number, side=side)
+                    self._log_weld_event(session, side, ml_result, captured_at)
+                    logger.info(f"{side.capitalize()} weld flash detected, count incremented.")
+
+    def _merge_results(self, session: WeldCountSession, results: list[tuple[float, MLResult, MLResult]]) -> None:
+        """Merge the results of replayed frames into a session by capture time and recount it, with its lock held.
+
+        The recount starts from the last saved debouncer state before the oldest merged frame. Flashes that only appear
+        with the replayed frames are added to the weld event log, and to the counts if the session is still running.
+        Counts that were already shown are never lowered.
+
+        Args:
+            session (WeldCountSession): Weld count session of the frames.
+            results (list[tuple[float, MLResult, MLResult]]): Capture timestamp and left and right ML result of each frame.
+        """
+
+        first_index = bisect.bisect_right(session.results, min(result[0] for result in results), key=lambda result: result[0])
+        for result in results:
+            bisect.insort(session.results, result, key=lambda result: result[0])
+
+        # Saved states after the oldest merged frame are outdated
+        del session.checkpoints[first_index // session.CHECKPOINT_INTERVAL :]
+        previous_counts = session.debouncer.counts.copy()
+        if session.checkpoints:
+            session.debouncer.set_state(session.checkpoints[-1])
+        else:
+            session.debouncer.reset()
+
+        flashes = []
+        for index in range(len(session.checkpoints) * session.CHECKPOINT_INTERVAL, len(session.results)):
+            captured_at, left_ml, right_ml = session.results[index]
+            left_flash, right_flash = session.debouncer.update(*self._debouncer_inputs(left_ml, right_ml))
+            if left_flash:
+                flashes.append(("left", captured_at, left_ml))
+            if right_flash:
+                flashes.append(("right", captured_at, right_ml))
+            if (index + 1) % session.CHECKPOINT_INTERVAL == 0:
+                session.checkpoints.append(session.debouncer.get_state())
+
+        # Only the flashes added by the replayed frames are logged, with hysteresis they may also merge two flashes
+        added = dict(zip(["left", "right"], (session.debouncer.counts - previous_counts).tolist()))
+        counts = {"left": session.weld_data.left_weld_count, "right": session.weld_data.right_weld_count}
+
+        for side, captured_at, ml_result in flashes:
+            if added[side] > 0 and (side, captured_at) not in session.logged_flashes:
+                added[side] -= 1
+                counts[side] += 1
+                session.logged_flashes.add((side, captured_at))
+                FLASHES.inc(jig=session.jig_number, side=side)
+                self._log_weld_event(session, side, ml_result, captured_at)
+
+        if (counts["left"], counts["right"]) == (session.weld_data.left_weld_count, session.weld_data.right_weld_count):
+            return
+
+        # The counts of a stopped weld count may already be printed, its flashes only go to the weld event log
+        if not session.is_running:
+            logger.info(f"Weld flashes found in replayed frames of the stopped weld count of jig {session.jig_number}, logged only.")
+            return
+
+        self._publish_weld_data(session, left_weld_count=counts["left"], right_weld_count=counts["right"])
+        logger.info(f"Weld flashes found in replayed frames of jig {session.jig_number}, counts reconciled.")
+
+    @staticmethod
+    def _debouncer_inputs(left_ml: MLResult, right_ml: MLResult) -> tuple[np.ndarray, np.ndarray]:
+        """Get the labels and confidences of the left and right side as debouncer inputs."""
+
+        labels = np.array([left_ml.label == "YES", right_ml.label == "YES"])
+        confidences = np.array([np.nan if ml.confidence is None else ml.confidence for ml in [left_ml, right_ml]])
+        return labels, confidences
+
+    def record_label_sequence(self, jig_number: int, left_welds: int, right_welds: int) -> None:
+        """Append the labels of the last weld count of a jig with the confirmed weld counts, to tune the debouncer offline.
+
+        Only recorded if `debouncer.record_label_sequences` is enabled, and once per weld count.
+
+        Args:
+            jig_number (int): Jig number.
+            left_welds (int): Confirmed number of left welds.
+            right_welds (int): Confirmed number of right welds.
+        """
+
+        session = self.sessions.get(jig_number)
+        if not app_config.debouncer.record_label_sequences or session is None or session.label_sequence_recorded:
+            return
+
+        with session.lock:
+            session.label_sequence_recorded = True
+            record = {"jigNumber": jig_number, "partNumber": session.weld_data.part_number, "sessionId": session.id}
+            for side, index, expected in [("left", 1, left_welds), ("right", 2, right_welds)]:
+                record[side] = {
+                    "labels": [result[index].label == "YES" for result in session.results],
+                    "confidences": [result[index].confidence for result in session.results],
+                    "expected": expected,
+                }
+
+        os.makedirs(data_dir, exist_ok=True)
+        with open(os.path.join(data_dir, "label_sequences.jsonl"), "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def _ask_ml_or_queue(
+        self, session: WeldCountSession, frame: np.ndarray, captured_at: float, ask_left: bool, ask_right: bool
+    ) -> tuple[MLResult, MLResult] | None:
+        """Ask ML for the frame, or queue it for replay if the request failed or the detector is unreachable.
+
+        A failed request only starts an outage if the detector looks unreachable, see `MLReplayQueue.record_failure`. An
+        unanswered query only queues its own frame.
+
+        Returns:
+            tuple[MLResult, MLResult] | None: Results for the left and right side, or None if the frame was queued.
+        """
+
+        if self.ml_replay_queue is None or not (ask_left or ask_right):
+            return self._ask_ml(frame, ask_left, ask_right, cancel_event=session.cancel_event)
+
+        # During an outage frames are queued right away, the replay thread finds out when the detector is back
+        if not self.ml_replay_queue.is_outage:
+            try:
+                ml_results = self._ask_ml(frame, ask_left, ask_right, cancel_event=session.cancel_event)
+                self.ml_replay_queue.record_success()
+                return ml_results
+            except CancelledError:
+                raise
+            except UnansweredQueryError as e:
+                ML_FAILURES.inc(jig=session.jig_number)
+                logger.warning(f"ML request unanswered for jig {session.jig_number}, queueing frame for replay: {e}")
+            except Exception as e:
+                ML_FAILURES.inc(jig=session.jig_number)
+                logger.warning(f"ML request failed for jig {session.jig_number}, queueing frame for replay: {e}")
+                self.ml_replay_queue.record_failure(e)
+
+        self.ml_replay_queue.put(session, frame, captured_at, ask_left, ask_right)
+        return None
+
+    def ml_replay_thread(self) -> None:
+        """Thread to replay the queued frames to ML, oldest first, and reconcile the weld counts of their sessions.
+
+        Replayed results are merged in batches of up to `ML_REPLAY_MERGE_BATCH` frames, or whenever the queue is empty or
+        a replay failed, so a backlog is recounted a few times instead of once per frame.
+        """
+
+        backoff = self.ML_REPLAY_BACKOFF_MIN_SEC
+        replayed: dict[WeldCountSession, list[tuple[float, MLResult, MLResult]]] = {}
+
+        while True:
+            entry = self.ml_replay_queue.wait_for_entry(timeout=0 if replayed else None)
+            if entry is None:
+                replayed = self._merge_replayed_results(replayed)
+                continue
+
+            self.ml_ready.wait()
+
+            frame = self.ml_replay_queue.load(entry)
+            if frame is None:
+                self.ml_replay_queue.remove(entry, replayed=False)
+                continue
+
+            try:
+                left_ml, right_ml = self._ask_ml(frame, entry.ask_left, entry.ask_right)
+            except Exception as e:
+                ML_FAILURES.inc(jig=entry.session.jig_number)
+                self.ml_replay_queue.record_replay_failure()
+                logger.warning(f"ML replay failed, retrying in {backoff:.1f}s: {e}")
+                replayed = self._merge_replayed_results(replayed)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.ML_REPLAY_BACKOFF_MAX_SEC)
+                continue
+
+            backoff = self.ML_REPLAY_BACKOFF_MIN_SEC
+            self.ml_replay_queue.clear_outage()
+            self.ml_replay_queue.remove(entry, replayed=True)
+
+            replayed.setdefault(entry.session, []).append((entry.captured_at, left_ml, right_ml))
+            if sum(len(results) for results in replayed.values()) >= self.ML_REPLAY_MERGE_BATCH:
+                replayed = self._merge_replayed_results(replayed)
+
+    def _merge_replayed_results(self, replayed: dict) -> dict:
+        """Merge a batch of replayed results into their sessions.
+
+        Args:
+            replayed (dict): Capture timestamp and left and right ML result of the replayed frames by session.
+
+        Returns:
+            dict: Empty batch for the next replayed results.
+        """
+
+        for session, results in replayed.items():
+            with session.lock:
+                self._merge_results(session, results)
+
+        return {}
+
+    def _log_weld_event(self, session: WeldCountSession, side: str, ml_result: MLResult, captured_at: float) -> None:
+        """Queue a counted weld flash to the weld event log."""
+
+        self.event_log.append(
+            timestamp=captured_at,
+            jig_number=session.jig_number,
+            side=side,
+            shift_number=session.shift_number,
+            part_number=session.weld_data.part_number,
+            session_id=session.id,
+            image_query_id=ml_result.image_query_id,
+            confidence=ml_result.confidence,
+        )
+
+    def _ask_ml(
+        self, frame: np.ndarray, ask_left: bool = True, ask_right: bool = True, cancel_event: threading.Event | None = None
+    ) -> tuple[MLResult, MLResult]:
+        """Ask ML for weld detection on the left and right side of the frame.
+
+        Args:
+            frame (np.ndarray): Frame from the jig camera.
+            ask_left (bool, optional): Send the left side to ML, "NO" is returned for it otherwise. Defaults to True.
+            ask_right (bool, optional): Send the right side to ML, "NO" is returned for it otherwise. Defaults to True.
+            cancel_event (threading.Event | None, optional): Event that aborts waiting for a free slot and for the
+                results when set. Defaults to None.
+
+        Returns:
+            tuple[MLResult, MLResult]: Results with labels ("YES" or "NO") for the left and right side of the frame.
+
+        Raises:
+            CancelledError: If the cancel event was set before the results arrived.
+            UnansweredQueryError: If the detector did not answer an image query in time.
+        """
+
+        if not ask_left and not ask_right:
+            return MLResult("NO"), MLResult("NO")
+
+        if not self.ml_ready.is_set():
+            raise RuntimeError("Groundlight client is not ready yet")
+
+        # Wait for a free slot in the global limit so no jig can take all the ML capacity, the limit can be reconfigured
+        ml_semaphore = self.ml_semaphore
+        while not ml_semaphore.acquire(timeout=0.1):
+            if cancel_event is not None and cancel_event.is_set():
+                raise CancelledError("ML request cancelled while waiting for a free slot")
+
+        try:
+            if app_config.ml_inference_mode == "full_frame":
+                left_ml, right_ml = self._ask_ml_full_frame(frame, cancel_event)
+                return (left_ml if ask_left else MLResult("NO")), (right_ml if ask_right else MLResult("NO"))
+
+            return self._ask_ml_split(frame, ask_left, ask_right, cancel_event)
+        finally:
+            ml_semaphore.release()
+
+    def _wait_for_ml_result(self, image_query, cancel_event: threading.Event | None, timeout_sec: float = 5.0):
+        """Wait for the ML result of an image query like `Groundlight.wait_for_ml_result`, but stop waiting when cancelled.
+
+        Args:
+            image_query (ImageQuery): Image query returned by `ask_async`.
+            cancel_event (threading.Event | None): Event that aborts the wait when set, None to wait with the SDK.
+            timeout_sec (float, optional): Time to wait for the result, the query is returned as is after it. Defaults to 5.0.
+
+        Returns:
+            ImageQuery: The image query, with its result if it arrived in time.
+
+        Raises:
+            CancelledError: If the cancel event was set before the result arrived.
+        """
+
+        from groundlight.internalapi import iq_is_answered
+
+        if cancel_event is None:
+            return self.gl.wait_for_ml_result(image_query=image_query, timeout_sec=timeout_sec)
+
+        deadline = time.monotonic() + timeout_sec
+        delay = self.ML_POLL_INITIAL_DELAY_SEC
+        while not iq_is_answered(image_query):
+            remaining_sec = deadline - time.monotonic()
+            if remaining_sec <= 0:
+                break
+            if cancel_event.wait(min(delay, remaining_sec)):
+                raise CancelledError(f"Waiting for image query {image_query.id} cancelled")
+            delay *= self.ML_POLL_BACKOFF
+            image_query = self.gl.get_image_query(image_query.id)
+
+        return image_query
+
+    def _ask_ml_split(
+        self, frame: np.ndarray, ask_left: bool, ask_right: bool, cancel_event: threading.Event | None = None
+    ) -> tuple[MLResult, MLResult]:
+        """Send the left and right halves of the frame as two separate image queries."""
+
+        # Split frame into left and right
+        half_width = frame.shape[1] // 2
+        left_frame = frame[:, :half_width]
+        right_frame = frame[:, half_width:]
+
+        # Both halves are encoded in parallel, the left one is sent as soon as it is ready
+        encoder = self.encoder
+        if encoder is not None:
+            left_encoded = encoder.submit(left_frame) if ask_left else None
+            right_encoded = encoder.submit(right_frame) if ask_right else None
+            left_frame = left_encoded.result() if ask_left else None
+
+        left_asked_at = time.perf_counter()
+        iq_left = self.gl.ask_async(detector=self.detector, image=left_frame) if ask_left else None
+
+        if encoder is not None:
+            right_frame = right_encoded.result() if ask_right else None
+
+        right_asked_at = time.perf_counter()
+        iq_right = self.gl.ask_async(detector=self.detector, image=right_frame) if ask_right else None
+
+        left_ml = MLResult("NO")
+        if ask_left:
+            iq_left = self._wait_for_ml_result(iq_left, cancel_event, timeout_sec=5)
+            ML_REQUEST_SECONDS.observe(time.perf_counter() - left_asked_at, side="left")
+            if iq_left.result is None:
+                raise UnansweredQueryError(f"Image query {iq_left.id} of the left side was not answered in time")
+            left_ml = MLResult(iq_left.result.label, image_query_id=iq_left.id, confidence=iq_left.result.confidence)
+
+        right_ml = MLResult("NO")
+        if ask_right:
+            iq_right = self._wait_for_ml_result(iq_right, cancel_event, timeout_sec=5)
+            ML_REQUEST_SECONDS.observe(time.perf_counter() - right_asked_at, side="right")
+            if iq_right.result is None:
+                raise UnansweredQueryError(f"Image query {iq_right.id} of the right side was not answered in time")
+            right_ml = MLResult(iq_right.result.label, image_query_id=iq_right.id, confidence=iq_right.result.confidence)
+
+        return left_ml, right_ml
+
+    def _ask_ml_full_frame(self, frame: np.ndarray, cancel_event: threading.Event | None = None) -> tuple[MLResult, MLResult]:
+        """Send the full frame as a single image query and split the detected regions into left and right."""
+
+        encoder = self.encoder
+        if encoder is not None:
+            frame = encoder.encode(frame)
+
+        with ML_REQUEST_SECONDS.time(side="full_frame"):
+            iq = self.gl.ask_async(detector=self.detector, image=frame)
+            iq = self._wait_for_ml_result(iq, cancel_event, timeout_sec=5)
+
+        if iq.result is None:
+            raise UnansweredQueryError(f"Image query {iq.id} was not answered in time")
+
+        left_label, right_label = self.split_rois_by_side(iq.rois)
+        return (
+            MLResult(left_label, image_query_id=iq.id, confidence=iq.result.confidence),
+            MLResult(right_label, image_query_id=iq.id, confidence=iq.result.confidence),
+        )
+
+    @staticmethod
+    def split_rois_by_side(rois: list | None) -> tuple[str, str]:
+        """Split the regions of interest of a full frame result into left and right labels.
+
+        Args:
+            rois (list | None): Regions of interest returned by the detector, with geometry relative to the frame.
+
+        Returns:
+            tuple[str, str]: "YES" for each side that has a region centered in its half of the frame, "NO" otherwise.
+        """
+
+        left_label = "NO"
+        right_label = "NO"
+
+        for roi in rois or []:
+            if roi.geometry.x < 0.5:
+                left_label = "YES"
+            else:
+                right_label = "YES"
+
+        return left_label, right_label
+
+
+class PrinterService:
+    """Service to interact with the thermal printer.
+
+    Tags are queued as print jobs and sent by a background spooler over a persistent connection to the printer. Pending
+    jobs are also kept on disk so they survive a restart, and jobs that could not be sent are retried with backoff up to
+    a limit. A job that was sent completely is never sent again, so a tag is not printed twice.
+    """
+
+    RETRY_BACKOFF_MIN_SEC = 1.0
+    RETRY_BACKOFF_MAX_SEC = 30.0
+    MAX_ATTEMPTS = 10
+    MAX_FINISHED_JOBS = 100
+    FINISHED_STATUSES = ("printed", "unconfirmed", "failed")
+
+    # Tag format stored in printer RAM, downloaded again on every new connection in case the printer restarted
+    TAG_FORMAT_NAME = "R:WELDTAG.ZPL"
+
+    # ZPL host status request, answered with three status strings each ending with ETX. Tilde commands are handled as soon
+    # as they arrive, ahead of formats still waiting to print, so an answer shows the printer is alive, not what it printed
+    HOST_STATUS_REQUEST = b"~HS"
+    HOST_STATUS_STRINGS = 3
+
+    def __init__(self) -> None:
+        self.sock = None
+        self.reconfigure()
+
+        # Print jobs by job id, in submission order
+        self.jobs: dict[str, dict] = {}
+        self.jobs_lock = threading.Lock()
+        self.job_queue = queue.Queue()
+
+        # Pending jobs are spooled to disk until they are printed
+        self.spool_dir = os.path.join(data_dir, "print_spool")
+        self._load_spooled_jobs()
+
+        self.thread = threading.Thread(target=self.spooler_thread, daemon=True)
+        self.thread.start()
+
+    def reconfigure(self) -> None:
+        """Apply the printer configuration, the spooler reconnects before sending the next tag.
+
+        Queued and spooled tags are kept and printed with the new configuration.
+        """
+
+        printer_config = app_config.printer
+        self.printer_ip = printer_config.printer_ip
+        self.printer_port = int(printer_config.printer_port)
+        self.printer_timeout = printer_config.printer_timeout
+        self.printer_status_check = printer_config.printer_status_check
+
+        self.tag_format = self._compile_tag_format(
+            width=printer_config.printer_paper_width,
+            length=printer_config.printer_paper_length,
+            dpi=printer_config.printer_dpi,
+        )
+
+        # The spooler owns the connection, it closes it on the next send
+        self.reconnect_requested = True
+
+    def _compile_tag_format(self, width: float, length: float, dpi: int) -> str:
+        """
+        Create the ZPL string that stores the static part of the tag layout on the printer as a format (^DF).
+
+        Args:
+            width (float): Width of the tag in inches.
+            length (float): Length of the tag in inches.
+            dpi (int): Dots per inch of the printer.
+
+        Returns:
+            str: ZPL string to download the tag format, the variable fields are numbered with ^FN.
+        """
+        # Calculate paper dimensions in dots
+        width_dots = int(width * dpi)
+        length_dots = int(length * dpi)
 
-class PrinterService:
-    """Service to interact with the thermal printer."""
+        # Font size for consistency
+        font_size = 30
 
-    def __init__(self) -> None:
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.settimeout(app_config.printer.printer_timeout)
+        # Calculate horizontal center
+        center_x = width_dots // 2
 
-        self.printer_ip = app_config.printer.printer_ip
-        self.printer_port = int(app_config.printer.printer_port)
+        # Field numbers match the order of the values in `_create_tag`
+        return "".join(
+            [
+                "^XA",
+                f"^DF{self.TAG_FORMAT_NAME}^FS",
+                f"^PW{width_dots}",
+                f"^LL{length_dots}",
+                f"^CF0,{font_size}",
+                "^FO20,30^FN1^FS",
+                f"^FO{width_dots - 150},30^FN2^FS",
+                f"^FO{center_x - 50},80^FDJig #^FS",
+                f"^FO{center_x - 50},120^FN3^FS",
+                f"^FO{center_x - 100},180^FDPart Number^FS",
+                f"^FO{center_x - 100},220^FN4^FS",
+                "^FO20,280^FDLeft Weld^FS",
+                f"^FO{width_dots - 200},280^FDRight Weld^FS",
+                "^FO20,320^FDCount^FS",
+                f"^FO{width_dots - 200},320^FDCount^FS",
+                "^FO20,360^FN5^FS",
+                f"^FO{width_dots - 200},360^FN6^FS",
+                f"^FO{center_x - 100},420^FDTotal Weld Count^FS",
+                f"^FO{center_x - 50},480^FN7^FS",
+                "^FO20,540^FDLeft Welder^FS",
+                f"^FO{width_dots - 200},540^FDRight Welder^FS",
+                "^FO20,580^FN8^FS",
+                f"^FO{width_dots - 200},580^FN9^FS",
+                "^XZ",
+            ]
+        )
 
     def _create_tag(
         self,
@@ -279,12 +2159,9 @@ class PrinterService:
         right_count: int,
         left_welder: str,
         right_welder: str,
-        width: float = app_config.printer.printer_paper_width,
-        length: float = app_config.printer.printer_paper_length,
-        dpi: int = app_config.printer.printer_dpi,
     ) -> str:
         """
-        Create a ZPL string to print the formatted tag with consistent font size and dynamic centering.
+        Create a ZPL string to print the tag by recalling the stored tag format (^XF) with only the variable fields.
 
         Args:
             date (str): Date of the weld in (MM/DD/YY).
@@ -295,90 +2172,281 @@ class PrinterService:
             right_count (int): Right weld count.
             left_welder (str): Left welder name.
             right_welder (str): Right welder name.
-            width (float, optional): Width of the tag in inches. Defaults to 2.25.
-            length (float, optional): Length of the tag in inches. Defaults to 4.00.
-            dpi (int, optional): Dots per inch of the printer. Defaults to 203.
 
         Returns:
             str: ZPL string to print the formatted tag.
         """
-        # Calculate paper dimensions in dots
-        width_dots = int(width * dpi)
-        length_dots = int(length * dpi)
-
-        # Font size for consistency
-        font_size = 30
-
-        # Calculate horizontal center
-        center_x = width_dots // 2
 
         # Calculate total weld count
         total_count = left_count + right_count
 
-        # Create the ZPL string
-        zpl = f"""
-        ^XA
-        ^PW{width_dots}
-        ^LL{length_dots}
-        ^CF0,{font_size}
+        values = [f"Date: {date}", f"Shift: {shift}", jig, part_number, left_count, right_count, total_count, left_welder, right_welder]
+        fields = "".join(f"^FN{field_number}^FD{value}^FS" for field_number, value in enumerate(values, start=1))
+
+        return f"^XA^XF{self.TAG_FORMAT_NAME}^FS{fields}^XZ"
+
+    def _is_connected(self) -> bool:
+        """Check if the persistent connection to the printer is still open, without blocking.
+
+        Returns:
+            bool: True if the connection is open, False otherwise.
+        """
+
+        if self.sock is None:
+            return False
 
-        ^FO20,30^FDDate: {date}^FS
-        ^FO{width_dots - 150},30^FDShift: {shift}^FS
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            # A readable socket is either closed by the printer (empty read) or has status data we do not need
+            if readable and not self.sock.recv(4096):
+                return False
+        except Exception:
+            return False
 
-        ^CF0,{font_size}
-        ^FO{center_x - 50},80^FDJig #^FS
-        ^FO{center_x - 50},120^FD{jig}^FS
+        return True
 
-        ^FO{center_x - 100},180^FDPart Number^FS
-        ^FO{center_x - 100},220^FD{part_number}^FS
+    def _request_status(self) -> bytes:
+        """Ask the printer for its host status and wait for the answer.
 
-        ^CF0,{font_size}
-        ^FO20,280^FDLeft Weld^FS
-        ^FO{width_dots - 200},280^FDRight Weld^FS
-        ^FO20,320^FDCount^FS
-        ^FO{width_dots - 200},320^FDCount^FS
-        ^FO20,360^FD{left_count}^FS
-        ^FO{width_dots - 200},360^FD{right_count}^FS
+        An answer shows that the printer is alive and reads from the connection. It does not show that earlier formats
+        were printed, since the printer handles the request ahead of them.
 
-        ^CF0,{font_size}
-        ^FO{center_x - 100},420^FDTotal Weld Count^FS
-        ^FO{center_x - 50},480^FD{total_count}^FS
+        Returns:
+            bytes: Host status strings of the printer.
 
-        ^CF0,{font_size}
-        ^FO20,540^FDLeft Welder^FS
-        ^FO{width_dots - 200},540^FDRight Welder^FS
-        ^FO20,580^FD{left_welder}^FS
-        ^FO{width_dots - 200},580^FD{right_welder}^FS
-        ^XZ
+        Raises:
+            OSError: If the printer did not answer within the printer timeout or closed the connection.
         """
 
-        return zpl
+        self.sock.sendall(self.HOST_STATUS_REQUEST)
+
+        deadline = time.monotonic() + self.printer_timeout
+        status = b""
+        while status.count(b"\x03") < self.HOST_STATUS_STRINGS:
+            remaining_sec = deadline - time.monotonic()
+            if remaining_sec <= 0:
+                raise TimeoutError("Printer did not answer the host status request")
+
+            self.sock.settimeout(remaining_sec)
+            try:
+                chunk = self.sock.recv(4096)
+            finally:
+                # Keep the full timeout for the next tag on the persistent connection
+                self.sock.settimeout(self.printer_timeout)
+            if not chunk:
+                raise ConnectionError("Printer closed the connection")
+            status += chunk
+
+        return status
+
+    def _close_connection(self) -> None:
+        """Close the persistent connection to the printer."""
+
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except Exception:
+                pass
+            self.sock = None
 
     def _send_to_printer(self, zpl: str) -> bool:
         """
-        Send the ZPL string to the printer.
+        Send the ZPL string to the printer over the persistent connection, reconnecting and downloading the tag format
+        if needed.
+
+        With the printer status check enabled, a connection left open is only reused if the printer still answers on it,
+        since after the printer restarted it accepts writes without printing them.
 
         Args:
             zpl (str): ZPL string to print.
 
         Returns:
-            bool: True if the data was sent successfully, False otherwise.
+            bool: True if all of the data was sent, False otherwise.
         """
 
         try:
-            logger.info(f"Sending data to the printer with IP: {self.printer_ip} and Port: {self.printer_port}")
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.sock.settimeout(app_config.printer.printer_timeout)
-            self.sock.connect((self.printer_ip, self.printer_port))
-            self.sock.send(zpl.encode())
-            self.sock.close()
+            if self.printer_status_check and not self.reconnect_requested and self._is_connected():
+                try:
+                    self._request_status()
+                except OSError as e:
+                    logger.info(f"Printer stopped answering on the open connection, reconnecting: {e}")
+                    self._close_connection()
+
+            if self.reconnect_requested or not self._is_connected():
+                self.reconnect_requested = False
+                self._close_connection()
+                logger.info(f"Connecting to the printer with IP: {self.printer_ip} and Port: {self.printer_port}")
+                self.sock = socket.create_connection((self.printer_ip, self.printer_port), timeout=self.printer_timeout)
+                self.sock.sendall(self.tag_format.encode())
+
+            self.sock.sendall(zpl.encode())
         except Exception as e:
             logger.error(f"Failed to send data to the printer: {e}", exc_info=True)
+            self._close_connection()
             return False
 
         logger.info("Data sent to the printer successfully!")
         return True
 
+    def _confirm_sent(self) -> bool:
+        """Check that the printer still answers after a job was sent, if the printer status check is enabled.
+
+        Returns:
+            bool: True if the printer answered or the check is disabled, False otherwise.
+        """
+
+        if not self.printer_status_check:
+            return True
+
+        try:
+            self._request_status()
+        except Exception as e:
+            logger.warning(f"Printer did not answer after the data was sent: {e}")
+            self._close_connection()
+            return False
+
+        return True
+
+    def _spool_path(self, job_id: str) -> str:
+        """Get the path of the spool file of a print job."""
+
+        return os.path.join(self.spool_dir, f"{job_id}.json")
+
+    def _load_spooled_jobs(self) -> None:
+        """Queue the print jobs left on disk by a previous run, oldest first."""
+
+        try:
+            spool_files = os.listdir(self.spool_dir)
+        except FileNotFoundError:
+            return
+
+        spooled_jobs = []
+        for spool_file in spool_files:
+            if not spool_file.endswith(".json"):
+                continue
+
+            try:
+                with open(os.path.join(self.spool_dir, spool_file)) as f:
+                    spooled_jobs.append(json.load(f))
+            except Exception as e:
+                logger.error(f"Failed to load spooled print job {spool_file}: {e}", exc_info=True)
+
+        for job in sorted(spooled_jobs, key=lambda job: job["created_at"]):
+            self._queue_job(job)
+
+        if spooled_jobs:
+            logger.info(f"Loaded {len(spooled_jobs)} spooled print jobs.")
+
+    def _queue_job(self, job: dict) -> None:
+        """Add a print job to the job list and the queue of the spooler."""
+
+        job.update({"status": "queued", "attempts": 0, "error": None})
+
+        with self.jobs_lock:
+            self.jobs[job["id"]] = job
+
+        self.job_queue.put(job["id"])
+
+    def submit_job(self, zpl: str) -> str:
+        """Queue the ZPL string to be printed by the spooler.
+
+        Args:
+            zpl (str): ZPL string to print.
+
+        Returns:
+            str: Job ID of the print job.
+        """
+
+        job = {"id": uuid.uuid4().hex, "created_at": time.time(), "zpl": zpl}
+
+        # Spool the job to disk first so it is not lost if the app restarts before it prints
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            temp_path = f"{self._spool_path(job['id'])}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(job, f)
+            os.replace(temp_path, self._spool_path(job["id"]))
+        except Exception as e:
+            logger.error(f"Failed to spool print job {job['id']}, keeping it in memory only: {e}", exc_info=True)
+
+        self._queue_job(job)
+        logger.info(f"Print job {job['id']} queued.")
+
+        return job["id"]
+
+    def get_job_status(self, job_id: str) -> dict | None:
+        """Get the status of a print job.
+
+        Args:
+            job_id (str): Job ID of the print job.
+
+        Returns:
+            dict | None: Job ID, status ("queued", "printing", "retrying", "printed", "unconfirmed" or "failed"), number
+                of attempts and last error of the print job, None if the job is unknown.
+        """
+
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+
+            return {"id": job["id"], "status": job["status"], "attempts": job["attempts"], "error": job["error"]}
+
+    def spooler_thread(self) -> None:
+        """Thread to send the queued print jobs to the printer in order, retrying each one up to `MAX_ATTEMPTS` times.
+
+        A job that was sent completely is done, it is marked "unconfirmed" instead of "printed" if the printer did not
+        answer afterwards. A job that could not be sent after the last attempt is marked "failed" and its spool file is
+        kept with a ".failed" suffix, so it is not loaded again on restart but can still be recovered.
+        """
+
+        while True:
+            job_id = self.job_queue.get()
+            job = self.jobs[job_id]
+            backoff = self.RETRY_BACKOFF_MIN_SEC
+
+            while True:
+                job["status"] = "printing"
+                job["attempts"] += 1
+
+                if self._send_to_printer(job["zpl"]):
+                    if self._confirm_sent():
+                        job["status"] = "printed"
+                        job["error"] = None
+                    else:
+                        job["status"] = "unconfirmed"
+                        job["error"] = "The tag was sent but the printer did not answer afterwards"
+                    break
+
+                PRINTER_FAILURES.inc()
+                job["error"] = "Failed to send the tag to the printer"
+
+                if job["attempts"] >= self.MAX_ATTEMPTS:
+                    job["status"] = "failed"
+                    logger.error(f"Print job {job_id} failed after {job['attempts']} attempts, giving up")
+                    break
+
+                job["status"] = "retrying"
+                logger.warning(f"Print job {job_id} failed, retrying in {backoff}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.RETRY_BACKOFF_MAX_SEC)
+
+            try:
+                if job["status"] == "failed":
+                    os.replace(self._spool_path(job_id), f"{self._spool_path(job_id)}.failed")
+                else:
+                    os.remove(self._spool_path(job_id))
+            except FileNotFoundError:
+                pass
+
+            # Only keep the status of recent jobs that are done
+            with self.jobs_lock:
+                finished = [
+                    finished_id for finished_id, finished_job in self.jobs.items() if finished_job["status"] in self.FINISHED_STATUSES
+                ]
+                for finished_id in finished[: -self.MAX_FINISHED_JOBS]:
+                    del self.jobs[finished_id]
+
     def print_tag(
         self,
         shift: int,
@@ -388,9 +2456,9 @@ class PrinterService:
         right_count: int,
         left_welder: str,
         right_welder: str,
-    ) -> bool:
+    ) -> str:
         """
-        Print the formatted tag with the weld data.
+        Queue the formatted tag with the weld data for printing.
 
         Args:
             shift (int): Shift number.
@@ -402,7 +2470,7 @@ class PrinterService:
             right_welder (str): Right welder name.
 
         Returns:
-            bool: True if the tag was printed successfully, False otherwise.
+            str: Job ID of the queued print job, its status is available with `get_job_status`.
         """
 
         # Get the current date and format it to MM/DD/YY
@@ -419,7 +2487,103 @@ class PrinterService:
             right_welder=right_welder,
         )
 
-        return self._send_to_printer(zpl)
+        return self.submit_job(zpl)
+
+    def print_tags(self, tags: list[dict]) -> str:
+        """
+        Queue several tags for printing as a single print job, so they are sent to the printer in one write.
+
+        Args:
+            tags (list[dict]): Tags to print, each with the keyword arguments of `print_tag`.
+
+        Returns:
+            str: Job ID of the queued print job, its status is available with `get_job_status`.
+        """
+
+        # Get the current date and format it to MM/DD/YY
+        date = datetime.datetime.now().strftime("%m/%d/%y")
+
+        zpl = "".join(self._create_tag(date=date, **tag) for tag in tags)
+
+        return self.submit_job(zpl)
+
+
+class StatsRollup:
+    """Running totals of the completed parts in one group (a shift, a jig, a day, ...), updated in O(1) per part."""
+
+    def __init__(self) -> None:
+        self.parts = 0
+        self.left_welds = 0
+        self.right_welds = 0
+        self.expected_parts = 0
+        self.mismatched_parts = 0
+        self.cycle_time_sum_sec = 0.0
+        self.cycle_time_count = 0
+        self.first_completed_at = None
+        self.last_completed_at = None
+
+    def add(
+        self,
+        completed_at: float,
+        expected_left_welds: int | None,
+        expected_right_welds: int | None,
+        actual_left_welds: int,
+        actual_right_welds: int,
+        cycle_time_sec: float | None,
+    ) -> None:
+        """Add a completed part to the totals.
+
+        Args:
+            completed_at (float): Time the part was completed (seconds since the epoch).
+            expected_left_welds (int | None): Expected left weld count, None if unknown.
+            expected_right_welds (int | None): Expected right weld count, None if unknown.
+            actual_left_welds (int): Actual left weld count.
+            actual_right_welds (int): Actual right weld count.
+            cycle_time_sec (float | None): Time from the start of the weld count until the part was completed, None if unknown.
+        """
+
+        self.parts += 1
+        self.left_welds += actual_left_welds
+        self.right_welds += actual_right_welds
+
+        if expected_left_welds is not None and expected_right_welds is not None:
+            self.expected_parts += 1
+            if (actual_left_welds, actual_right_welds) != (expected_left_welds, expected_right_welds):
+                self.mismatched_parts += 1
+
+        if cycle_time_sec is not None:
+            self.cycle_time_sum_sec += cycle_time_sec
+            self.cycle_time_count += 1
+
+        if self.first_completed_at is None:
+            self.first_completed_at = completed_at
+        self.last_completed_at = completed_at
+
+    def to_dict(self) -> dict:
+        """Get the totals with the derived rates.
+
+        Returns:
+            dict: Totals, parts per hour, mismatch rate and mean cycle time.
+        """
+
+        # Parts per hour over the span between the first and last part, or over the mean cycle time for a single part
+        parts_per_hour = None
+        if self.parts > 1 and self.last_completed_at > self.first_completed_at:
+            parts_per_hour = (self.parts - 1) * 3600 / (self.last_completed_at - self.first_completed_at)
+        elif self.cycle_time_count:
+            parts_per_hour = 3600 * self.cycle_time_count / self.cycle_time_sum_sec if self.cycle_time_sum_sec else None
+
+        return {
+            "parts": self.parts,
+            "leftWelds": self.left_welds,
+            "rightWelds": self.right_welds,
+            "mismatchedParts": self.mismatched_parts,
+            "mismatchRate": self.mismatched_parts / self.expected_parts if self.expected_parts else None,
+            "meanCycleTimeSec": self.cycle_time_sum_sec / self.cycle_time_count if self.cycle_time_count else None,
+            "partsPerHour": parts_per_hour,
+            "firstCompletedAt": self.first_completed_at,
+            "lastCompletedAt": self.last_completed_at,
+        }
 
 
 class ShiftService:
@@ -432,6 +2596,12 @@ class ShiftService:
         self.jig_number = None
         self.shift_number = None
 
+        # Running rollups of all completed parts since the app started, grouped by shift, jig, day and part number
+        self.rollups: dict[str, dict] = {"shifts": {}, "jigs": {}, "days": {}, "parts": {}}
+        self.total_rollup = StatsRollup()
+        self.part_started_at: dict[int, float] = {}
+        self.stats_lock = threading.Lock()
+
     def start_shift(self, left_welder_name: str, right_welder_name: str, jig_number: int, shift_number: int):
         """Start the shift with the given welder names.
 
@@ -458,16 +2628,81 @@ class ShiftService:
         self.shift_number = shift_number
         self.part_stats = {}
 
-    def update_stats(self, part_number: str):
-        """Update the part stats for the given part number.
+    def start_part(self, jig_number: int, started_at: float | None = None) -> None:
+        """Record the start of the weld count of a part, used for the cycle time when the part is completed.
+
+        Args:
+            jig_number (int): Jig number.
+            started_at (float | None, optional): Start time (seconds since the epoch). Defaults to now.
+        """
+
+        self.part_started_at[jig_number] = time.time() if started_at is None else started_at
+
+    def update_stats(
+        self,
+        part_number: str,
+        jig_number: int | None = None,
+        shift_number: int | None = None,
+        expected_left_welds: int | None = None,
+        expected_right_welds: int | None = None,
+        actual_left_welds: int = 0,
+        actual_right_welds: int = 0,
+        completed_at: float | None = None,
+    ):
+        """Update the part stats and the rollups with a completed part.
 
         Args:
             part_number (str): Part number to update the stats.
+            jig_number (int | None, optional): Jig number. Defaults to None.
+            shift_number (int | None, optional): Shift number. Defaults to None.
+            expected_left_welds (int | None, optional): Expected left weld count. Defaults to None.
+            expected_right_welds (int | None, optional): Expected right weld count. Defaults to None.
+            actual_left_welds (int, optional): Actual left weld count. Defaults to 0.
+            actual_right_welds (int, optional): Actual right weld count. Defaults to 0.
+            completed_at (float | None, optional): Completion time (seconds since the epoch). Defaults to now.
+        """
+
+        completed_at = time.time() if completed_at is None else completed_at
+
+        with self.stats_lock:
+            if part_number not in self.part_stats:
+                self.part_stats[part_number] = 0
+            self.part_stats[part_number] += 1
+
+            # The cycle time is only known once per started part, a reprinted tag does not count it again
+            started_at = self.part_started_at.pop(jig_number, None)
+            cycle_time_sec = completed_at - started_at if started_at is not None else None
+
+            day = datetime.datetime.fromtimestamp(completed_at).date().isoformat()
+            groups = [("shifts", shift_number), ("jigs", jig_number), ("days", day), ("parts", part_number)]
+            rollups = [self.total_rollup]
+            for group, key in groups:
+                if key is not None:
+                    rollups.append(self.rollups[group].setdefault(key, StatsRollup()))
+
+            for rollup in rollups:
+                rollup.add(
+                    completed_at=completed_at,
+                    expected_left_welds=expected_left_welds,
+                    expected_right_welds=expected_right_welds,
+                    actual_left_welds=actual_left_welds,
+                    actual_right_welds=actual_right_welds,
+                    cycle_time_sec=cycle_time_sec,
+                )
+
+    def get_rollups(self) -> dict:
+        """Get the rollups of all completed parts since the app started.
+
+        Returns:
+            dict: Rollup of all parts under "total", and rollups by "shifts", "jigs", "days" and "parts".
         """
 
-        if part_number not in self.part_stats:
-            self.part_stats[part_number] = 0
-        self.part_stats[part_number] += 1
+        with self.stats_lock:
+            stats = {"total": self.total_rollup.to_dict()}
+            for group, rollups in self.rollups.items():
+                stats[group] = {str(key): rollup.to_dict() for key, rollup in rollups.items()}
+
+        return stats
 
     def get_stats(self):
         """Get the current part stats.
@@ -479,20 +2714,125 @@ class ShiftService:
         return self.part_stats
 
 
+class PartNumberIndex:
+    """Prefix and substring search index over part numbers, built once per database refresh.
+
+    Part numbers are kept sorted case-insensitively so prefix matches are a bisected range, substring matches are looked
+    up in an inverted index of trigrams and only verified on the candidates.
+    """
+
+    def __init__(self, part_numbers) -> None:
+        self.part_numbers = sorted(part_numbers, key=str.lower)
+        self.keys = [part_number.lower() for part_number in self.part_numbers]
+
+        # Trigram to positions in the sorted part numbers
+        self.trigrams: dict[str, set[int]] = {}
+        for position, key in enumerate(self.keys):
+            for i in range(len(key) - 2):
+                self.trigrams.setdefault(key[i : i + 3], set()).add(position)
+
+    def _prefix_range(self, query: str) -> range:
+        """Get the positions of the part numbers starting with the query."""
+
+        start = bisect.bisect_left(self.keys, query)
+        end = bisect.bisect_left(self.keys, query + "\U0010ffff", lo=start)
+        return range(start, end)
+
+    def _substring_positions(self, query: str) -> list[int]:
+        """Get the positions of the part numbers containing the query, in sorted order."""
+
+        if len(query) < 3:
+            return [position for position, key in enumerate(self.keys) if query in key]
+
+        candidates = None
+        for i in range(len(query) - 2):
+            positions = self.trigrams.get(query[i : i + 3], set())
+            candidates = positions if candidates is None else candidates & positions
+            if not candidates:
+                return []
+
+        return sorted(position for position in candidates if query in self.keys[position])
+
+    def search(self, query: str, offset: int = 0, limit: int = 50) -> tuple[list[str], int]:
+        """Search the part numbers, case-insensitively.
+
+        Args:
+            query (str): Text to search for, an empty query matches all part numbers.
+            offset (int, optional): Number of matches to skip. Defaults to 0.
+            limit (int, optional): Maximum number of matches to return. Defaults to 50.
+
+        Returns:
+            tuple[list[str], int]: Page of matching part numbers, prefix matches first, and the total number of matches.
+        """
+
+        query = query.lower()
+        if not query:
+            return self.part_numbers[offset : offset + limit], len(self.part_numbers)
+
+        prefix_positions = self._prefix_range(query)
+        other_positions = [position for position in self._substring_positions(query) if position not in prefix_positions]
+        positions = [*prefix_positions, *other_positions]
+
+        return [self.part_numbers[position] for position in positions[offset : offset + limit]], len(positions)
+
+
 class GoogleAPIService:
-    """Service to interact with the Google API."""
+    """Service to interact with the Google API.
+
+    The part number database is cached in memory and refreshed by a background worker, reads never wait on the network.
+    Every successful refresh is also saved to a snapshot file, which is loaded at startup so the parts are available
+    before the sheet can be reached.
+    """
 
     def __init__(self) -> None:
         self.scopes = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+        self.sheet = None
+        self.reconfigure()
+
+        # Cached database, the hash of the sheet contents is used to skip rebuilding it when nothing changed
+        self.part_number_database = {}
+        self.part_number_index = PartNumberIndex([])
+        self.database_hash = None
+        self.last_refreshed_at = None
+
+        # Background refresh control
+        self.refresh_event = threading.Event()
+        self.thread = None
+
+        self.snapshot_path = os.path.join(data_dir, "part_number_database.json")
+
+        if self.enabled:
+            self.load_snapshot()
+
+    def reconfigure(self) -> None:
+        """Apply the database configuration, `start` has to be called again to use new credentials."""
+
         self.service_account = database_config.service_account
         self.spreadsheet_id = database_config.database_id
         self.range_name = database_config.database_range
         self.enabled = database_config.enabled
-        self.sheet = None
-        self.part_number_database = {}
+        self.refresh_interval_sec = database_config.refresh_interval_sec
 
-        if self.enabled:
-            self.check_and_initialize_credentials()
+    def start(self) -> None:
+        """Initialize the Google API client and start refreshing the part number database in the background.
+
+        Calling it again reinitializes the client with the current credentials and refreshes the database right away.
+
+        Raises:
+            RuntimeError: If the credentials are invalid, so the start is reported as failed and retried.
+        """
+
+        if not self.enabled:
+            return
+
+        if not self.check_and_initialize_credentials():
+            raise RuntimeError("Failed to initialize Google API credentials")
+
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.refresh_thread, daemon=True)
+            self.thread.start()
+        else:
+            self.request_refresh()
 
     def check_and_initialize_credentials(self) -> bool:
         """Check if the Google API settings are valid. If valid, initialize the credentials.
@@ -502,6 +2842,10 @@ class GoogleAPIService:
         """
 
         try:
+            # Imported here since the Google API client takes a while to import and is only used with the database
+            from googleapiclient.discovery import build
+            from google.oauth2.service_account import Credentials
+
             credentials = Credentials.from_service_account_info(self.service_account, scopes=self.scopes)
             service = build("sheets", "v4", credentials=credentials)
 
@@ -513,35 +2857,183 @@ class GoogleAPIService:
 
         return False
 
-    def get_updated_part_number_database(self) -> dict:
-        """Get the updated part number database from the Google Spreadsheet.
+    def load_snapshot(self) -> bool:
+        """Load the part number database from the snapshot file.
+
+        Returns:
+            bool: True if the snapshot was loaded, False otherwise.
+        """
+
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            logger.info("No Part Number Database snapshot found.")
+            return False
+        except Exception as e:
+            logger.error(f"Failed to load Part Number Database snapshot: {e}", exc_info=True)
+            return False
+
+        self.part_number_database = snapshot["database"]
+        self.part_number_index = PartNumberIndex(self.part_number_database)
+        self.database_hash = snapshot["hash"]
+        self.last_refreshed_at = snapshot["refreshed_at"]
+        logger.info(f"Part Number Database loaded from snapshot with {len(self.part_number_database)} parts.")
+
+        return True
+
+    def save_snapshot(self) -> bool:
+        """Save the part number database to the snapshot file, replacing it atomically.
+
+        Returns:
+            bool: True if the snapshot was saved, False otherwise.
+        """
+
+        snapshot = {"hash": self.database_hash, "refreshed_at": self.last_refreshed_at, "database": self.part_number_database}
+        temp_path = f"{self.snapshot_path}.tmp"
+
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+            with open(temp_path, "w") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_path)
+        except Exception as e:
+            logger.error(f"Failed to save Part Number Database snapshot: {e}", exc_info=True)
+            return False
+
+        return True
+
+    def get_part_number_database(self) -> dict:
+        """Get the cached part number database without waiting on the network.
 
         Returns:
             dict: Part number database dictionary with part number as key and weld counts as values.
         """
 
+        # Stale cache is still returned, the worker is only asked to refresh it sooner
+        cache_age = self.get_cache_age()
+        if self.enabled and (cache_age is None or cache_age > self.refresh_interval_sec):
+            self.request_refresh()
+
+        return self.part_number_database
+
+    def get_part(self, part_number: str) -> dict | None:
+        """Get the weld counts of a part number from the cached database.
+
+        Args:
+            part_number (str): Part number to look up.
+
+        Returns:
+            dict | None: Weld counts of the part number, None if it is not in the database.
+        """
+
+        return self.get_part_number_database().get(part_number)
+
+    def search_parts(self, query: str, offset: int = 0, limit: int = 50) -> tuple[list[dict], int]:
+        """Search the cached database for part numbers matching the query.
+
+        Args:
+            query (str): Text to search for in the part numbers, an empty query matches all part numbers.
+            offset (int, optional): Number of matches to skip. Defaults to 0.
+            limit (int, optional): Maximum number of matches to return. Defaults to 50.
+
+        Returns:
+            tuple[list[dict], int]: Page of matching parts with their part number and weld counts, and the total number
+                of matches.
+        """
+
+        part_numbers, total = self.part_number_index.search(query, offset=offset, limit=limit)
+
+        # A part removed by a refresh in between is returned without weld counts
+        database = self.get_part_number_database()
+        return [{"partNumber": part_number, **database.get(part_number, {})} for part_number in part_numbers], total
+
+    def get_database_hash(self) -> str | None:
+        """Get the hash of the part number database contents.
+
+        Returns:
+            str | None: SHA-256 hash of the database, None if it was never loaded.
+        """
+
+        return self.database_hash
+
+    def get_cache_age(self) -> float | None:
+        """Get the time since the part number database was last fetched successfully.
+
+        Returns:
+            float | None: Cache age in seconds, None if it was never fetched.
+        """
+
+        if self.last_refreshed_at is None:
+            return None
+
+        return time.time() - self.last_refreshed_at
+
+    def request_refresh(self) -> None:
+        """Ask the background worker to refresh the part number database now."""
+
+        self.refresh_event.set()
+
+    def refresh_thread(self) -> None:
+        """Thread to refresh the part number database every `refresh_interval_sec` or when requested."""
+
+        while True:
+            self.refresh_event.clear()
+            success = self.refresh_part_number_database()
+
+            # Retry failed refreshes sooner than the regular interval
+            timeout = self.refresh_interval_sec if success else min(self.refresh_interval_sec, 30)
+            self.refresh_event.wait(timeout=timeout)
+
+    def refresh_part_number_database(self) -> bool:
+        """Fetch the part number database from the Google Spreadsheet and update the cache if it changed.
+
+        Returns:
+            bool: True if the database was fetched successfully, False otherwise.
+        """
+
         if not self.enabled:
             logger.info("Part Number Database is not enabled. Skipping update.")
-            return self.part_number_database
+            return False
+
+        if self.sheet is None:
+            logger.warning("Google API credentials are not initialized. Skipping Part Number Database update.")
+            return False
 
         try:
             result = self.sheet.values().get(spreadsheetId=self.spreadsheet_id, range=self.range_name).execute()
             values = result.get("values", [])
+        except Exception as e:
+            logger.error(f"Failed to update Part Number Database: {e}", exc_info=True)
+            return False
 
-            self.part_number_database = {}
+        self.last_refreshed_at = time.time()
 
-            for row in values:
-                if len(row) >= 1:  # Ensure the first column (Part Number) is present
-                    part_number = row[0]
+        database_hash = hashlib.sha256(json.dumps(values).encode()).hexdigest()
+        if database_hash == self.database_hash:
+            logger.debug("Part Number Database unchanged.")
+            self.save_snapshot()
+            return True
 
-                    left_weld_count = int(row[1]) if len(row) > 1 and row[1].isdigit() else 0
-                    right_weld_count = int(row[2]) if len(row) > 2 and row[2].isdigit() else 0
+        part_number_database = {}
 
-                    self.part_number_database[part_number] = {"Left Weld Count": left_weld_count, "Right Weld Count": right_weld_count}
+        for row in values:
+            if len(row) >= 1:  # Ensure the first column (Part Number) is present
+                part_number = row[0]
 
-            return self.part_number_database
+                left_weld_count = int(row[1]) if len(row) > 1 and row[1].isdigit() else 0
+                right_weld_count = int(row[2]) if len(row) > 2 and row[2].isdigit() else 0
 
-        except Exception as e:
-            logger.error(f"Failed to update Part Number Database: {e}", exc_info=True)
+                part_number_database[part_number] = {"Left Weld Count": left_weld_count, "Right Weld Count": right_weld_count}
 
-        return self.part_number_database
+        # Swap in the new database at once so readers never see a partial one
+        self.part_number_index = PartNumberIndex(part_number_database)
+        self.part_number_database = part_number_database
+        self.database_hash = database_hash
+        logger.info(f"Part Number Database updated with {len(part_number_database)} parts.")
+
+        self.save_snapshot()
+
+        return True
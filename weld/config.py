@@ -1,10 +1,18 @@
 import os
-import sys
+import json
+import time
 import logging
-from pydantic import Field, BaseModel
+import threading
+from typing import Callable, Literal
+from pydantic import Field, BaseModel, model_validator
 
 logger = logging.getLogger(__name__)
 
+
+class ConfigError(Exception):
+    """Raised when the app configuration is missing or invalid."""
+
+
 SAMPLE_APP_CONFIG = """
 {
     "ml_detector_id": "DETECTOR_ID", 
@@ -85,6 +93,8 @@ SAMPLE_APP_DATABASE_CONFIG = """
 
 device_id = os.getenv("WELD_APP_DEVICE_ID", "Default")
 
+data_dir = os.getenv("WELD_APP_DATA_DIR", "data")
+
 app_config_raw = os.getenv("WELD_APP_CONFIG", None)
 app_config = None
 
@@ -96,24 +106,92 @@ database_config = None
 
 supervisor_password = os.getenv("WELD_APP_SUPERVISOR_PASSWORD", None)
 
+# Optional JSON file with "app", "camera" and "database" sections, watched for changes while the app runs
+config_file = os.getenv("WELD_APP_CONFIG_FILE", None)
+
 
 class PrinterConfig(BaseModel):
     printer_ip: str = Field(..., description="Tag Printer IP")
     printer_port: int = Field(..., description="Tag Printer Port")
     printer_timeout: int = Field(5, description="Tag Printer Timeout in seconds, default 5")
+    printer_status_check: bool = Field(True, description="Check that the Tag Printer answers ZPL host status requests (~HS), default True")
     printer_paper_width: float = Field(2.25, description="Tag Printer Paper Width in inches, default 2.25")
     printer_paper_length: float = Field(4.00, description="Tag Printer Paper Length in inches, default 4.00")
     printer_dpi: int = Field(203, description="Tag Printer DPI, default 203")
 
 
+class PrefilterConfig(BaseModel):
+    enabled: bool = Field(False, description="Skip ML requests for idle half-frames, default False")
+    motion_threshold: float = Field(8.0, description="Mean luminance change (0-255) since the previous frame to count as activity, default 8.0")
+    brightness_threshold: int = Field(200, description="Luminance (0-255) of a pixel to count as bright, default 200")
+    bright_pixel_ratio: float = Field(0.01, description="Ratio of bright pixels to count as activity, default 0.01")
+
+
+class EncodingConfig(BaseModel):
+    enabled: bool = Field(True, description="Encode the images as JPEG in the app before sending them to ML, default True")
+    max_width: int | None = Field(None, ge=1, description="Maximum width in pixels of the images sent to ML, default None for no limit")
+    max_height: int | None = Field(None, ge=1, description="Maximum height in pixels of the images sent to ML, default None for no limit")
+    jpeg_quality: int = Field(95, ge=1, le=100, description="JPEG quality (1-100) of the images sent to ML, default 95")
+    workers: int = Field(2, ge=1, description="Number of threads encoding images in parallel, default 2")
+
+
+class DebouncerConfig(BaseModel):
+    max_state: float = Field(1, gt=0, description="Maximum state of the saturating counter of each side, default 1")
+    on_threshold: float = Field(1, gt=0, description="State at which a side turns on and a weld is counted, default 1")
+    off_threshold: float = Field(0, ge=0, description="State at or below which a side turns off again, default 0")
+    confidence_weighted: bool = Field(False, description="Step the counters by the ML confidence instead of 1, default False")
+    record_label_sequences: bool = Field(False, description="Record the labels of each part with its confirmed counts for tuning, default False")
+
+    @model_validator(mode="after")
+    def check_thresholds(self) -> "DebouncerConfig":
+        if not self.off_threshold < self.on_threshold <= self.max_state:
+            raise ValueError("Thresholds must satisfy off_threshold < on_threshold <= max_state")
+        return self
+
+
+class MLReplayQueueConfig(BaseModel):
+    enabled: bool = Field(True, description="Queue frames on disk when ML requests fail and replay them later, default True")
+    max_frames: int = Field(2000, ge=1, description="Maximum number of queued frames, the oldest are dropped first, default 2000")
+    max_bytes: int = Field(100_000_000, ge=1, description="Maximum total size in bytes of the queued JPEGs, default 100000000")
+    downscale: float = Field(0.5, gt=0, le=1, description="Scale factor of the queued frames, default 0.5")
+    jpeg_quality: int = Field(80, ge=1, le=100, description="JPEG quality (1-100) of the queued frames, default 80")
+    outage_sample_rate_hz: float = Field(
+        1.0, gt=0, description="Frames per second of each jig queued during an outage, lower if the jig's min_sample_rate_hz is, default 1.0"
+    )
+
+
 class AppConfig(BaseModel):
     edge_endpoint: str | None = Field(None, description="The edge-endpoint IP address for local inference, default None for cloud inference")
     ml_detector_id: str = Field(..., description="ML Detector ID")
+    ml_inference_mode: Literal["split", "full_frame"] = Field(
+        "split", description="Send each frame as two half-frame queries (split) or one full-frame query with regions (full_frame)"
+    )
+    pipeline_depth: int = Field(1, ge=1, description="Number of frames with ML requests in flight at once per jig, default 1 (serial)")
+    max_concurrent_ml_requests: int = Field(8, ge=1, description="Number of frames with ML requests in flight at once across all jigs, default 8")
     printer: PrinterConfig
+    prefilter: PrefilterConfig = Field(default_factory=PrefilterConfig, description="Local pre-filter to skip ML requests on idle frames")
+    encoding: EncodingConfig = Field(default_factory=EncodingConfig, description="Downscaling and JPEG encoding of the images sent to ML")
+    debouncer: DebouncerConfig = Field(default_factory=DebouncerConfig, description="Filter turning the ML labels of each side into weld flashes")
+    ml_replay_queue: MLReplayQueueConfig = Field(
+        default_factory=MLReplayQueueConfig, description="Local queue for frames whose ML request failed while the detector was unreachable"
+    )
 
 
 class JigStationConfig(BaseModel):
     camera_config: dict = Field(..., description="Camera configuration Dict for FrameGrab")
+    min_sample_rate_hz: float | None = Field(
+        None, gt=0, description="Frames per second sent to ML while the jig is idle, default None to always use the maximum rate"
+    )
+    max_sample_rate_hz: float | None = Field(
+        None, gt=0, description="Frames per second sent to ML while the jig is active, default None for as fast as ML allows"
+    )
+    idle_after_sec: float = Field(5.0, ge=0, description="Time in seconds without weld activity before the jig is idle, default 5.0")
+
+    @model_validator(mode="after")
+    def check_sample_rates(self) -> "JigStationConfig":
+        if self.min_sample_rate_hz is not None and self.max_sample_rate_hz is not None and self.min_sample_rate_hz > self.max_sample_rate_hz:
+            raise ValueError("min_sample_rate_hz must not be greater than max_sample_rate_hz")
+        return self
 
 
 class AppCameraConfig(BaseModel):
@@ -125,14 +203,153 @@ class DatabaseConfig(BaseModel):
     service_account: dict = Field(..., description="Service Account for Part Number Database")
     database_id: str = Field(..., description="Database ID for Part Number Database (Google Spreadsheet ID)")
     database_range: str = Field(..., description="Database Range for Part Number Database (Google Spreadsheet Range)")
+    refresh_interval_sec: int = Field(300, ge=1, description="Time in seconds between Part Number Database refreshes, default 300")
+
+
+CONFIG_SECTIONS = {"app": AppConfig, "camera": AppCameraConfig, "database": DatabaseConfig}
+
+
+def load_config_file(path: str) -> dict[str, BaseModel]:
+    """Load and validate the configuration file.
+
+    Args:
+        path (str): Path of a JSON file with optional "app", "camera" and "database" sections, in the format of
+            `WELD_APP_CONFIG`, `WELD_APP_CAMERA_CONFIG` and `WELD_APP_DATABASE_CONFIG`.
+
+    Returns:
+        dict[str, BaseModel]: Validated configuration by section name, only for the sections in the file.
+
+    Raises:
+        ConfigError: If the file cannot be read or a section is invalid.
+    """
+
+    try:
+        with open(path) as f:
+            raw = json.load(f)
+        return {section: model.model_validate(raw[section]) for section, model in CONFIG_SECTIONS.items() if section in raw}
+    except Exception as e:
+        raise ConfigError(f"Error loading configuration file {path}: {e}") from e
+
+
+def get_config(section: str) -> BaseModel:
+    """Get the loaded configuration of a section ("app", "camera" or "database")."""
+
+    return {"app": app_config, "camera": camera_config, "database": database_config}[section]
+
+
+def apply_config(current: BaseModel, new: BaseModel) -> dict[str, tuple]:
+    """Update the loaded configuration in place with the fields that changed.
+
+    The configuration objects are imported by reference across the app, so they are updated instead of replaced. Each
+    field is swapped as a whole, readers see either the old or the new value of a nested section such as `printer`.
+
+    Args:
+        current (BaseModel): Loaded configuration to update.
+        new (BaseModel): Validated new configuration of the same model.
+
+    Returns:
+        dict[str, tuple]: Old and new value of each changed field by field name.
+    """
+
+    changes = {}
+    for name in type(current).model_fields:
+        old_value, new_value = getattr(current, name), getattr(new, name)
+        if old_value != new_value:
+            setattr(current, name, new_value)
+            changes[name] = (old_value, new_value)
+
+    return changes
+
+
+class ConfigWatcher:
+    """Watches the configuration file and applies valid changes to the loaded configuration while the app runs.
+
+    Listeners are called with the section name and the changed fields, so each service only restarts what a change
+    affects. An invalid file is logged and ignored, the current configuration stays in effect.
+    """
+
+    POLL_INTERVAL_SEC = 2.0
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.listeners: list[Callable[[str, dict[str, tuple]], None]] = []
+        self.file_stamp = self._file_stamp()
+        self.thread = None
+
+    def add_listener(self, listener: Callable[[str, dict[str, tuple]], None]) -> None:
+        """Add a function called with the section name and the old and new values of its changed fields."""
+
+        self.listeners.append(listener)
+
+    def start(self) -> None:
+        """Start checking the configuration file for changes in the background."""
+
+        if self.thread is not None:
+            return
+
+        self.thread = threading.Thread(target=self.watch_thread, name="config-watcher", daemon=True)
+        self.thread.start()
+        logger.info(f"Watching configuration file {self.path} for changes")
+
+    def _file_stamp(self) -> tuple[int, int] | None:
+        """Get the modification time and size of the configuration file, None if it does not exist."""
+
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> bool:
+        """Reload the configuration file if it changed since the last check and apply the changes.
+
+        Returns:
+            bool: True if any configuration field changed, False otherwise.
+        """
+
+        file_stamp = self._file_stamp()
+        if file_stamp is None or file_stamp == self.file_stamp:
+            return False
+        self.file_stamp = file_stamp
+
+        try:
+            sections = load_config_file(self.path)
+        except ConfigError as e:
+            logger.error(f"{e}, keeping the current configuration")
+            return False
+
+        changed = False
+        for section, new_config in sections.items():
+            changes = apply_config(get_config(section), new_config)
+            if not changes:
+                continue
+
+            changed = True
+            logger.info(f"Configuration {section} changed: {', '.join(changes)}")
+            for listener in self.listeners:
+                try:
+                    listener(section, changes)
+                except Exception as e:
+                    logger.error(f"Failed to apply the {section} configuration changes: {e}", exc_info=True)
+
+        return changed
+
+    def watch_thread(self) -> None:
+        """Thread to check the configuration file every `POLL_INTERVAL_SEC`."""
+
+        while True:
+            time.sleep(self.POLL_INTERVAL_SEC)
+            self.check()
 
 
-# Load configuration
+# Load configuration, the sections of the configuration file take precedence over the environment variables
 try:
-    app_config = AppConfig.model_validate_json(app_config_raw)
-    camera_config = AppCameraConfig.model_validate_json(camera_config_raw)
-    database_config = DatabaseConfig.model_validate_json(database_config_raw)
+    file_config = load_config_file(config_file) if config_file else {}
+    app_config = file_config.get("app") or AppConfig.model_validate_json(app_config_raw)
+    camera_config = file_config.get("camera") or AppCameraConfig.model_validate_json(camera_config_raw)
+    database_config = file_config.get("database") or DatabaseConfig.model_validate_json(database_config_raw)
     logger.info("Configuration loaded successfully!")
 except Exception as e:
-    logger.error(f"Error loading configuration: {e}", exc_info=True)
-    sys.exit(1)
+    # Raised instead of exiting, so the process that imports the config decides how to fail
+    raise ConfigError(f"Error loading configuration: {e}") from e
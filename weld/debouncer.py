@@ -0,0 +1,181 @@
+import json
+
+import numpy as np
+
+
+class FlashDebouncer:
+    """Saturating counters with hysteresis that turn the ML label of each frame into debounced weld flashes.
+
+    Each channel (e.g. one side of a jig) has a counter between 0 and `max_state`. A "YES" label moves it up and a "NO"
+    label moves it down, by 1 or, if confidence weighted, by how far the ML confidence is above chance
+    (`2 * confidence - 1`). A channel turns on when its counter reaches `on_threshold` and off again once it falls to
+    `off_threshold`, and every off-to-on transition is counted as one flash.
+
+    All channels are updated at once as NumPy arrays, and the parameters may be arrays with one value per channel, so
+    many recorded sequences and settings can be replayed side by side. The defaults count every "YES" frame that follows
+    a "NO" frame as a new flash.
+    """
+
+    def __init__(
+        self,
+        channels: int,
+        max_state: float | np.ndarray = 1,
+        on_threshold: float | np.ndarray = 1,
+        off_threshold: float | np.ndarray = 0,
+        confidence_weighted: bool = False,
+    ) -> None:
+        self.channels = channels
+        self.max_state = np.broadcast_to(np.asarray(max_state, dtype=np.float64), (channels,))
+        self.on_threshold = np.broadcast_to(np.asarray(on_threshold, dtype=np.float64), (channels,))
+        self.off_threshold = np.broadcast_to(np.asarray(off_threshold, dtype=np.float64), (channels,))
+        self.confidence_weighted = confidence_weighted
+
+        if np.any(self.off_threshold >= self.on_threshold) or np.any(self.on_threshold > self.max_state):
+            raise ValueError("Thresholds must satisfy off_threshold < on_threshold <= max_state")
+
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset all channels to off with no flashes counted."""
+
+        self.state = np.zeros(self.channels, dtype=np.float64)
+        self.active = np.zeros(self.channels, dtype=bool)
+        self.counts = np.zeros(self.channels, dtype=np.int64)
+
+    def get_state(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get a copy of the counters, on/off states and flash counts of all channels, to restore them later."""
+
+        return self.state.copy(), self.active.copy(), self.counts.copy()
+
+    def set_state(self, state: tuple[np.ndarray, np.ndarray, np.ndarray]) -> None:
+        """Restore the counters, on/off states and flash counts returned by `get_state`."""
+
+        self.state, self.active, self.counts = (array.copy() for array in state)
+
+    def update(self, labels: np.ndarray, confidences: np.ndarray | None = None) -> np.ndarray:
+        """Update all channels with the ML labels of the next frame.
+
+        Args:
+            labels (np.ndarray): Boolean array with one value per channel, True if the label is "YES".
+            confidences (np.ndarray | None, optional): ML confidence (0.5-1) of each label, NaN if unknown. Only used if
+                confidence weighted. Defaults to None.
+
+        Returns:
+            np.ndarray: Boolean array, True for the channels where a new flash was counted.
+        """
+
+        labels = np.asarray(labels, dtype=bool)
+
+        step = 1.0
+        if self.confidence_weighted and confidences is not None:
+            confidences = np.asarray(confidences, dtype=np.float64)
+            step = np.where(np.isnan(confidences), 1.0, np.clip(2 * confidences - 1, 0.0, 1.0))
+
+        self.state = np.clip(self.state + np.where(labels, step, -step), 0.0, self.max_state)
+
+        was_active = self.active
+        self.active = np.where(was_active, self.state > self.off_threshold, self.state >= self.on_threshold)
+        flashes = self.active & ~was_active
+        self.counts += flashes
+
+        return flashes
+
+
+def replay(labels: np.ndarray, confidences: np.ndarray | None = None, **params) -> np.ndarray:
+    """Run recorded label sequences through a debouncer and count their flashes.
+
+    Args:
+        labels (np.ndarray): Boolean array of shape (frames, channels), True for "YES".
+        confidences (np.ndarray | None, optional): Array of the same shape with the ML confidences. Defaults to None.
+        **params: Parameters of the FlashDebouncer, scalars or arrays with one value per channel.
+
+    Returns:
+        np.ndarray: Number of flashes counted in each channel.
+    """
+
+    debouncer = FlashDebouncer(channels=labels.shape[1], **params)
+    for frame in range(labels.shape[0]):
+        debouncer.update(labels[frame], confidences[frame] if confidences is not None else None)
+
+    return debouncer.counts
+
+
+def load_label_sequences(path: str) -> list[dict]:
+    """Load the label sequences recorded by the weld count, one sequence per side of each part.
+
+    Args:
+        path (str): Path to the JSON lines file with the recorded sequences.
+
+    Returns:
+        list[dict]: Sequences with "labels", "confidences" and the "expected" number of welds.
+    """
+
+    sequences = []
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                sequences.extend([record["left"], record["right"]])
+
+    return sequences
+
+
+def pad_sequences(sequences: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    """Stack label sequences of different lengths into (frames, sequences) arrays.
+
+    Shorter sequences are padded with "NO", which can only end a flash and never count one.
+
+    Args:
+        sequences (list[dict]): Sequences with "labels" and "confidences".
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Labels and confidences (NaN if unknown).
+    """
+
+    frames = max((len(sequence["labels"]) for sequence in sequences), default=0)
+    labels = np.zeros((frames, len(sequences)), dtype=bool)
+    confidences = np.full((frames, len(sequences)), np.nan)
+    for index, sequence in enumerate(sequences):
+        labels[: len(sequence["labels"]), index] = sequence["labels"]
+        confidences[: len(sequence["confidences"]), index] = [np.nan if value is None else value for value in sequence["confidences"]]
+
+    return labels, confidences
+
+
+def evaluate(sequences: list[dict], settings: list[dict]) -> list[dict]:
+    """Replay all sequences with each setting at once and compare the counts with the expected number of welds.
+
+    Args:
+        sequences (list[dict]): Sequences with "labels", "confidences" and "expected".
+        settings (list[dict]): Debouncer parameters to evaluate, with "max_state", "on_threshold", "off_threshold" and
+            "confidence_weighted".
+
+    Returns:
+        list[dict]: Each setting with the ratio of sequences counted exactly ("accuracy") and the mean absolute error.
+    """
+
+    if not sequences:
+        return []
+
+    labels, confidences = pad_sequences(sequences)
+    expected = np.array([sequence["expected"] for sequence in sequences])
+    results = []
+
+    # Weighted and unweighted settings are replayed separately, all other parameters vary per channel
+    for confidence_weighted in [False, True]:
+        group = [setting for setting in settings if setting["confidence_weighted"] == confidence_weighted]
+        if not group:
+            continue
+
+        params = {}
+        for name in ["max_state", "on_threshold", "off_threshold"]:
+            params[name] = np.repeat([setting[name] for setting in group], len(sequences))
+        counts = replay(
+            np.tile(labels, len(group)), np.tile(confidences, len(group)), confidence_weighted=confidence_weighted, **params
+        ).reshape(len(group), len(sequences))
+
+        for setting, setting_counts in zip(group, counts):
+            errors = np.abs(setting_counts - expected)
+            results.append({**setting, "accuracy": float(np.mean(errors == 0)), "mean_abs_error": float(np.mean(errors))})
+
+    return results
@@ -0,0 +1,177 @@
+import os
+import time
+import logging
+from typing import Callable
+from multiprocessing.managers import BaseManager
+
+logger = logging.getLogger(__name__)
+
+# Set by run.py for the web server workers when the services run in a separate owner process
+SERVICES_ADDRESS_ENV = "WELD_APP_SERVICES_ADDRESS"
+SERVICES_AUTHKEY_ENV = "WELD_APP_SERVICES_AUTHKEY"
+
+SERVICE_NAMES = [
+    "jig_lock_service",
+    "printer_service",
+    "weld_count_service",
+    "shift_service",
+    "google_api_service",
+    "metrics_registry",
+    "service_readiness",
+]
+
+
+class ServiceManager(BaseManager):
+    """Manager that serves the app services from the process owning the cameras, GPIO and printer.
+
+    Method calls on the proxies returned to the web server workers run in the owner process, their arguments and return
+    values are pickled over a local socket. Only public methods can be called, attributes are not shared.
+    """
+
+
+def create_services() -> dict:
+    """Create all app services in this process and open the jig cameras.
+
+    The services that need the network finish starting concurrently in the background, see `ServiceReadiness`.
+
+    Returns:
+        dict: Services by name.
+    """
+
+    started_at = time.perf_counter()
+
+    # Imported here so the web server workers, which only use proxies, do not load the camera and ML dependencies
+    from weld import backend, metrics
+
+    readiness = backend.ServiceReadiness()
+    services = {
+        "jig_lock_service": backend.JigLockService(),
+        "printer_service": backend.PrinterService(),
+        "weld_count_service": backend.WeldCountService(),
+        "shift_service": backend.ShiftService(),
+        "google_api_service": backend.GoogleAPIService(),
+        "metrics_registry": metrics.REGISTRY,
+        "service_readiness": readiness,
+    }
+
+    # Open the jig cameras now so the first weld count does not wait for a connection
+    services["weld_count_service"].camera_pool.warm_up()
+
+    for name in ["weld_count_service", "google_api_service"]:
+        readiness.start(name, services[name].start)
+
+    watch_config(lambda section, changes: apply_config_changes(services, section, changes))
+
+    logger.info(f"App services created in {time.perf_counter() - started_at:.2f}s")
+    return services
+
+
+def apply_config_changes(services: dict, section: str, changes: dict[str, tuple]) -> None:
+    """Apply configuration changes to the affected services only, everything else keeps running.
+
+    Args:
+        services (dict): Services by name, as created by `create_services`.
+        section (str): Changed configuration section, "app", "camera" or "database".
+        changes (dict[str, tuple]): Old and new value of each changed field by field name.
+    """
+
+    readiness = services["service_readiness"]
+    weld_count_service = services["weld_count_service"]
+
+    if section == "camera":
+        weld_count_service.reconfigure_cameras()
+
+    elif section == "app":
+        if "printer" in changes:
+            services["printer_service"].reconfigure()
+
+        weld_count_service.reconfigure(set(changes))
+
+        # The Groundlight client is only rebuilt when its endpoint or detector changed
+        if changes.keys() & {"edge_endpoint", "ml_detector_id"}:
+            readiness.start("weld_count_service", weld_count_service.start)
+
+    elif section == "database":
+        services["google_api_service"].reconfigure()
+        readiness.start("google_api_service", services["google_api_service"].start)
+
+
+def watch_config(listener: Callable[[str, dict[str, tuple]], None] | None = None) -> None:
+    """Start watching the configuration file, if one is configured, so changes apply without restarting the app.
+
+    Args:
+        listener (Callable | None, optional): Function called with the section name and the changed fields on every
+            change. Defaults to None to only keep the configuration of this process current.
+    """
+
+    from weld import config
+
+    if not config.config_file:
+        return
+
+    watcher = config.ConfigWatcher(config.config_file)
+    if listener is not None:
+        watcher.add_listener(listener)
+    watcher.start()
+
+
+def serve_services(address: str, authkey: bytes) -> None:
+    """Create the app services and serve them to the web server workers until the process is terminated.
+
+    Args:
+        address (str): Path of the Unix socket to listen on.
+        authkey (bytes): Secret the workers authenticate with.
+    """
+
+    services = create_services()
+    for name, service in services.items():
+        ServiceManager.register(name, callable=lambda service=service: service)
+
+    server = ServiceManager(address=address, authkey=authkey).get_server()
+    logger.info(f"Serving app services on {address}")
+    server.serve_forever()
+
+
+def connect_services(address: str, authkey: bytes) -> dict:
+    """Connect to the app services of the owner process.
+
+    Args:
+        address (str): Path of the Unix socket of the owner process.
+        authkey (bytes): Secret of the owner process.
+
+    Returns:
+        dict: Proxies of the services by name.
+    """
+
+    for name in SERVICE_NAMES:
+        ServiceManager.register(name)
+
+    manager = ServiceManager(address=address, authkey=authkey)
+    manager.connect()
+
+    return {name: getattr(manager, name)() for name in SERVICE_NAMES}
+
+
+def get_services() -> dict:
+    """Get the app services, from the owner process if one is configured or created in this process otherwise.
+
+    Returns:
+        dict: Services (or their proxies) by name.
+    """
+
+    address = os.getenv(SERVICES_ADDRESS_ENV)
+    if address:
+        logger.info(f"Connecting to the app services on {address}")
+        services = connect_services(address, bytes.fromhex(os.environ[SERVICES_AUTHKEY_ENV]))
+
+        # The pages of the workers read the configuration too, e.g. the number of jig stations
+        watch_config()
+        return services
+
+    return create_services()
+
+
+if __name__ == "__main__":
+    # Owner process started by run.py in production, the address and secret are passed in the environment
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    serve_services(os.environ[SERVICES_ADDRESS_ENV], bytes.fromhex(os.environ[SERVICES_AUTHKEY_ENV]))
@@ -1,5 +1,41 @@
 document.addEventListener('DOMContentLoaded', () => {
     const passwordModal = document.getElementById("password-modal");
+    const printStatus = document.getElementById("print-status");
+    const printStatusIcon = document.getElementById("print-status-icon");
+    var url = document.getElementById('index-form').action
+
+    // Poll the print job every second until the tag is done
+    async function updatePrintStatus() {
+        try {
+            const response = await fetch(url + 'api/print-jobs/' + encodeURIComponent(printStatus.dataset.jobId));
+            const job = await response.json();
+
+            if (job.status === 'printed') {
+                printStatus.textContent = 'Tag Printed';
+                printStatusIcon.setAttribute("fill", "#00B21E");
+                return;
+            }
+
+            if (job.status === 'unconfirmed') {
+                printStatus.textContent = 'Tag sent, printer did not confirm';
+                return;
+            }
+
+            if (job.status === 'failed') {
+                printStatus.textContent = 'Tag could not be printed, printer unavailable';
+                printStatusIcon.setAttribute("fill", "#D0021B");
+                return;
+            }
+
+            if (job.status === 'retrying') {
+                printStatus.textContent = 'Printer unavailable, retrying (attempt ' + job.attempts + ')...';
+            }
+        } catch (error) {
+            console.error('Error fetching print job status:', error);
+        }
+
+        setTimeout(updatePrintStatus, 1000);
+    }
 
     document.addEventListener('keydown', function (event) {
         if (event.key === 'Enter') {
@@ -16,4 +52,7 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    if (printStatus.dataset.jobId) {
+        updatePrintStatus();
+    }
 });
\ No newline at end of file
@@ -1,24 +1,29 @@
 document.addEventListener('DOMContentLoaded', () => {
     const passwordModal = document.getElementById("password-modal");
     var url = document.getElementById('index-form').action
+    const jigNumber = document.querySelector('input[name="jig_number"]').value;
+
+    function showData(data) {
+        const partNumber = document.getElementById('partNumber');
+        const leftWeldCount = document.getElementById('leftWeldCount');
+        const rightWeldCount = document.getElementById('rightWeldCount');
+        const actualLeftWeldCount = document.getElementById('actual_left_welds');
+        const actualRightWeldCount = document.getElementById('actual_right_welds');
+
+        partNumber.textContent = data.partNumber || 'N/A';
+        leftWeldCount.textContent = parseInt(data.leftWeldCount, 10);
+        rightWeldCount.textContent = parseInt(data.rightWeldCount, 10);
+
+        // Update the actual weld counts form value
+        actualLeftWeldCount.value = parseInt(data.leftWeldCount, 10);
+        actualRightWeldCount.value = parseInt(data.rightWeldCount, 10);
+    }
 
     async function updateData() {
         try {
-            const response = await fetch(url + 'api/weld-data');
+            const response = await fetch(url + 'api/weld-data?jig=' + encodeURIComponent(jigNumber));
             const data = await response.json();
-            const partNumber = document.getElementById('partNumber');
-            const leftWeldCount = document.getElementById('leftWeldCount');
-            const rightWeldCount = document.getElementById('rightWeldCount');
-            const actualLeftWeldCount = document.getElementById('actual_left_welds');
-            const actualRightWeldCount = document.getElementById('actual_right_welds');
-
-            partNumber.textContent = data.partNumber || 'N/A';
-            leftWeldCount.textContent = parseInt(data.leftWeldCount, 10);
-            rightWeldCount.textContent = parseInt(data.rightWeldCount, 10);
-
-            // Update the actual weld counts form value
-            actualLeftWeldCount.value = parseInt(data.leftWeldCount, 10);
-            actualRightWeldCount.value = parseInt(data.rightWeldCount, 10);
+            showData(data);
         } catch (error) {
             console.error('Error fetching data:', error);
         }
@@ -39,8 +44,15 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
-    // Update data every 1 second
-    setInterval(updateData, 1000);
+    if (window.EventSource) {
+        // Weld data is pushed whenever a count or the part changes, EventSource reconnects by itself on errors
+        const events = new EventSource(url + 'api/weld-data/stream?jig=' + encodeURIComponent(jigNumber));
+        events.onmessage = (event) => showData(JSON.parse(event.data));
+        events.onerror = (error) => console.error('Error in weld data stream:', error);
+    } else {
+        // Update data every 1 second
+        setInterval(updateData, 1000);
+    }
 
     // Initial data load
     updateData();
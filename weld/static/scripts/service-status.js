@@ -0,0 +1,33 @@
+document.addEventListener('DOMContentLoaded', function () {
+    // Variables
+    const serviceStatus = document.getElementById("service-status");
+    const serviceNames = {
+        weld_count_service: "ML Detector",
+        google_api_service: "Part Number Database",
+    };
+
+    // Show the services that are still starting until all of them are ready
+    function updateServiceStatus() {
+        fetch(serviceStatus.dataset.url)
+            .then((response) => response.json())
+            .then((data) => {
+                if (data.ready) {
+                    serviceStatus.style.display = "none";
+                    return;
+                }
+
+                const pending = Object.entries(data.services)
+                    .filter(([name, service]) => service.state !== "ready")
+                    .map(([name, service]) => (serviceNames[name] || name) + (service.state === "failed" ? " (retrying)" : ""));
+                serviceStatus.textContent = "Starting: " + pending.join(", ");
+                serviceStatus.style.display = "block";
+                setTimeout(updateServiceStatus, 1000);
+            })
+            .catch((error) => {
+                console.error("Error fetching service status:", error);
+                setTimeout(updateServiceStatus, 1000);
+            });
+    }
+
+    updateServiceStatus();
+});
@@ -4,11 +4,13 @@ document.addEventListener('DOMContentLoaded', () => {
     const manualPartNumberGroup = document.getElementById('manual-part-number-group');
     const dropdownPartNumberGroup = document.getElementById('dropdown-part-number-group');
     const partNumberSelect = document.getElementById('part-number-select');
+    const partNumberSearch = document.getElementById('part-number-search');
     const refreshPartsButton = document.getElementById('refresh-parts');
     const leftWeldInput = document.getElementById('expected-left-welds');
     const rightWeldInput = document.getElementById('expected-right-welds');
     const totalWeldDisplay = document.getElementById('total-welds');
     var url_prefix = document.getElementById('index-form').action
+    const PAGE_SIZE = 50;
 
     const toggleManualEntry = () => {
         if (manualCheckbox.checked) {
@@ -24,23 +26,37 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
-    const fetchParts = () => {
-        fetch(url_prefix + '/api/parts')
+    const fetchParts = (refresh = false) => {
+        const query = encodeURIComponent(partNumberSearch.value.trim());
+        fetch(url_prefix + '/api/parts?q=' + query + '&limit=' + PAGE_SIZE + (refresh ? '&refresh=true' : ''))
             .then(response => response.json())
             .then(data => {
                 partNumberSelect.innerHTML = '<option value="" disabled selected>-- Select Part Number --</option>';
-                Object.keys(data).forEach(partNumber => {
+                data.parts.forEach(part => {
                     const option = document.createElement('option');
-                    option.value = partNumber;
-                    option.textContent = partNumber;
-                    option.dataset.leftWelds = data[partNumber]['Left Weld Count'];
-                    option.dataset.rightWelds = data[partNumber]['Right Weld Count'];
+                    option.value = part.partNumber;
+                    option.textContent = part.partNumber;
+                    option.dataset.leftWelds = part['Left Weld Count'];
+                    option.dataset.rightWelds = part['Right Weld Count'];
                     partNumberSelect.appendChild(option);
                 });
+                if (data.total > data.parts.length) {
+                    const option = document.createElement('option');
+                    option.disabled = true;
+                    option.textContent = '... ' + (data.total - data.parts.length) + ' more, refine the search';
+                    partNumberSelect.appendChild(option);
+                }
             })
             .catch(error => console.error('Error fetching part numbers:', error));
     };
 
+    // Only search once the operator stops typing
+    let searchTimeout = null;
+    const searchParts = () => {
+        clearTimeout(searchTimeout);
+        searchTimeout = setTimeout(() => fetchParts(), 250);
+    };
+
     const updateTotalWelds = () => {
         const leftWelds = parseInt(leftWeldInput.value, 10) || 0;
         const rightWelds = parseInt(rightWeldInput.value, 10) || 0;
@@ -56,7 +72,8 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
-    refreshPartsButton.addEventListener('click', fetchParts);
+    partNumberSearch.addEventListener('input', searchParts);
+    refreshPartsButton.addEventListener('click', () => fetchParts(true));
 
     document.querySelectorAll('.increment, .decrement').forEach(button => {
         button.addEventListener('click', (event) => {